@@ -37,7 +37,7 @@ start "" cmd /c "timeout /t 2 >nul && start http://localhost:%PORT%"
 echo Starting Model Manager on http://localhost:%PORT%
 echo Press Ctrl+C to stop.
 echo.
-python model_manager_by_wwaa.py
+python model_manager_by_wwaa.py %*
 
 endlocal
 pause
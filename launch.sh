@@ -26,4 +26,4 @@ pip install -q -r requirements.txt
 echo "Starting Model Manager on http://localhost:$PORT"
 echo "Press Ctrl+C to stop."
 echo
-python model_manager_by_wwaa.py
+python model_manager_by_wwaa.py "$@"
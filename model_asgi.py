@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model ASGI Functions
+Optional asyncio server mode: the event loop serves push channels, subprocess
+output and (with aiohttp) download traffic, while the Flask routes run on a
+bounded pool of threads
+"""
+
+import asyncio
+import codecs
+import concurrent.futures
+import io
+import os
+import sys
+import threading
+
+import requests
+from model_download import set_transport, RequestsTransport, CONNECT_TIMEOUT, READ_TIMEOUT
+from model_events import event_bus, AsyncClient
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None      # The threaded Flask server is used instead
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None      # Transfers keep using requests on the job threads
+
+ASGI_WORKERS = 16       # Threads running Flask routes and their blocking filesystem work
+READ_CHUNK = 64 * 1024  # Bytes read from a subprocess pipe per wakeup
+READ_LIMIT = 1024 * 1024    # Longest output line of an awaited subprocess
+
+loop_state = {"loop": None}     # Event loop of the running ASGI server, None under the threaded server
+
+
+def read_lines(stream, append):
+    """Append each non-empty line of a pipe until it closes, blocking the calling thread"""
+    try:
+        for line in iter(stream.readline, ''):
+            stripped = line.rstrip()
+            if stripped:
+                append(stripped)
+    except Exception as e:
+        append(f'[Log capture error: {e}]')
+
+
+def watch_pipe(loop, stream, append):
+    """Read a pipe from the event loop whenever it has data (called on the loop)"""
+    fd = stream.fileno()
+    os.set_blocking(fd, False)
+    decoder = codecs.getincrementaldecoder(stream.encoding or "utf-8")(errors="replace")
+    pending = {"text": ""}      # Start of a line whose end has not arrived yet
+
+    def on_readable():
+        try:
+            chunk = os.read(fd, READ_CHUNK)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            append(f'[Log capture error: {e}]')
+            chunk = b""
+        text = pending["text"] + decoder.decode(chunk, final=not chunk)
+        lines = text.splitlines()
+        pending["text"] = lines.pop() if chunk and lines and not text.endswith(("\n", "\r")) else ""
+        for line in lines:
+            stripped = line.rstrip()
+            if stripped:
+                append(stripped)
+        if not chunk:
+            loop.remove_reader(fd)
+            stream.close()
+
+    loop.add_reader(fd, on_readable)
+
+
+def follow_output(stream, append):
+    """Append each non-empty line of a subprocess pipe as it arrives.
+
+    Under the ASGI server the event loop watches the pipe, so a long-running
+    process costs no thread; otherwise (and on Windows, whose loop cannot watch
+    pipes) a daemon thread reads it.
+    """
+    loop = loop_state["loop"]
+    if loop is None or os.name == "nt":
+        thread = threading.Thread(target=read_lines, args=(stream, append))
+        thread.daemon = True
+        thread.start()
+        return
+    loop.call_soon_threadsafe(watch_pipe, loop, stream, append)
+
+
+async def run_logged(args, append):
+    """Run a command, appending each non-empty line of its output as it arrives; returns the exit code.
+
+    If reading fails or the task is cancelled, the error is appended and the
+    process is killed and reaped rather than left running.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, limit=READ_LIMIT)
+    try:
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            for part in line.decode("utf-8", errors="replace").splitlines():
+                stripped = part.rstrip()
+                if stripped:
+                    append(stripped)
+        return await process.wait()
+    except BaseException as e:
+        append(f'[Log capture error: {e!r}]')
+        raise
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+
+def start_task(coroutine_function):
+    """Run coroutine_function() in the background.
+
+    Under the ASGI server it runs on the server's event loop and costs no
+    thread; otherwise (and on Windows, where the server loop may not support
+    subprocesses) a daemon thread runs it on an event loop of its own.
+    """
+    loop = loop_state["loop"]
+    if loop is not None and os.name != "nt":
+        asyncio.run_coroutine_threadsafe(coroutine_function(), loop)
+        return
+    thread = threading.Thread(target=lambda: asyncio.run(coroutine_function()))
+    thread.daemon = True
+    thread.start()
+
+
+class LoopResponse:
+    """requests-like view of an aiohttp response: status_code, headers, url and close()"""
+
+    def __init__(self, loop, response):
+        self.loop = loop
+        self.response = response
+        self.status_code = response.status
+        self.headers = response.headers     # Case-insensitive, like requests
+        self.url = str(response.url)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.response.close)
+
+
+class LoopTransport:
+    """Download transport whose HTTP traffic runs on the ASGI event loop through aiohttp.
+
+    Same interface as model_download.RequestsTransport. Connections, TLS and
+    socket reads all live on the loop; the calling job thread only waits for
+    each filled buffer, then writes it to disk and hashes it, so that
+    blocking work stays on the bounded job workers. aiohttp errors are raised
+    as the requests exceptions the engine already handles.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.session = None     # Created on the loop at first use
+
+    def call(self, coroutine):
+        """Run coroutine on the loop and wait for its result"""
+        try:
+            return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise requests.ConnectionError(str(e) or type(e).__name__)
+
+    def session_for(self):
+        """The shared aiohttp session (called on the loop)"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                # No connection cap, as with requests: the job and connection counts bound it
+                connector=aiohttp.TCPConnector(limit=0, limit_per_host=0),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT),
+                auto_decompress=False)
+        return self.session
+
+    async def request(self, method, url, headers, allow_redirects):
+        return await self.session_for().request(method, url, headers=headers, allow_redirects=allow_redirects)
+
+    def send(self, method, url, headers, allow_redirects):
+        response = LoopResponse(self.loop, self.call(self.request(method, url, headers, allow_redirects)))
+        if response.status_code >= 400:
+            response.close()
+            raise requests.HTTPError(f"{response.status_code} Error: {response.response.reason} for url: {url}",
+                                     response=response)
+        return response
+
+    def head(self, url, headers=None, allow_redirects=True):
+        return self.send("HEAD", url, headers, allow_redirects)
+
+    def open(self, url, headers=None):
+        return self.send("GET", url, headers, True)
+
+    async def read(self, response, size):
+        """Up to size bytes of the body, fewer only at its end"""
+        chunks = []
+        remaining = size
+        while remaining:
+            data = await response.content.read(remaining)
+            if not data:
+                break
+            chunks.append(data)
+            remaining -= len(data)
+        return b"".join(chunks)
+
+    def readinto(self, response, buffer):
+        """Read the next bytes of an open() response into buffer; returns the count, 0 at the end"""
+        data = self.call(self.read(response.response, len(buffer)))
+        count = len(data)
+        buffer[:count] = data
+        return count
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ of an ASGI http request"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(len(body))    # The body is already read in full, chunked or not
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue
+        if name == "CONTENT_TYPE":
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def run_wsgi(wsgi_app, environ):
+    """Call a WSGI app and collect its response as (status, headers, body)"""
+    response = {}
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        return chunks.append
+
+    result = wsgi_app(environ, start_response)
+    try:
+        chunks.extend(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], b"".join(chunks)
+
+
+class AsgiApp:
+    """ASGI front of the Flask app.
+
+    Requests run the unchanged Flask routes on a bounded executor, so routes and
+    JSON shapes stay the same and at most ASGI_WORKERS threads do blocking work.
+    The /events stream is served on the event loop itself, so open pages cost
+    no thread each. With aiohttp installed, download traffic moves onto the
+    loop too (LoopTransport); the JobQueue workers keep the disk writes.
+    """
+
+    def __init__(self, wsgi_app, workers=ASGI_WORKERS):
+        self.wsgi_app = wsgi_app
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="asgi")
+        self.streams = {"/events": self.serve_events}
+        self.transport = None   # LoopTransport while the server runs with aiohttp
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            handler = self.streams.get(scope["path"], self.serve_wsgi)
+            await handler(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                loop_state["loop"] = asyncio.get_running_loop()
+                if aiohttp is not None:
+                    self.transport = LoopTransport(loop_state["loop"])
+                    set_transport(self.transport)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                loop_state["loop"] = None
+                if self.transport is not None:
+                    set_transport(RequestsTransport())
+                    await self.transport.close()
+                    self.transport = None
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def read_body(self, receive):
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                return body
+
+    async def serve_wsgi(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        status, headers, content = await loop.run_in_executor(
+            self.executor, run_wsgi, self.wsgi_app, wsgi_environ(scope, body))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
+
+    async def serve_events(self, scope, receive, send):
+        """Server-Sent Events, with the same messages as the Flask /events route"""
+        loop = asyncio.get_running_loop()
+        client = await loop.run_in_executor(self.executor, event_bus.subscribe, AsyncClient(loop))
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no")
+            ]})
+            async for message in event_bus.stream_async(client, disconnected):
+                await send({"type": "http.response.body", "body": message.encode("utf-8"), "more_body": True})
+            if not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            watcher.cancel()
+            event_bus.unsubscribe(client)
+
+
+def serve_asgi(wsgi_app, host, port):
+    """Run wsgi_app behind AsgiApp on uvicorn; returns False when uvicorn is not installed"""
+    if uvicorn is None:
+        return False
+    print(f"Serving with uvicorn (asyncio), {ASGI_WORKERS} worker threads for blocking work")
+    if aiohttp is None:
+        print("aiohttp is not installed (pip install aiohttp) - downloads use requests on the job threads")
+    uvicorn.run(AsgiApp(wsgi_app), host=host, port=port, log_level="warning", lifespan="on")
+    return True
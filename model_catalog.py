@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Catalog Functions
+In-memory index of the package catalog for search, filtering and paging
+"""
+
+import difflib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from model_download import cached_probe, probe_url, build_headers, PROBE_WORKERS
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+FUZZY_CUTOFF = 0.75         # difflib ratio for a query token to match a misspelt name token
+PAGE_SIZE = 50              # Rows per /packages page unless asked otherwise
+MAX_PAGE_SIZE = 500
+SIZE_REFRESH_EVERY = 25     # Probes that land between refreshes of the summary rows
+PROBE_RETRY_AFTER = 3600    # Seconds before a URL whose size probe failed is probed again
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a package name: "Flux.1-Dev (FP8)" -> flux, 1, dev, fp8"""
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+def entry_size(entry, sizes):
+    """Size of a config entry from the config, sizes learned by probing or the probe cache; 0 when unknown"""
+    size = int(entry.get("size") or 0) or sizes.get(entry["url"], 0)
+    if not size:
+        info = cached_probe(entry["url"])
+        size = info["size"] if info else 0
+    return size
+
+
+def summarize(name, config, sizes):
+    """Summary row of one package, with file count and total size worked out once"""
+    files = config.get("files", [])
+    size = 0
+    unknown = 0
+    for entry in files:
+        known = entry_size(entry, sizes)
+        if known:
+            size += known
+        else:
+            unknown += 1
+    return {
+        "name": name,
+        "files": len(files),
+        "size": size,
+        "unknown_sizes": unknown,
+        "directories": sorted(set(entry.get("directory", "") for entry in files)),
+        "hf": bool(config.get("hf", False))
+    }
+
+
+class PackageIndex:
+    """Token index and summary rows of model_configs, rebuilt whenever the configs are loaded.
+
+    The config rarely carries sizes. Files of unknown size are probed in the
+    background only when a size-filtered search needs them, PROBE_WORKERS at a
+    time, and the rows are refreshed as the sizes come in. Failed probes are
+    remembered for PROBE_RETRY_AFTER seconds, so gated files are not asked
+    about on every search.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = {}          # name -> summary row
+        self.tokens = {}        # token -> names containing it
+        self.directories = []
+        self.sizes = {}         # url -> size learned by probing, kept across rebuilds
+        self.configs = {}
+        self.generation = 0     # Bumped per build, so outdated rows are not stored
+        self.probing = set()    # URLs queued or in flight for a size probe
+        self.failed = {}        # url -> time its size probe failed
+        self.landed = 0         # Probes answered since the rows were last refreshed
+        self.pending = 0        # Files still waiting for their size probe
+        self.probe_pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="size-probe")
+
+    def build(self, configs):
+        rows = {}
+        tokens = {}
+        for name, config in configs.items():
+            rows[name] = summarize(name, config, self.sizes)
+            for token in tokenize(name):
+                tokens.setdefault(token, set()).add(name)
+        directories = sorted(set(d for row in rows.values() for d in row["directories"]))
+        with self.lock:
+            self.rows, self.tokens, self.directories = rows, tokens, directories
+            self.configs = configs
+            self.generation += 1
+            generation = self.generation
+        print(f"Indexed {len(rows)} packages ({len(tokens)} search tokens)")
+
+    def learn_sizes(self, sizes):
+        """Take file sizes found elsewhere ({url: size}, e.g. by a pre-flight) into the rows"""
+        self.sizes.update((url, size) for url, size in sizes.items() if size)
+        self.refresh()
+
+    def refresh(self):
+        """Recompute the rows of the current configs, e.g. after downloads filled the probe cache"""
+        with self.lock:
+            configs, generation = self.configs, self.generation
+        self.refresh_sizes(configs, generation)
+
+    def refresh_sizes(self, configs, generation):
+        """Recompute the summary rows with the sizes learned so far"""
+        rows = dict((name, summarize(name, config, self.sizes)) for name, config in configs.items())
+        with self.lock:
+            if generation == self.generation:
+                self.rows = rows
+
+    def probe_sizes(self, names):
+        """Queue size probes for the files of unknown size in the named packages"""
+        with self.lock:
+            configs = self.configs
+        now = time.time()
+        urls = set(entry["url"] for name in names for entry in configs.get(name, {}).get("files", [])
+                   if not entry_size(entry, self.sizes))
+        with self.lock:
+            urls = [url for url in urls
+                    if url not in self.probing and now - self.failed.get(url, 0) >= PROBE_RETRY_AFTER]
+            self.probing.update(urls)
+            self.pending = len(self.probing)
+        for url in urls:
+            self.probe_pool.submit(self.probe_size, url)
+
+    def probe_size(self, url):
+        """Probe one file for its size and refresh the rows every SIZE_REFRESH_EVERY answers"""
+        try:
+            size = probe_url(url, build_headers())["size"]
+        except requests.RequestException:
+            # Gated or unreachable without a token - the size stays unknown
+            size = 0
+        with self.lock:
+            if size:
+                self.sizes[url] = size
+                self.landed += 1
+            else:
+                self.failed[url] = time.time()
+            self.probing.discard(url)
+            self.pending = len(self.probing)
+            refresh = self.landed and (self.landed >= SIZE_REFRESH_EVERY or not self.probing)
+            if refresh:
+                self.landed = 0
+        if refresh:
+            self.refresh()
+
+    def match_token(self, query_token, tokens):
+        """Score every package for one query token: exact 1.0, prefix 0.8, substring 0.6, fuzzy by ratio"""
+        scores = {}
+        for token, names in tokens.items():
+            if token == query_token:
+                score = 1.0
+            elif token.startswith(query_token):
+                score = 0.8
+            elif query_token in token:
+                score = 0.6
+            else:
+                ratio = difflib.SequenceMatcher(None, query_token, token).ratio()
+                if ratio < FUZZY_CUTOFF:
+                    continue
+                score = 0.5 * ratio
+            for name in names:
+                scores[name] = max(scores.get(name, 0), score)
+        return scores
+
+    def search(self, query="", directory="", hf=None, min_size=0, max_size=0, include_unknown=False,
+               offset=0, limit=PAGE_SIZE):
+        """Filter and rank packages; returns (total matches, rows of the requested page).
+
+        Every query token has to match some token of the name, so "flux fp8"
+        narrows rather than widens. Without a query rows are sorted by name.
+        A package with files of unknown size only passes a size filter when its
+        known size already decides it, or when include_unknown is set; the
+        unknown sizes of such packages are probed for later searches.
+        """
+        with self.lock:
+            rows, tokens = self.rows, self.tokens
+
+        candidates = None
+        query_tokens = tokenize(query)
+        for query_token in query_tokens:
+            scores = self.match_token(query_token, tokens)
+            if candidates is None:
+                candidates = scores
+            else:
+                candidates = {name: candidates[name] + score for name, score in scores.items() if name in candidates}
+        if candidates is None:
+            candidates = dict.fromkeys(rows, 0)
+
+        matches = []
+        unknown = []
+        for name, score in candidates.items():
+            row = rows[name]
+            if directory and directory not in row["directories"]:
+                continue
+            if hf is not None and row["hf"] != hf:
+                continue
+            if (min_size or max_size) and row["unknown_sizes"]:
+                unknown.append(name)
+            # The known size is a lower bound of the total
+            undecided = row["unknown_sizes"] and not include_unknown
+            if min_size and row["size"] < min_size and (undecided or not row["unknown_sizes"]):
+                continue
+            if max_size and (row["size"] > max_size or undecided):
+                continue
+            matches.append((-score, name.lower(), row))
+        matches.sort(key=lambda match: match[:2])
+        if unknown:
+            self.probe_sizes(unknown)
+
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+        return len(matches), [row for _, _, row in matches[offset:offset + limit]]
+
+
+package_index = PackageIndex()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Dedup Functions
+Content index of downloaded model files, so identical files are linked instead of downloaded again
+"""
+
+from urllib.parse import urlparse
+import hashlib
+import json
+import os
+import re
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows - no reflinks
+    fcntl = None
+
+# Where the manager keeps its own state between runs
+STATE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "model_manager")
+CONTENT_INDEX_FILE = os.path.join(STATE_DIR, "content_index.json")
+
+DEDUP_MIN_SIZE = 1024 * 1024       # Smaller files are not worth scanning for copies
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+FICLONE = 0x40049409               # Linux ioctl for copy-on-write clones (btrfs, xfs, ...)
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def sha256_from_etag(etag):
+    """Return the SHA-256 carried by an ETag (HF X-Linked-Etag of LFS files), or ''"""
+    value = (etag or "").strip()
+    if value.startswith("W/"):
+        return ""
+    value = value.strip('"').lower()
+    return value if SHA256_PATTERN.match(value) else ""
+
+
+def content_key(entry, info):
+    """Identity of the content behind a config entry, or None when nothing reliable is known.
+
+    A SHA-256 (from the config entry or HF's X-Linked-Etag) identifies content
+    anywhere; a plain strong ETag only identifies it on the same host.
+    """
+    sha256 = (entry.get("sha256") or "").lower() or sha256_from_etag(info.get("linked_etag"))
+    if sha256:
+        return f"sha256:{sha256}"
+    etag = info.get("etag") or ""
+    if etag and not etag.startswith("W/"):
+        return f"etag:{urlparse(info['url']).netloc}:{etag.strip(chr(34))}"
+    return None
+
+
+def hash_file(path):
+    """SHA-256 of a file on disk"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reflink(source, target):
+    """Copy-on-write clone of source at target, raising OSError where the filesystem can't"""
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform")
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        if os.path.exists(target):
+            os.remove(target)
+        raise
+
+
+def link_file(source, target):
+    """Create target from source without copying data; returns the method used.
+
+    Tries a hardlink first, then a reflink (filesystems that refuse hardlinks).
+    Both leave an independent copy that survives deleting source. There is no
+    symlink fallback - a link into another package would break when that
+    package is deleted - so OSError means the file has to be downloaded.
+    The target appears atomically.
+    """
+    tmp_path = target + ".link.tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+        method = "hardlink"
+    except OSError:
+        reflink(source, tmp_path)
+        method = "reflink"
+    os.replace(tmp_path, target)
+    return method
+
+
+class ContentIndex:
+    """Persistent map of file path -> content key, validated against size and mtime on use"""
+
+    def __init__(self, path=CONTENT_INDEX_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = None
+        self.hashing = set()    # Paths queued for background hashing
+
+    def load(self):
+        """Read the index from disk on first use (called with lock held)"""
+        if self.entries is not None:
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Write the index back atomically (called with lock held)"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+    def record(self, path, key, package=False):
+        """Remember the content key of a file that is now complete on disk; package marks a package file we wrote"""
+        if not key:
+            return
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self.lock:
+            self.load()
+            self.entries[path] = {"key": key, "size": st.st_size, "mtime": st.st_mtime, "package": package}
+            self.save()
+
+    def package_paths(self, base_path):
+        """Files under base_path that were written as part of a package and are unchanged since"""
+        base_path = os.path.abspath(base_path)
+        with self.lock:
+            self.load()
+            entries = list(self.entries.items())
+        return [path for path, entry in entries
+                if entry.get("package") and path.startswith(base_path + os.sep) and self.is_current(path, entry)]
+
+    def is_current(self, path, entry):
+        """True while the file still has the size and mtime it was indexed with"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime == entry["mtime"]
+
+    def find(self, key, size, base_path):
+        """Return the path of an indexed file with this content under base_path, or None.
+
+        Only indexed files are matched, so a download never waits on hashing.
+        For SHA-256 keys, unindexed files of the exact same size (taken from the
+        live filesystem index) are hashed in the background and added to the
+        index, so copies that predate it are found by later downloads.
+        """
+        base_path = os.path.abspath(base_path)
+        with self.lock:
+            self.load()
+            stale = []
+            for path, entry in self.entries.items():
+                if entry["key"] != key or entry["size"] != size:
+                    continue
+                if not path.startswith(base_path + os.sep):
+                    # The index is shared by every base path; a copy elsewhere is not a link target
+                    continue
+                if self.is_current(path, entry):
+                    return path
+                stale.append(path)
+            for path in stale:
+                del self.entries[path]
+            if stale:
+                self.save()
+            indexed = set(path for path, entry in self.entries.items() if self.is_current(path, entry))
+
+        if key.startswith("sha256:"):
+            self.hash_later([path for path in self.files_of_size(base_path, size) if path not in indexed])
+        return None
+
+    def files_of_size(self, base_path, size):
+        """Files under base_path with exactly this size, from the live filesystem index (none without one)"""
+        # Imported here: model_fsindex imports this module through model_download
+        from model_fsindex import find_index
+        index = find_index(base_path)
+        return index.files_of_size(base_path, size) if index else []
+
+    def hash_later(self, paths):
+        """Hash paths on a background thread and record their keys; paths already queued are skipped"""
+        with self.lock:
+            paths = [path for path in paths if path not in self.hashing]
+            self.hashing.update(paths)
+        if not paths:
+            return
+        thread = threading.Thread(target=self.hash_files, args=(paths,))
+        thread.daemon = True
+        thread.start()
+
+    def hash_files(self, paths):
+        """Add the SHA-256 of each file to the index"""
+        for path in paths:
+            try:
+                if not os.path.islink(path):
+                    print(f"Hashing {path} to check for an identical copy...")
+                    self.record(path, f"sha256:{hash_file(path)}")
+            except OSError as e:
+                print(f"Could not hash {path}: {e}")
+            finally:
+                with self.lock:
+                    self.hashing.discard(path)
+
+
+content_index = ContentIndex()
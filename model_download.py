@@ -1,25 +1,362 @@
 #!/usr/bin/env python3
 """
 ComfyUI Model Download Functions
-Functions for downloading and deleting model files using wget (Linux/Mac) or curl (Windows)
+Functions for downloading and deleting model files with an in-process streaming engine
 """
 
-import subprocess
-import sys
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urljoin
+from concurrent.futures import ThreadPoolExecutor
+import collections
+import hashlib
+import http.client
+import io
+import json
+import math
 import os
-import tempfile
-import re
-
-# Global variables for progress tracking
-current_operation = {
-    "status": "idle", 
-    "progress": [], 
-    "total": 0, 
-    "current": 0,
-    "current_file": "",
-    "current_progress": ""
-}
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+from model_jobs import new_operation, JOB_WORKERS
+from model_dedup import content_index, content_key, link_file, sha256_from_etag, DEDUP_MIN_SIZE
+from model_extract import (
+    archive_format, extract_tar_stream, extract_zip, finish_extraction, discard_staged,
+    is_extracted, extracted_size, read_manifest, remove_manifest
+)
+from model_verify import check_file
+
+# Download engine tuning
+CHUNK_SIZE = 1024 * 1024          # Bytes read from the socket per write to disk
+PROGRESS_INTERVAL = 0.5           # Seconds between progress reports
+RATE_SMOOTHING = 5.0              # Seconds over which the smoothed rate (and so the ETA) settles
+CONNECT_TIMEOUT = 15
+READ_TIMEOUT = 60
+
+# Segmented downloads
+SEGMENT_THRESHOLD = 256 * 1024 * 1024   # Files smaller than this use a single stream
+SEGMENT_SIZE = 64 * 1024 * 1024         # Byte range a connection fetches before taking the next one
+MIN_CONNECTIONS = 2
+MAX_CONNECTIONS = 8
+TUNE_INTERVAL = 2.0                     # Seconds between throughput measurements
+TUNE_GAIN = 1.1                         # Add a connection only while throughput keeps improving by 10%
+SEGMENT_RETRIES = 3
+
+# Resumable downloads
+PART_SUFFIX = ".part"                   # Data is written here and renamed into place once complete
+META_SUFFIX = ".json"                   # Sidecar next to the .part file with size, validator and done ranges
+CHECKPOINT_INTERVAL = 5.0               # Seconds between sidecar updates during segmented downloads
+DOWNLOAD_RETRIES = 3
+RETRY_DELAY = 2.0
+VERIFY_CHECKSUMS = True                 # Hash bytes as they arrive and check them against the expected SHA-256
+
+# Package downloads
+PACKAGE_WORKERS = 3                     # Files of a package downloaded at the same time
+MAX_PACKAGE_WORKERS = 8                 # Upper bound a request may ask for; the pool is sized for it
+PROBE_WORKERS = 8                       # Concurrent size probes before a package starts
+DOWNLOAD_ORDER = "smallest_first"
+DOWNLOAD_ORDERS = ("config", "smallest_first", "largest_first")
+THROUGHPUT_SAMPLES = 20                 # Recent package downloads averaged for pre-flight ETAs
+
+# Connection reuse and redirect resolution
+JOB_POOL_SIZE = MAX_CONNECTIONS * MAX_PACKAGE_WORKERS   # Connections one job can open to a host
+RESOLVE_TTL = 600.0                     # Seconds a probed URL stays cached (HF CDN URLs are signed and expire)
+MAX_REDIRECTS = 10
+
+# Bandwidth limiting
+BANDWIDTH_LIMIT = 0                     # Bytes per second shared by all downloads, 0 = unlimited
+BURST_SECONDS = 1.0                     # Unused allowance that may be saved up for a burst
+
+# Write path
+BUFFER_POOL_SIZE = MAX_CONNECTIONS * PACKAGE_WORKERS    # CHUNK_SIZE buffers kept around for reuse
+
+# Mirrors
+SAMPLE_BYTES = 2 * 1024 * 1024          # Ranged GET timed to measure a host without throughput history
+HOST_STATS_WEIGHT = 0.3                 # Weight of a new sample in the per-host moving averages
+DEGRADE_WINDOW = 10.0                   # Seconds of throughput measured before judging a source
+DEGRADE_FRACTION = 0.25                 # A source slower than this share of the best alternative is abandoned
+FAILURE_PENALTY = 0.5                   # Rate multiplier applied to a host after a failed transfer
+
+# Content dedup
+DEDUP_ENABLED = True                    # Link identical files already under the base path instead of downloading
+
+# Connection count that worked best last time, per host
+host_connections = {}
+
+# Moving averages of latency and throughput per host, used to rank mirrors - see rank_sources
+host_stats = {}
+host_stats_lock = threading.Lock()
+
+# (bytes, seconds) of recent package downloads - see recent_throughput
+throughput_history = collections.deque(maxlen=THROUGHPUT_SAMPLES)
+
+# Probe results per (url, credentials) - see probe_url
+resolve_cache = {}
+resolve_lock = threading.Lock()
+
+
+class RangeNotSupported(IOError):
+    """Raised when a server advertises byte ranges but answers a range request with the whole file"""
+
+
+class DownloadCancelled(Exception):
+    """Raised inside the engine once the cancel event of a download is set"""
+
+
+class ChecksumMismatch(IOError):
+    """Raised when a finished download does not have the expected SHA-256"""
+
+
+class SourceDegraded(IOError):
+    """Raised when a source becomes much slower than an alternative mirror would be"""
+
+
+class BandwidthLimiter:
+    """Process-wide token bucket shared by every download path.
+
+    rate is in bytes per second (0 = unlimited). schedules is a list of
+    {"start": "HH:MM", "end": "HH:MM", "rate": bytes_per_second} windows that
+    replace rate while the local time is inside them; a window may wrap past
+    midnight and a rate of 0 makes it unlimited. Both can be changed at any time
+    and apply from the next chunk on.
+    """
+
+    def __init__(self, rate=0, schedules=None):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.schedules = []
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.configure(rate, schedules or [])
+
+    def configure(self, rate=None, schedules=None):
+        """Update the default rate and/or the schedule windows, validating them first"""
+        if rate is not None and rate < 0:
+            raise ValueError("Rate must be 0 (unlimited) or positive")
+        parsed = None
+        if schedules is not None:
+            parsed = []
+            for window in schedules:
+                start = parse_clock(window["start"])
+                end = parse_clock(window["end"])
+                window_rate = float(window.get("rate") or 0)
+                if window_rate < 0:
+                    raise ValueError("Schedule rate must be 0 (unlimited) or positive")
+                parsed.append({"start": window["start"], "end": window["end"], "rate": window_rate,
+                               "start_minute": start, "end_minute": end})
+        with self.lock:
+            if rate is not None:
+                self.rate = float(rate)
+            if parsed is not None:
+                self.schedules = parsed
+
+    def current_rate(self):
+        """Rate in force right now, taking schedule windows into account"""
+        now = time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for window in self.schedules:
+            start, end = window["start_minute"], window["end_minute"]
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return window["rate"]
+        return self.rate
+
+    def settings(self):
+        """Current configuration for the API"""
+        with self.lock:
+            return {
+                "rate": self.rate,
+                "schedules": [{"start": w["start"], "end": w["end"], "rate": w["rate"]} for w in self.schedules],
+                "effective_rate": self.current_rate()
+            }
+
+    def consume(self, amount):
+        """Account for amount bytes, sleeping as long as needed to stay under the rate"""
+        with self.lock:
+            rate = self.current_rate()
+            now = time.monotonic()
+            if not rate:
+                self.tokens = 0.0
+                self.updated = now
+                return
+            self.tokens = min(rate * BURST_SECONDS, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            # Go into debt and sleep it off, so concurrent downloads share the rate fairly
+            self.tokens -= amount
+            wait = -self.tokens / rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+def parse_clock(value):
+    """Convert "HH:MM" to minutes after midnight"""
+    hours, minutes = value.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Invalid time of day: {value}")
+    return hours * 60 + minutes
+
+
+bandwidth_limiter = BandwidthLimiter(BANDWIDTH_LIMIT)
+
+
+class BufferPool:
+    """Reusable CHUNK_SIZE memoryviews, so download loops allocate nothing per chunk"""
+
+    def __init__(self, size=CHUNK_SIZE, keep=BUFFER_POOL_SIZE):
+        self.size = size
+        self.keep = keep
+        self.free = []
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            if self.free:
+                return self.free.pop()
+        return memoryview(bytearray(self.size))
+
+    def put(self, buffer):
+        with self.lock:
+            if len(self.free) < self.keep:
+                self.free.append(buffer)
+
+
+buffer_pool = BufferPool()
+job_slots = {"count": JOB_WORKERS}      # Concurrent jobs the connection pools are sized for
+
+
+class RequestsTransport:
+    """Default transport - streams HTTP(S) responses through requests sessions.
+
+    A transport needs open(url, headers) returning a response with status_code,
+    headers and close(), readinto(response, buffer) filling buffer with the next
+    bytes of the body, and head(url, headers, allow_redirects) returning a
+    response with status_code, url and headers, so other backends can be swapped
+    in with set_transport(). An optional resize(jobs) is called when the number
+    of concurrent jobs changes.
+
+    Each host gets its own session with a keep-alive pool sized for every
+    connection the concurrent jobs can open, so later files and ranges reuse
+    warm TLS connections instead of handshaking again.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.pool_size = JOB_POOL_SIZE * job_slots["count"]
+
+    def mount(self, session):
+        """Give session a keep-alive pool of pool_size connections; returns the adapter it replaced"""
+        old = session.get_adapter("https://")
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return old
+
+    def resize(self, jobs):
+        """Size every host's pool for jobs running at once"""
+        with self.lock:
+            self.pool_size = JOB_POOL_SIZE * jobs
+            old = [self.mount(session) for session in self.sessions.values()]
+        for adapter in old:
+            # Idle connections close now; ones still streaming close when released
+            adapter.close()
+
+    def session_for(self, url):
+        """Return the keep-alive session for the host of url, creating it on first use"""
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                self.mount(session)
+                self.sessions[key] = session
+        return session
+
+    def head(self, url, headers=None, allow_redirects=True):
+        response = self.session_for(url).head(
+            url,
+            headers=headers,
+            allow_redirects=allow_redirects,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        )
+        response.raise_for_status()
+        return response
+
+    def open(self, url, headers=None):
+        response = self.session_for(url).get(
+            url,
+            headers=headers,
+            stream=True,
+            allow_redirects=True,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        )
+        response.raise_for_status()
+        return response
+
+    def readinto(self, response, buffer):
+        """Read the next bytes of an open() response into buffer; returns the count, 0 at the end.
+
+        Bodies sent without a Content-Encoding are read by http.client straight
+        from the socket into buffer, skipping the bytes objects urllib3 would
+        create; anything encoded goes through urllib3 to be decoded. A truncated
+        or broken body raises requests.ConnectionError, which is retried.
+        """
+        raw = response.raw
+        fp = getattr(raw, "_fp", None)
+        try:
+            if fp is None or "Content-Encoding" in response.headers:
+                data = raw.read(len(buffer), decode_content=True)
+                count = len(data)
+                buffer[:count] = data
+            else:
+                count = fp.readinto(buffer)
+        except (http.client.HTTPException, urllib3.exceptions.HTTPError) as e:
+            # IncompleteRead, ProtocolError, ReadTimeoutError... are not requests exceptions
+            raise requests.ConnectionError(f"Reading the response failed: {e!r}")
+        if not count:
+            # Whole body read - hand the connection back to the keep-alive pool
+            raw.release_conn()
+        return count
+
+
+transport = RequestsTransport()
+
+
+class ResponseStream(io.RawIOBase):
+    """Read-only file object over an open() response, for consumers such as tarfile.
+
+    on_read(view) sees every block as it arrives.
+    """
+
+    def __init__(self, response, on_read=None):
+        self.response = response
+        self.on_read = on_read
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = transport.readinto(self.response, buffer)
+        if count and self.on_read:
+            self.on_read(memoryview(buffer)[:count])
+        return count
+
+
+def set_transport(new_transport):
+    """Replace the transport used by the download engine"""
+    global transport
+    transport = new_transport
+
+
+def set_concurrent_jobs(count):
+    """Size the per-host connection pools for count jobs downloading at the same time"""
+    job_slots["count"] = max(1, count)
+    resize = getattr(transport, "resize", None)
+    if resize:
+        resize(job_slots["count"])
+
 
 def get_filename_from_url(url):
     """Extract filename from URL, removing query parameters"""
@@ -28,149 +365,1197 @@ def get_filename_from_url(url):
     return filename
 
 
-def download_files(urls_array, base_path, hf_token=""):
-    """Download files from URLs array using wget with log file output"""
-    num_urls = len(urls_array)
-    print(f"Found {num_urls} URLs to download")
+def format_size(num_bytes):
+    """Format a byte count for display"""
+    size = float(num_bytes)
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TB"
 
-    # Create log file for wget progress
-    log_file = os.path.join(tempfile.gettempdir(), 'wget_progress.log')
-    
-    results = []
-    for idx, entry in enumerate(urls_array, 1):
-        url = entry["url"]
-        directory = os.path.join(base_path, entry["directory"].lstrip('/'))
-        provided_filename = entry["filename"]
 
-        os.makedirs(directory, exist_ok=True)
+def format_progress(filename, bytes_done, bytes_total, rate):
+    """Build the progress line shown in the UI for a running download"""
+    if bytes_total:
+        percent = bytes_done * 100 / bytes_total
+        line = f"{filename}: {percent:.1f}% ({format_size(bytes_done)} / {format_size(bytes_total)})"
+    else:
+        line = f"{filename}: {format_size(bytes_done)}"
+    if rate:
+        line += f" {format_size(rate)}/s"
+        if bytes_total and bytes_done < bytes_total:
+            line += f" eta {int((bytes_total - bytes_done) / rate)}s"
+    return line
 
-        if provided_filename:
-            filename = provided_filename
-            print(filename)
-        else:
-            filename = get_filename_from_url(url)
-            print(filename)
 
-        full_path = os.path.join(directory, filename)
-        print(full_path)
-        # Update progress with current file (idx is 1-based, so idx-1 for 0-based current)
-        current_operation['current'] = idx - 1
-        current_operation['current_file'] = filename
-        current_operation['current_progress'] = f"Checking {filename}..."
+def smooth_rate(average, rate, seconds):
+    """Exponential moving average of a rate, weighting the new sample by the seconds it covers"""
+    if not average:
+        return rate
+    weight = 1 - math.exp(-seconds / RATE_SMOOTHING)
+    return average + weight * (rate - average)
 
-        if os.path.exists(full_path):
-            message = f"File already exists: {full_path} - Skipping download..."
-            print(message)
-            results.append({"status": "skipped", "file": filename, "message": message})
-            current_operation['progress'] = results
-            current_operation['current_progress'] = f"{filename}: File already exists - skipped"
-            # Update current to show this file as processed
-            current_operation['current'] = idx
+
+def estimate_eta(bytes_done, bytes_total, rate):
+    """Seconds left at rate, or None when the size or rate is unknown"""
+    if not rate or not bytes_total:
+        return None
+    return max(0, bytes_total - bytes_done) / rate
+
+
+def build_headers(hf_token=""):
+    """Request headers shared by every download request"""
+    headers = {"Accept-Encoding": "identity"}
+    if hf_token:
+        headers["Authorization"] = f"Bearer {hf_token}"
+    return headers
+
+
+def probe_url(url, headers):
+    """Probe a URL, following redirects one hop at a time.
+
+    Returns a dict with the final url, size, accepts_ranges, etag and
+    last_modified, plus the linked_size / linked_etag Hugging Face reports on its
+    resolve/ redirect. Results are cached per URL (HF URLs carry the revision) and
+    credentials for RESOLVE_TTL seconds, so repeat checks and the files of a
+    package skip the TLS handshake and redirect round trip.
+    """
+    key = (url, headers.get("Authorization", ""))
+    with resolve_lock:
+        cached = resolve_cache.get(key)
+        if cached and cached["expires"] > time.time():
+            return dict(cached["info"])
+
+    info = {"linked_size": 0, "linked_etag": ""}
+    current = url
+    for hop in range(MAX_REDIRECTS + 1):
+        started = time.time()
+        response = transport.head(current, headers_for(url, current, headers), allow_redirects=False)
+        response.close()
+        if hop == 0:
+            update_host_stats(urlparse(url).netloc, latency=time.time() - started)
+        if response.headers.get('X-Linked-Size') and not info["linked_size"]:
+            info["linked_size"] = int(response.headers['X-Linked-Size'])
+        if response.headers.get('X-Linked-Etag') and not info["linked_etag"]:
+            info["linked_etag"] = response.headers['X-Linked-Etag']
+        if response.status_code in (301, 302, 303, 307, 308) and response.headers.get('Location'):
+            current = urljoin(current, response.headers['Location'])
             continue
+        break
+    else:
+        raise requests.TooManyRedirects(f"Exceeded {MAX_REDIRECTS} redirects probing {url}")
+
+    info.update({
+        "url": current,
+        "size": int(response.headers.get('Content-Length') or 0) or info["linked_size"],
+        "accepts_ranges": response.headers.get('Accept-Ranges', '').lower() == 'bytes',
+        "etag": response.headers.get('ETag', ''),
+        "last_modified": response.headers.get('Last-Modified', '')
+    })
+    with resolve_lock:
+        resolve_cache[key] = {"info": dict(info), "expires": time.time() + RESOLVE_TTL}
+    return info
+
+
+def update_host_stats(host, **samples):
+    """Fold new latency (seconds) / rate (bytes/s) samples into the moving averages of host"""
+    with host_stats_lock:
+        stats = host_stats.setdefault(host, {"latency": 0.0, "rate": 0.0, "failures": 0})
+        for key, value in samples.items():
+            stats[key] = value if not stats[key] else stats[key] + HOST_STATS_WEIGHT * (value - stats[key])
+
 
-        print(f"Downloading: {filename}")
-        
-        # Update status to show starting download
-        results.append({"status": "downloading", "file": filename, "message": f"Starting download: {filename}"})
-        current_operation['progress'] = results
-        current_operation['current_progress'] = f"{filename}: Starting download..."
+def record_host_throughput(host, num_bytes, seconds):
+    """Remember how fast a transfer from host went"""
+    if num_bytes > 0 and seconds > 0:
+        update_host_stats(host, rate=num_bytes / seconds)
 
 
+def record_host_failure(host):
+    """Count a failed or degraded transfer against host so it ranks lower next time"""
+    with host_stats_lock:
+        stats = host_stats.setdefault(host, {"latency": 0.0, "rate": 0.0, "failures": 0})
+        stats["failures"] += 1
+        stats["rate"] *= FAILURE_PENALTY
 
+
+def host_rate(url):
+    """Average throughput seen from the host of url, 0 if unknown"""
+    with host_stats_lock:
+        return host_stats.get(urlparse(url).netloc, {}).get("rate", 0.0)
+
+
+def sample_throughput(source, url, headers):
+    """Time a short ranged GET of url and record the throughput for the host of source"""
+    response = transport.open(url, dict(headers, Range=f"bytes=0-{SAMPLE_BYTES - 1}"))
+    started = time.time()
+    buffer = buffer_pool.get()
+    received = 0
+    try:
+        while received < SAMPLE_BYTES:
+            count = transport.readinto(response, buffer[:min(len(buffer), SAMPLE_BYTES - received)])
+            if not count:
+                break
+            received += count
+    finally:
+        response.close()
+        buffer_pool.put(buffer)
+    record_host_throughput(urlparse(source).netloc, received, max(time.time() - started, 0.001))
+
+
+def rank_sources(url, mirrors, headers):
+    """Order url and its mirrors fastest first.
+
+    Every source is probed concurrently, and hosts without throughput history get
+    a short sample download. Sources that fail the probe or report a different
+    size than the first one that answered are dropped. The rest are sorted by
+    expected time: host latency plus size / host throughput, unmeasured last.
+    """
+    sources = [url] + [mirror for mirror in mirrors if mirror != url]
+
+    def measure(source):
+        source_headers = headers_for(url, source, headers)
         try:
-            if sys.platform == 'win32':
-                cmd = ["curl", "-L", "--progress-bar", "-o", full_path]
-                if hf_token:
-                    cmd.extend(["-H", f"Authorization: Bearer {hf_token}"])
-                cmd.append(url)
-            else:
-                cmd = ["wget", "--progress=bar:noscroll"]
-                if hf_token:
-                    cmd.extend(["--header", f"Authorization: Bearer {hf_token}"])
-                cmd.extend(["-O", full_path, url])
-            
-            print(f"Command: {' '.join(cmd)}")
-            
-            with open(log_file, 'w') as log:
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    universal_newlines=True
-                )
-                
-                current_line = ""
-                for char in iter(lambda: process.stdout.read(1), ''):
-                    if char == '\r':
-                        # Carriage return - write current line and reset
-                        if current_line.strip():
-                            log.write(current_line.strip() + '\n') #filename + '\t' + 
-                            log.flush()
-                        current_line = ""
-                    elif char == '\n':
-                        # New line
-                        if current_line.strip():
-                            log.write(current_line.strip() + '\n')
-                            log.flush()
-                        current_line = ""
-                    else:
-                        current_line += char
-                
-                # Write any remaining content
-                if current_line.strip():
-                    log.write(current_line.strip() + '\n')
-                
-                return_code = process.wait()
-                
-            if return_code == 0:
-                message = f"Successfully downloaded: {filename}"
-                print(message)
-                # Update the last result entry
-                results[-1] = {"status": "success", "file": filename, "message": message}
-                current_operation['current_progress'] = f"{filename}: Download completed successfully"
-                # Update current to show this file as processed
-                current_operation['current'] = idx
+            info = probe_url(source, source_headers)
+            if not host_rate(source):
+                sample_throughput(source, info["url"], headers_for(source, info["url"], source_headers))
+            return info
+        except (requests.RequestException, IOError) as e:
+            print(f"Source {source} unavailable: {e}")
+            record_host_failure(urlparse(source).netloc)
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(sources))) as pool:
+        infos = list(pool.map(measure, sources))
+    available = [(source, info) for source, info in zip(sources, infos) if info is not None]
+    if not available:
+        # Let the download itself report what is wrong
+        return sources
+
+    size = next((info["size"] for _, info in available if info["size"]), 0)
+    ranked = []
+    for source, info in available:
+        if size and info["size"] and info["size"] != size:
+            print(f"Skipping {source}: size {info['size']} does not match {size}")
+            continue
+        ranked.append(source)
+
+    def expected_seconds(source):
+        with host_stats_lock:
+            stats = host_stats.get(urlparse(source).netloc, {})
+        rate = stats.get("rate", 0)
+        return stats.get("latency", 0) + size / rate if rate else float("inf")
+
+    ranked.sort(key=expected_seconds)
+    print("Sources by expected speed: " + ", ".join(urlparse(source).netloc for source in ranked))
+    return ranked
+
+
+def failover_rate(source, sources):
+    """Throughput below which source counts as degraded, from the best alternative's history"""
+    others = [host_rate(other) for other in sources if other != source]
+    return DEGRADE_FRACTION * max(others) if others else 0
+
+
+def check_degraded(num_bytes, seconds, min_rate):
+    """Raise SourceDegraded when num_bytes in seconds is below min_rate (relaxed under a bandwidth limit)"""
+    limit = bandwidth_limiter.current_rate()
+    floor = min(min_rate, limit * DEGRADE_FRACTION) if limit else min_rate
+    rate = num_bytes / seconds
+    if rate < floor:
+        raise SourceDegraded(f"Source slowed to {format_size(rate)}/s, an alternative managed {format_size(floor / DEGRADE_FRACTION)}/s")
+
+
+def cached_probe(url):
+    """Cached probe of url under any credentials, or None - never touches the network"""
+    now = time.time()
+    with resolve_lock:
+        for (cached_url, _), cached in resolve_cache.items():
+            if cached_url == url and cached["expires"] > now:
+                return dict(cached["info"])
+    return None
+
+
+def forget_probe(url, headers):
+    """Drop the cached probe of a URL, e.g. after its signed CDN URL was rejected"""
+    with resolve_lock:
+        resolve_cache.pop((url, headers.get("Authorization", "")), None)
+
+
+def headers_for(url, final_url, headers):
+    """Drop the HF token when talking to a different host (signed CDN URLs reject it)"""
+    if urlparse(url).netloc == urlparse(final_url).netloc:
+        return headers
+    return {k: v for k, v in headers.items() if k != "Authorization"}
+
+
+def is_retryable(error):
+    """Network hiccups and server errors are worth another attempt, client errors are not"""
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, (requests.RequestException, IOError))
+
+
+def merge_ranges(ranges):
+    """Merge overlapping [start, end) byte ranges"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(done, size):
+    """Return the [start, end) ranges of a file of the given size not covered by done"""
+    missing = []
+    position = 0
+    for start, end in merge_ranges(done):
+        if start > position:
+            missing.append((position, start))
+        position = max(position, end)
+    if position < size:
+        missing.append((position, size))
+    return missing
+
+
+def contiguous_prefix(ranges):
+    """Length of the run of bytes starting at offset 0 covered by ranges"""
+    merged = merge_ranges(ranges)
+    return merged[0][1] if merged and merged[0][0] == 0 else 0
+
+
+def hash_range(f, digest, start, end):
+    """Feed bytes [start, end) of an open file into digest"""
+    buffer = buffer_pool.get()
+    try:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            count = f.readinto(buffer[:min(len(buffer), remaining)])
+            if not count:
+                raise IOError(f"Unexpected end of file at byte {end - remaining}")
+            digest.update(buffer[:count])
+            remaining -= count
+    finally:
+        buffer_pool.put(buffer)
+
+
+def open_part(part_path, truncate=False):
+    """Open part_path for positional writes, returning a raw file descriptor"""
+    flags = os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0)
+    if truncate:
+        flags |= os.O_TRUNC
+    return os.open(part_path, flags, 0o644)
+
+
+def preallocate(fd, size):
+    """Reserve size bytes for fd up front, so the filesystem can lay the file out contiguously"""
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            # Not supported by this filesystem - a sparse file still works
+            pass
+    if os.fstat(fd).st_size < size:
+        os.ftruncate(fd, size)
+
+
+def write_at(fd, view, offset):
+    """Write all of view at offset without moving a shared file position"""
+    while view:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+def read_part_meta(meta_path):
+    """Load the sidecar of a .part file, or None if there is no usable one"""
+    try:
+        with open(meta_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_part_meta(meta_path, meta):
+    """Atomically replace the sidecar of a .part file"""
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def remove_part(full_path):
+    """Remove the .part file of full_path and its sidecar"""
+    for path in (full_path + PART_SUFFIX, full_path + PART_SUFFIX + META_SUFFIX):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def resume_point(full_path, info, source="", sources=()):
+    """Return (done_ranges, segmented) for the .part file of full_path, or ([], False) to start over.
+
+    A .part file is only trusted when its sidecar records the same size and
+    validator (ETag or Last-Modified) the server reports now. Mirrors have
+    validators of their own, so a .part written from another of the declared
+    sources only needs the same size.
+    """
+    part_path = full_path + PART_SUFFIX
+    meta = read_part_meta(part_path + META_SUFFIX)
+    if not meta or not os.path.exists(part_path):
+        remove_part(full_path)
+        return [], False
+
+    same_size = meta.get("size") == info["size"] and info["size"] > 0
+    same_validator = (meta.get("etag") or meta.get("last_modified")) == (info["etag"] or info["last_modified"])
+    if meta.get("url") != source and meta.get("url") in sources:
+        same_validator = True
+    if not same_size or not same_validator:
+        print(f"Discarding stale partial download of {os.path.basename(full_path)}")
+        remove_part(full_path)
+        return [], False
+
+    if meta.get("segmented") or meta.get("preallocated"):
+        # The .part file is preallocated, so only the sidecar knows what is done
+        return merge_ranges(meta.get("done", [])), bool(meta.get("segmented"))
+    part_size = os.path.getsize(part_path)
+    return ([[0, part_size]] if part_size else []), False
+
+
+def download_file(url, full_path, hf_token="", progress_callback=None, cancel_event=None, expected_sha256="",
+                  mirrors=()):
+    """Download a URL to full_path, calling progress_callback(bytes_done, bytes_total, rate).
+
+    Bytes go to full_path + PART_SUFFIX next to a sidecar recording the expected
+    size and validator, so an interrupted download continues with a Range request
+    where it stopped. Large files on servers that accept byte ranges are fetched
+    over several connections. The file is renamed into place only once complete.
+    Setting cancel_event stops the transfer with DownloadCancelled, keeping the
+    .part file for a later resume.
+
+    When a SHA-256 is known (expected_sha256, else HF's X-Linked-Etag) the bytes
+    are hashed while they stream in and a mismatch discards the .part file and
+    retries, so a corrupted file never reaches full_path.
+
+    mirrors lists other sources of the same file. Sources are tried fastest
+    first (see rank_sources); when one fails, or falls far behind what another
+    source has delivered, the next one resumes the .part file.
+    """
+    headers = build_headers(hf_token)
+    part_path = full_path + PART_SUFFIX
+    declared = [url] + list(mirrors)
+    sources = rank_sources(url, mirrors, headers) if mirrors else [url]
+    attempts = DOWNLOAD_RETRIES + len(sources) - 1
+
+    for attempt in range(1, attempts + 1):
+        source = sources[0]
+        source_headers = headers_for(url, source, headers)
+        transfer = {"start": 0, "bytes": 0, "time": time.time()}
+
+        def report(bytes_done, bytes_total, rate):
+            transfer["bytes"] = bytes_done
+            if progress_callback:
+                progress_callback(bytes_done, bytes_total, rate)
+
+        try:
+            try:
+                info = probe_url(source, source_headers)
+            except requests.RequestException as e:
+                # Some servers reject HEAD - the plain GET below reports real errors
+                print(f"Probe failed for {source} ({e}) - using a single stream")
+                info = {"url": source, "size": 0, "accepts_ranges": False, "etag": "", "last_modified": "",
+                        "linked_size": 0, "linked_etag": ""}
+
+            expected = (expected_sha256 or sha256_from_etag(info["linked_etag"])).lower()
+            digest = hashlib.sha256() if VERIFY_CHECKSUMS and expected else None
+
+            done, was_segmented = resume_point(full_path, info, source, declared) if info["accepts_ranges"] else ([], False)
+            if not done:
+                remove_part(full_path)
+            elif attempt == 1:
+                print(f"Resuming {os.path.basename(full_path)} from {format_size(sum(e - s for s, e in done))}")
+            transfer["start"] = transfer["bytes"] = sum(e - s for s, e in done)
+
+            meta = {
+                "url": source,
+                "size": info["size"],
+                "etag": info["etag"],
+                "last_modified": info["last_modified"],
+                "segmented": False,
+                "done": done
+            }
+            min_rate = failover_rate(source, sources)
+            final_headers = headers_for(source, info["url"], source_headers)
+            if info["accepts_ranges"] and info["size"] and (info["size"] >= SEGMENT_THRESHOLD or was_segmented):
+                try:
+                    meta["segmented"] = True
+                    write_part_meta(part_path + META_SUFFIX, meta)
+                    download_segmented(info["url"], part_path, info["size"], done, final_headers, meta, report,
+                                       cancel_event, digest, min_rate)
+                except RangeNotSupported as e:
+                    print(f"{e} - falling back to a single stream")
+                    remove_part(full_path)
+                    meta.update(segmented=False, done=[])
+                    write_part_meta(part_path + META_SUFFIX, meta)
+                    if digest is not None:
+                        digest = hashlib.sha256()
+                    transfer["start"] = 0
+                    download_single(info["url"], part_path, final_headers, 0, meta, report, cancel_event,
+                                    digest, min_rate)
             else:
-                message = f"Download failed for {filename} (exit code: {return_code})"
-                print(message)
-                results[-1] = {"status": "error", "file": filename, "message": message}
-                current_operation['current_progress'] = f"{filename}: Download failed (exit code: {return_code})"
-                # Update current to show this file as processed
-                current_operation['current'] = idx
+                offset = done[0][1] if done else 0
+                write_part_meta(part_path + META_SUFFIX, meta)
+                download_single(info["url"], part_path, final_headers, offset, meta, report, cancel_event,
+                                digest, min_rate)
+
+            if digest is not None:
+                actual = digest.hexdigest()
+                if actual != expected:
+                    remove_part(full_path)
+                    raise ChecksumMismatch(f"SHA-256 mismatch for {os.path.basename(full_path)}: "
+                                           f"expected {expected}, got {actual}")
+                print(f"Verified SHA-256 of {os.path.basename(full_path)}")
+
+            os.replace(part_path, full_path)
+            os.remove(part_path + META_SUFFIX)
+            return os.path.getsize(full_path)
 
-        except subprocess.CalledProcessError as e:
-            message = f"Error downloading {url}: {e}"
-            print(message)
-            results[-1] = {"status": "error", "file": filename, "message": message}
-            current_operation['current_progress'] = f"{filename}: Download error - {e}"
-            # Update current to show this file as processed
-            current_operation['current'] = idx
         except Exception as e:
-            message = f"Unexpected error with {url}: {e}"
+            # Re-resolve on the next attempt in case the cached CDN URL expired
+            forget_probe(source, source_headers)
+            # Nothing useful on disk yet - do not leave an empty .part behind
+            if not os.path.exists(part_path) or os.path.getsize(part_path) == 0:
+                remove_part(full_path)
+            if cancel_event and cancel_event.is_set():
+                raise
+            record_host_failure(urlparse(source).netloc)
+            if not is_retryable(e):
+                # This source is unusable, but a mirror may still have the file
+                sources.remove(source)
+            elif len(sources) > 1:
+                sources.append(sources.pop(0))
+            if attempt == attempts or not sources:
+                raise
+            if sources[0] != source:
+                print(f"{os.path.basename(full_path)} from {urlparse(source).netloc} failed: {e} - "
+                      f"switching to {urlparse(sources[0]).netloc}")
+            else:
+                print(f"Attempt {attempt} for {os.path.basename(full_path)} failed: {e} - resuming")
+                time.sleep(RETRY_DELAY * attempt)
+
+        finally:
+            record_host_throughput(urlparse(source).netloc, transfer["bytes"] - transfer["start"],
+                                   time.time() - transfer["time"])
+
+
+def download_single(url, part_path, headers, offset, meta, progress_callback=None, cancel_event=None, digest=None,
+                    min_rate=0):
+    """Stream a URL into part_path over one connection, continuing at offset when possible.
+
+    When the size is known the .part file is preallocated and progress is
+    checkpointed to the sidecar. Written bytes are fed into digest; on resume
+    the kept prefix is hashed first. Raises SourceDegraded if throughput stays
+    below min_rate for DEGRADE_WINDOW seconds.
+    """
+    if offset:
+        validator = meta.get("etag") or meta.get("last_modified")
+        headers = dict(headers, Range=f"bytes={offset}-")
+        if validator and not validator.startswith('W/'):
+            headers["If-Range"] = validator
+
+    response = transport.open(url, headers)
+    buffer = buffer_pool.get()
+    fd = None
+    try:
+        if offset and response.status_code != 206:
+            # Server sent the whole file (validator changed or no range support)
+            offset = 0
+        content_length = int(response.headers.get('Content-Length') or 0)
+        bytes_total = offset + content_length if content_length else 0
+        bytes_done = offset
+        last_report = checkpoint_time = window_time = time.time()
+        last_bytes = window_bytes = bytes_done
+
+        if digest is not None and offset:
+            with open(part_path, 'rb') as f:
+                hash_range(f, digest, 0, offset)
+
+        fd = open_part(part_path, truncate=not offset)
+        if bytes_total:
+            preallocate(fd, bytes_total)
+            meta["preallocated"] = True
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled()
+            count = transport.readinto(response, buffer)
+            if not count:
+                break
+            bandwidth_limiter.consume(count)
+            write_at(fd, buffer[:count], bytes_done)
+            if digest is not None:
+                digest.update(buffer[:count])
+            bytes_done += count
+
+            now = time.time()
+            if progress_callback and now - last_report >= PROGRESS_INTERVAL:
+                rate = (bytes_done - last_bytes) / (now - last_report)
+                progress_callback(bytes_done, bytes_total, rate)
+                last_report = now
+                last_bytes = bytes_done
+            if meta.get("preallocated") and now - checkpoint_time >= CHECKPOINT_INTERVAL:
+                meta["done"] = [[0, bytes_done]]
+                write_part_meta(part_path + META_SUFFIX, meta)
+                checkpoint_time = now
+            if min_rate and now - window_time >= DEGRADE_WINDOW:
+                check_degraded(bytes_done - window_bytes, now - window_time, min_rate)
+                window_time = now
+                window_bytes = bytes_done
+
+        if bytes_total and bytes_done != bytes_total:
+            raise IOError(f"Connection closed after {bytes_done} of {bytes_total} bytes")
+    finally:
+        response.close()
+        buffer_pool.put(buffer)
+        if fd is not None:
+            os.close(fd)
+            if meta.get("preallocated"):
+                # The file size says nothing once preallocated - record how far we got
+                meta["done"] = [[0, bytes_done]] if bytes_done else []
+                write_part_meta(part_path + META_SUFFIX, meta)
+
+    if progress_callback:
+        progress_callback(bytes_done, bytes_total, 0)
+
+
+def download_segmented(url, part_path, size, done, headers, meta, progress_callback=None, cancel_event=None,
+                       digest=None, min_rate=0):
+    """Download the missing byte ranges of url in parallel straight into part_path.
+
+    Starts with the connection count that worked best for this host last time and
+    keeps adding connections while each one still raises measured throughput.
+    Completed ranges are checkpointed to the sidecar so a restart loses little.
+    Ranges finish out of order, so digest is fed by reading back the completed
+    prefix of the file in order while it is still in the page cache. Raises
+    SourceDegraded if throughput stays below min_rate for DEGRADE_WINDOW seconds.
+    """
+    host = urlparse(url).netloc
+    pending = collections.deque(
+        (start, min(start + SEGMENT_SIZE, end) - 1)
+        for range_start, end in missing_ranges(done, size)
+        for start in range(range_start, end, SEGMENT_SIZE)
+    )
+    done = [list(r) for r in done]
+    inflight = {}
+    lock = threading.Lock()
+    stop = threading.Event()
+    state = {"bytes_done": sum(end - start for start, end in done), "failures": 0, "error": None}
+
+    if not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+        fd = open_part(part_path, truncate=True)
+        try:
+            preallocate(fd, size)
+        finally:
+            os.close(fd)
+    meta["preallocated"] = True
+
+    def checkpoint():
+        with lock:
+            ranges = done + [[start, position] for start, position in inflight.values() if position > start]
+            meta["done"] = merge_ranges(ranges)
+        write_part_meta(part_path + META_SUFFIX, meta)
+
+    def fetch_segments():
+        worker_id = threading.get_ident()
+        buffer = buffer_pool.get()
+        fd = open_part(part_path)
+        attempt = 0     # Failures of this connection since its last completed range
+        try:
+            while not stop.is_set():
+                with lock:
+                    if not pending:
+                        return
+                    start, end = pending.popleft()
+                    inflight[worker_id] = (start, start)
+                position = start
+                try:
+                    response = transport.open(url, dict(headers, Range=f"bytes={start}-{end}"))
+                    try:
+                        if response.status_code != 206:
+                            with lock:
+                                state["error"] = RangeNotSupported(f"Server ignored range request (HTTP {response.status_code})")
+                            stop.set()
+                            return
+                        while not stop.is_set():
+                            count = transport.readinto(response, buffer)
+                            if not count:
+                                break
+                            bandwidth_limiter.consume(count)
+                            write_at(fd, buffer[:count], position)
+                            position += count
+                            with lock:
+                                state["bytes_done"] += count
+                                inflight[worker_id] = (start, position)
+                    finally:
+                        response.close()
+                    if position <= end and not stop.is_set():
+                        raise IOError(f"Connection closed at byte {position} of range {start}-{end}")
+                    with lock:
+                        del inflight[worker_id]
+                        done.append([start, position])
+                    attempt = 0
+                except Exception as e:
+                    with lock:
+                        inflight.pop(worker_id, None)
+                        if position > start:
+                            done.append([start, position])
+                        state["failures"] += 1
+                        if not is_retryable(e) or state["failures"] > SEGMENT_RETRIES * MAX_CONNECTIONS:
+                            state["error"] = e
+                            stop.set()
+                            return
+                        # Hand the unfinished part of the range to the next free connection
+                        pending.appendleft((position, end))
+                    attempt += 1
+                    print(f"Segment {start}-{end} interrupted at {position}: {e} - retrying")
+                    # Back off like the single-stream path; stop (cancel, failure elsewhere) cuts the wait short
+                    stop.wait(RETRY_DELAY * attempt)
+        finally:
+            os.close(fd)
+            buffer_pool.put(buffer)
+
+    def add_worker():
+        worker = threading.Thread(target=fetch_segments)
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+
+    workers = []
+    ranges = len(pending)
+    connections = host_connections.get(host, MIN_CONNECTIONS)
+    for _ in range(min(connections, ranges)):
+        add_worker()
+    print(f"Segmented download: {ranges} ranges over {len(workers)} connections")
+
+    best_rate = 0
+    growing = True
+    hashed = 0
+    reader = open(part_path, 'rb') if digest is not None else None
+    tune_bytes = report_bytes = window_bytes = state["bytes_done"]
+    tune_time = report_time = checkpoint_time = window_time = time.time()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            stop.wait(0.25)
+            if cancel_event is not None and cancel_event.is_set():
+                stop.set()
+            now = time.time()
+            with lock:
+                bytes_done = state["bytes_done"]
+                remaining = len(pending)
+                finished = [list(r) for r in done]
+
+            if reader is not None:
+                frontier = contiguous_prefix(finished)
+                if frontier > hashed:
+                    hash_range(reader, digest, hashed, frontier)
+                    hashed = frontier
+
+            if progress_callback and now - report_time >= PROGRESS_INTERVAL:
+                progress_callback(bytes_done, size, (bytes_done - report_bytes) / (now - report_time))
+                report_bytes = bytes_done
+                report_time = now
+
+            if now - checkpoint_time >= CHECKPOINT_INTERVAL:
+                checkpoint()
+                checkpoint_time = now
+
+            if min_rate and now - window_time >= DEGRADE_WINDOW:
+                try:
+                    check_degraded(bytes_done - window_bytes, now - window_time, min_rate)
+                except SourceDegraded as e:
+                    with lock:
+                        state["error"] = e
+                    break
+                window_time = now
+                window_bytes = bytes_done
+
+            if not growing or now - tune_time < TUNE_INTERVAL:
+                continue
+            rate = (bytes_done - tune_bytes) / (now - tune_time)
+            tune_bytes = bytes_done
+            tune_time = now
+
+            # Hill-climb: keep adding connections while each one pays for itself
+            active = sum(1 for worker in workers if worker.is_alive())
+            if rate > best_rate * TUNE_GAIN:
+                best_rate = rate
+                host_connections[host] = active
+                if active < MAX_CONNECTIONS and remaining > 0:
+                    add_worker()
+            else:
+                growing = False
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+        checkpoint()
+        if reader is not None:
+            reader.close()
+
+    if cancel_event is not None and cancel_event.is_set():
+        raise DownloadCancelled()
+    if isinstance(state["error"], (RangeNotSupported, SourceDegraded)) or (
+            state["error"] and not is_retryable(state["error"])):
+        # Not wrapped in IOError, which would make a client error look retryable
+        raise state["error"]
+    if state["error"]:
+        raise IOError(f"Segmented download failed: {state['error']}")
+    if missing_ranges(meta["done"], size):
+        raise IOError(f"Segmented download incomplete: {state['bytes_done']} of {size} bytes")
+    if digest is not None:
+        with open(part_path, 'rb') as reader:
+            hash_range(reader, digest, hashed, size)
+
+    if progress_callback:
+        progress_callback(size, size, 0)
+
+
+def record_throughput(num_bytes, seconds):
+    """Remember how fast a finished package download went"""
+    if num_bytes > 0 and seconds > 0:
+        throughput_history.append((num_bytes, seconds))
+
+
+def recent_throughput():
+    """Expected download rate in bytes/s from recent packages and the bandwidth limit, 0 if unknown"""
+    samples = list(throughput_history)
+    seconds = sum(s for _, s in samples)
+    rate = sum(b for b, _ in samples) / seconds if seconds else 0
+    limit = bandwidth_limiter.current_rate()
+    if limit:
+        rate = min(rate, limit) if rate else limit
+    return rate
+
+
+def partial_bytes(full_path, size):
+    """Bytes already in a usable .part file of full_path, as a resume would keep them"""
+    part_path = full_path + PART_SUFFIX
+    meta = read_part_meta(part_path + META_SUFFIX)
+    if not meta or not os.path.exists(part_path) or meta.get("size") != size:
+        return 0
+    if meta.get("segmented") or meta.get("preallocated"):
+        return sum(end - start for start, end in merge_ranges(meta.get("done", [])))
+    return os.path.getsize(part_path)
+
+
+def preflight(files, base_path, hf_token=""):
+    """Probe every file of a package at once before downloading.
+
+    Returns per-file sizes and presence on disk, the package totals and an ETA
+    from recent measured throughput (None until something was measured). Probes
+    go through the probe_url cache, so repeating a pre-flight costs no requests.
+    """
+    headers = build_headers(hf_token)
+
+    def check(entry):
+        filename, full_path = resolve_target(entry, base_path)
+        result = {"file": filename, "path": full_path, "size": 0, "present": False, "partial_bytes": 0, "error": ""}
+        if is_installed(entry, full_path):
+            result.update(size=installed_size(entry, full_path), present=True)
+            return result
+        try:
+            result["size"] = probe_url(entry["url"], headers)["size"]
+        except requests.RequestException as e:
+            result["error"] = str(e)
+        result["partial_bytes"] = partial_bytes(full_path, result["size"])
+        return result
+
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as pool:
+        checked = list(pool.map(check, files))
+
+    total_bytes = sum(f["size"] for f in checked)
+    present_bytes = sum(f["size"] for f in checked if f["present"])
+    missing_bytes = sum(f["size"] - f["partial_bytes"] for f in checked if not f["present"])
+    rate = recent_throughput()
+    return {
+        "files": checked,
+        "total_bytes": total_bytes,
+        "present_bytes": present_bytes,
+        "missing_bytes": missing_bytes,
+        "present": sum(1 for f in checked if f["present"]),
+        "unknown_sizes": sum(1 for f in checked if not f["present"] and not f["size"]),
+        "rate": rate,
+        "eta": missing_bytes / rate if rate else None
+    }
+
+
+def resolve_target(entry, base_path):
+    """Return (filename, full_path) for a config file entry"""
+    directory = os.path.join(base_path, entry["directory"].lstrip('/'))
+    filename = entry["filename"] if entry.get("filename") else get_filename_from_url(entry["url"])
+    return filename, os.path.join(directory, filename)
+
+
+def is_installed(entry, full_path):
+    """True when a config entry is on disk - for archives, when all extracted files are"""
+    if entry.get("extract"):
+        return is_extracted(full_path)
+    return os.path.exists(full_path)
+
+
+def installed_size(entry, full_path):
+    """Bytes an installed config entry takes on disk"""
+    if entry.get("extract"):
+        return extracted_size(full_path)
+    return os.path.getsize(full_path)
+
+
+def check_entry(entry, full_path):
+    """Quick integrity check of an installed config entry; returns (status, detail).
+
+    The expected size comes from the entry's "size" or a cached probe of its URL.
+    Archive entries check each file they were extracted to.
+    """
+    if entry.get("extract"):
+        files = read_manifest(full_path)
+        if not files:
+            return "missing", ""
+        for path in files:
+            status, detail = check_file(path)
+            if status != "ok":
+                return status, f"{os.path.basename(path)}: {detail or status}"
+        return "ok", ""
+    info = cached_probe(entry["url"])
+    expected_size = int(entry.get("size") or 0) or (info["size"] if info else 0)
+    return check_file(full_path, expected_size)
+
+
+def stream_tar(source, entry, directory, headers, progress_callback=None, cancel_event=None, buffer=None):
+    """Download a tar archive from source and extract it as it streams in.
+
+    The compressed stream is hashed on the way through and checked against the
+    expected SHA-256 before any extracted file is renamed into place. Returns the
+    staged paths for finish_extraction.
+    """
+    expected = (entry.get("sha256") or "").lower()
+    if not expected:
+        try:
+            expected = sha256_from_etag(probe_url(source, headers)["linked_etag"])
+        except requests.RequestException:
+            pass
+    digest = hashlib.sha256() if VERIFY_CHECKSUMS and expected else None
+
+    response = transport.open(source, headers)
+    try:
+        bytes_total = int(response.headers.get('Content-Length') or 0)
+        state = {"bytes_done": 0, "last_bytes": 0, "last_report": time.time()}
+
+        def check_cancel():
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled()
+
+        def on_read(view):
+            check_cancel()
+            bandwidth_limiter.consume(len(view))
+            if digest is not None:
+                digest.update(view)
+            state["bytes_done"] += len(view)
+            now = time.time()
+            if progress_callback and now - state["last_report"] >= PROGRESS_INTERVAL:
+                rate = (state["bytes_done"] - state["last_bytes"]) / (now - state["last_report"])
+                progress_callback(state["bytes_done"], bytes_total, rate)
+                state["last_report"] = now
+                state["last_bytes"] = state["bytes_done"]
+
+        stream = io.BufferedReader(ResponseStream(response, on_read), CHUNK_SIZE)
+        staged = extract_tar_stream(stream, directory, entry, buffer, check_cancel)
+        try:
+            # Read the end-of-archive padding too, so the hash covers the whole stream
+            while stream.readinto(buffer):
+                pass
+            if bytes_total and state["bytes_done"] != bytes_total:
+                raise IOError(f"Connection closed after {state['bytes_done']} of {bytes_total} bytes")
+            if digest is not None and digest.hexdigest() != expected:
+                raise ChecksumMismatch(f"SHA-256 mismatch for {source}: expected {expected}, got {digest.hexdigest()}")
+        except BaseException:
+            discard_staged(staged)
+            raise
+    finally:
+        response.close()
+
+    if progress_callback:
+        progress_callback(state["bytes_done"], bytes_total, 0)
+    return staged
+
+
+def download_archive(entry, full_path, hf_token="", progress_callback=None, cancel_event=None):
+    """Download an archive entry and unpack it into the directory of full_path; returns the extracted paths.
+
+    Tar archives (any compression) are extracted while they stream in, so the
+    archive never exists on disk. Zip archives need their central directory, so
+    they are downloaded resumably to full_path first, extracted one member at a
+    time and then removed. Only members selected by the entry are kept (see
+    model_extract.member_target).
+    """
+    directory = os.path.dirname(full_path)
+    buffer = buffer_pool.get()
+
+    def check_cancel():
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled()
+
+    try:
+        if archive_format(entry, os.path.basename(full_path)) == "zip":
+            if not os.path.exists(full_path):
+                download_file(entry["url"], full_path, hf_token, progress_callback, cancel_event,
+                              entry.get("sha256", ""), entry.get("mirrors") or ())
+            try:
+                staged = extract_zip(full_path, directory, entry, buffer, check_cancel)
+            except DownloadCancelled:
+                raise
+            except Exception:
+                # Corrupt or unsafe archive - do not keep it for the next attempt
+                os.remove(full_path)
+                raise
+            files = finish_extraction(full_path, staged)
+            os.remove(full_path)
+            return files
+
+        headers = build_headers(hf_token)
+        sources = [entry["url"]] + list(entry.get("mirrors") or ())
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            source = sources[(attempt - 1) % len(sources)]
+            try:
+                staged = stream_tar(source, entry, directory, headers_for(entry["url"], source, headers),
+                                    progress_callback, cancel_event, buffer)
+                return finish_extraction(full_path, staged)
+            except Exception as e:
+                if attempt == DOWNLOAD_RETRIES or not is_retryable(e) or (cancel_event and cancel_event.is_set()):
+                    raise
+                print(f"Attempt {attempt} for {os.path.basename(full_path)} failed: {e} - starting over")
+                time.sleep(RETRY_DELAY * attempt)
+    finally:
+        buffer_pool.put(buffer)
+
+
+def link_existing_copy(entry, full_path, base_path, hf_token=""):
+    """Create full_path from an identical file already under base_path.
+
+    Returns (source_path, method) or None when no copy is known.
+    """
+    if not DEDUP_ENABLED:
+        return None
+    try:
+        info = probe_url(entry["url"], build_headers(hf_token))
+    except requests.RequestException:
+        return None
+    key = content_key(entry, info)
+    if not key or info["size"] < DEDUP_MIN_SIZE:
+        return None
+    source = content_index.find(key, info["size"], base_path)
+    if source is None or os.path.abspath(source) == os.path.abspath(full_path):
+        return None
+    method = link_file(source, full_path)
+    content_index.record(full_path, key, package=not entry.get("custom"))
+    return source, method
+
+
+def record_download(entry, full_path, hf_token=""):
+    """Add a freshly downloaded file to the content index"""
+    if not DEDUP_ENABLED:
+        return
+    try:
+        info = probe_url(entry["url"], build_headers(hf_token))
+        content_index.record(full_path, content_key(entry, info), package=not entry.get("custom"))
+    except (requests.RequestException, OSError) as e:
+        print(f"Could not index {full_path}: {e}")
+
+
+def download_entry(entry, base_path, hf_token="", progress_callback=None, cancel_event=None):
+    """Download one config file entry, calling progress_callback(bytes_done, bytes_total, rate).
+
+    Returns a result dict with status (success/skipped/linked/error/cancelled), file and message.
+    """
+    url = entry["url"]
+    filename, full_path = resolve_target(entry, base_path)
+    print(full_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    try:
+        archive = archive_format(entry, filename)
+    except ValueError as e:
+        print(e)
+        return {"status": "error", "file": filename, "message": str(e)}
+
+    if is_installed(entry, full_path):
+        if archive:
+            message = f"Archive already extracted: {full_path} - Skipping download..."
+        else:
+            message = f"File already exists: {full_path} - Skipping download..."
+        print(message)
+        return {"status": "skipped", "file": filename, "message": message}
+
+    if cancel_event is not None and cancel_event.is_set():
+        return {"status": "cancelled", "file": filename, "message": f"Cancelled: {filename}"}
+
+    linked = None
+    if not archive:
+        try:
+            linked = link_existing_copy(entry, full_path, base_path, hf_token)
+        except OSError as e:
+            print(f"Could not link an existing copy of {filename}: {e}")
+    if linked:
+        message = f"Linked {filename} to existing copy {linked[0]} ({linked[1]})"
+        print(message)
+        return {"status": "linked", "file": filename, "message": message}
+
+    print(f"Downloading: {filename}")
+    try:
+        if archive:
+            files = download_archive(entry, full_path, hf_token, progress_callback, cancel_event)
+            message = f"Successfully extracted {len(files)} file(s) from {filename}"
             print(message)
-            results[-1] = {"status": "error", "file": filename, "message": message}
-            current_operation['current_progress'] = f"{filename}: Unexpected error - {e}"
-            # Update current to show this file as processed
-            current_operation['current'] = idx
-        
-        current_operation['progress'] = results
-    
+            return {"status": "success", "file": filename, "message": message}
+        download_file(url, full_path, hf_token, progress_callback, cancel_event, entry.get("sha256", ""),
+                      entry.get("mirrors") or ())
+        record_download(entry, full_path, hf_token)
+        message = f"Successfully downloaded: {filename}"
+        print(message)
+        return {"status": "success", "file": filename, "message": message}
+    except DownloadCancelled:
+        message = f"Cancelled: {filename} (partial download kept for resume)"
+        print(message)
+        return {"status": "cancelled", "file": filename, "message": message}
+    except requests.RequestException as e:
+        message = f"Download failed for {filename}: {e}"
+        print(message)
+        return {"status": "error", "file": filename, "message": message}
+    except Exception as e:
+        message = f"Unexpected error with {url}: {e}"
+        print(message)
+        return {"status": "error", "file": filename, "message": message}
+
+
+def download_package(files, base_path, hf_token="", operation=None, max_workers=PACKAGE_WORKERS,
+                     order=DOWNLOAD_ORDER, on_result=None, cancel_event=None):
+    """Download the files of a package with a bounded pool of workers.
+
+    A pre-flight probes sizes up front so files can be scheduled in the requested
+    order (see DOWNLOAD_ORDERS) and the package total is known; its report is
+    published in operation['preflight']. Per-file counters are published in
+    operation['files'] and the package totals in operation['bytes_done'] /
+    operation['bytes_total'] with a live operation['eta']. on_result(result) is
+    called as each file finishes; results are returned in config order. Once
+    cancel_event is set, running files stop and queued ones are not started.
+    """
+    if operation is None:
+        operation = new_operation()
+    lock = threading.Lock()
+    results = [None] * len(files)
+    file_states = [
+        {"file": resolve_target(entry, base_path)[0], "status": "queued", "bytes_done": 0, "bytes_total": 0,
+         "rate": 0, "avg_rate": 0, "eta": None}
+        for entry in files
+    ]
+    # Time of the last rate sample per file and for the package
+    sampled = [None] * len(files)
+    package = {"avg_rate": 0, "sampled": None}
+    print(f"Found {len(files)} URLs to download ({max_workers} at a time, {order})")
+
+    checked = preflight(files, base_path, hf_token)
+    sizes = [f["size"] for f in checked["files"]]
+    for state, size in zip(file_states, sizes):
+        state["bytes_total"] = size
+    operation['preflight'] = checked
+
+    indices = list(range(len(files)))
+    if order == "smallest_first":
+        # Unknown sizes go last
+        indices.sort(key=lambda i: (sizes[i] == 0, sizes[i]))
+    elif order == "largest_first":
+        indices.sort(key=lambda i: -sizes[i])
+
+    def publish():
+        # Called with lock held - builds the whole record so /progress only has to serve it
+        now = time.time()
+        active = [s for s in file_states if s["status"] == "downloading"]
+        bytes_done = sum(s["bytes_done"] for s in file_states)
+        bytes_total = sum(s["bytes_total"] for s in file_states)
+        rate = sum(s["rate"] for s in active)
+        if package["sampled"] is not None:
+            package["avg_rate"] = smooth_rate(package["avg_rate"], rate, now - package["sampled"])
+        package["sampled"] = now
+        operation['files'] = [dict(s) for s in file_states]
+        operation['bytes_done'] = bytes_done
+        operation['bytes_total'] = bytes_total
+        operation['rate'] = rate
+        operation['avg_rate'] = package["avg_rate"]
+        operation['eta'] = estimate_eta(bytes_done, bytes_total, package["avg_rate"] or checked["rate"])
+        operation['current'] = sum(1 for s in file_states if s["status"] not in ("queued", "downloading"))
+        if active:
+            operation['current_file'] = ", ".join(s["file"] for s in active)
+            operation['current_progress'] = " | ".join(
+                format_progress(s["file"], s["bytes_done"], s["bytes_total"], s["avg_rate"]) for s in active
+            )
+
+    def run(index):
+        state = file_states[index]
+
+        def report(bytes_done, bytes_total, rate):
+            with lock:
+                now = time.time()
+                state["bytes_done"] = bytes_done
+                state["bytes_total"] = bytes_total or state["bytes_total"]
+                state["rate"] = rate
+                state["avg_rate"] = smooth_rate(state["avg_rate"], rate, now - (sampled[index] or now))
+                state["eta"] = estimate_eta(bytes_done, state["bytes_total"], state["avg_rate"])
+                sampled[index] = now
+                publish()
+
+        with lock:
+            state["status"] = "downloading"
+            publish()
+
+        result = download_entry(files[index], base_path, hf_token, report, cancel_event)
+
+        with lock:
+            state["status"] = result["status"]
+            state["rate"] = 0
+            state["eta"] = None
+            if result["status"] in ("success", "skipped", "linked"):
+                state["bytes_done"] = state["bytes_total"]
+            results[index] = result
+            if on_result:
+                on_result(result)
+            publish()
+
+    with lock:
+        publish()
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        list(pool.map(run, indices))
+
+    # Only bytes that actually came over the network count towards future ETAs
+    record_throughput(
+        sum(f["size"] - f["partial_bytes"] for f, result in zip(checked["files"], results)
+            if result["status"] == "success"),
+        time.time() - started
+    )
     return results
 
 
 def delete_files(urls_array, base_path):
-    """Delete files based on URLs array"""
+    """Delete files based on URLs array; progress is left to the caller's job"""
     num_urls = len(urls_array)
     results = []
 
-    # Clear the wget log file to prevent showing old download messages
-    log_file = os.path.join(tempfile.gettempdir(), 'wget_progress.log')
-    try:
-        with open(log_file, 'w') as log:
-            log.write("Starting file deletion...\n")
-    except:
-        pass
-
     for idx, entry in enumerate(urls_array, 1):
         url = entry["url"]
         directory = os.path.join(base_path, entry["directory"])
@@ -184,36 +1569,41 @@ def delete_files(urls_array, base_path):
         full_path = os.path.join(directory, filename)
 
         print(f"Attempting to delete file {idx} of {num_urls}")
-        
-        # Update current operation progress
-        current_operation['current'] = idx - 1
-        current_operation['current_file'] = filename
-        current_operation['current_progress'] = f"{filename}: Checking for deletion..."
 
-        if os.path.exists(full_path):
+        # Drop any interrupted download of this file as well
+        try:
+            remove_part(full_path)
+        except OSError as e:
+            print(f"Could not remove partial download of {full_path}: {e}")
+
+        extracted = read_manifest(full_path) if entry.get("extract") else None
+        if extracted is not None:
+            # Archive entries own the files they were extracted to
+            try:
+                for path in extracted:
+                    if os.path.exists(path):
+                        os.remove(path)
+                remove_manifest(full_path)
+                message = f"Deleted {len(extracted)} file(s) extracted from {filename}"
+                print(message)
+                results.append({"status": "deleted", "file": filename, "message": message})
+            except Exception as e:
+                message = f"Error deleting files extracted from {filename}: {e}"
+                print(message)
+                results.append({"status": "error", "file": filename, "message": message})
+        elif os.path.exists(full_path):
             try:
                 os.remove(full_path)
                 message = f"Found file {full_path}...deleted!"
                 print(message)
                 results.append({"status": "deleted", "file": filename, "message": message})
-                current_operation['current_progress'] = f"{filename}: Deleted successfully"
-                # Update current to show this file as processed
-                current_operation['current'] = idx
             except Exception as e:
                 message = f"Error deleting {full_path}: {e}"
                 print(message)
                 results.append({"status": "error", "file": filename, "message": message})
-                current_operation['current_progress'] = f"{filename}: Error deleting file - {e}"
-                # Update current to show this file as processed
-                current_operation['current'] = idx
         else:
             message = f"Skipping file {full_path}...not found!"
             print(message)
             results.append({"status": "not_found", "file": filename, "message": message})
-            current_operation['current_progress'] = f"{filename}: File not found - nothing to delete"
-            # Update current to show this file as processed
-            current_operation['current'] = idx
-        
-        current_operation['progress'] = results
-    
+
     return results
\ No newline at end of file
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Events Functions
+Server-Sent Events channel that pushes state changes to every open page
+"""
+
+import asyncio
+import json
+import queue
+import threading
+
+HEARTBEAT_INTERVAL = 15     # Seconds between keep-alive comments on an idle stream
+WATCH_INTERVAL = 0.5        # Seconds between checks of the state sources
+EVENT_QUEUE_SIZE = 500      # Undelivered events per client before it is dropped as too slow
+
+
+class EventBus:
+    """Fans change events out to subscribed SSE clients.
+
+    State is not pushed by the code that changes it: sources are polled by one
+    watcher thread, only while someone is subscribed, and each returns the
+    events for what changed since its last call. Each event is serialized once,
+    however many clients are listening. Sources keep cursors of what they have
+    pushed, so calls to them are serialized by source_lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source_lock = threading.Lock()
+        self.subscribers = []
+        self.sources = []
+        self.wakeup = threading.Event()
+        self.watcher = None
+
+    def add_source(self, source):
+        """Register source(initial) -> [(event, data)]; initial asks for the full current state"""
+        self.sources.append(source)
+
+    def subscribe(self, client=None):
+        """Add a client queue (a new one unless given) and fill it with the current state"""
+        if client is None:
+            client = queue.Queue(EVENT_QUEUE_SIZE)
+        with self.source_lock:
+            with self.lock:
+                idle = self.watcher is None or not self.watcher.is_alive()
+            if idle:
+                # Catch the sources up, so the first check only reports what changes from now on
+                for source in self.sources:
+                    source(False)
+            # A new client first gets the current state of every source
+            for source in self.sources:
+                for event, data in source(True):
+                    client.put_nowait(format_event(event, data))
+            with self.lock:
+                self.subscribers.append(client)
+                if self.watcher is None or not self.watcher.is_alive():
+                    self.watcher = threading.Thread(target=self.watch, daemon=True)
+                    self.watcher.start()
+        return client
+
+    def unsubscribe(self, client):
+        with self.lock:
+            if client in self.subscribers:
+                self.subscribers.remove(client)
+
+    def publish(self, event, data):
+        message = format_event(event, data)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for client in subscribers:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                print("Dropping an SSE client that stopped reading")
+                self.unsubscribe(client)
+                with client.mutex:
+                    client.queue.clear()
+                client.put_nowait(None)
+
+    def notify(self):
+        """Check the sources now instead of at the next interval"""
+        self.wakeup.set()
+
+    def watch(self):
+        """Poll the sources while anyone listens; the thread ends with the last subscriber"""
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.watcher = None
+                    return
+            with self.source_lock:
+                for source in self.sources:
+                    try:
+                        for event, data in source(False):
+                            self.publish(event, data)
+                    except Exception as e:
+                        print(f"Event source failed: {e}")
+            self.wakeup.wait(WATCH_INTERVAL)
+            self.wakeup.clear()
+
+    def stream(self, client):
+        """Generator of SSE messages for one client, with heartbeats while nothing happens"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = client.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(client)
+
+    async def stream_async(self, client, disconnected):
+        """Async version of stream() for an AsyncClient, ending once disconnected is set"""
+        try:
+            yield "retry: 3000\n\n"
+            while not disconnected.is_set():
+                try:
+                    message = client.get_nowait()
+                except queue.Empty:
+                    client.ready.clear()
+                    if not client.empty():
+                        continue
+                    waiters = [asyncio.ensure_future(client.ready.wait()), asyncio.ensure_future(disconnected.wait())]
+                    done, _ = await asyncio.wait(waiters, timeout=HEARTBEAT_INTERVAL,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    for waiter in waiters:
+                        waiter.cancel()
+                    if not done:
+                        yield ": heartbeat\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(client)
+
+
+class AsyncClient(queue.Queue):
+    """Subscriber queue read by an event loop: every put wakes the loop instead of a blocked thread"""
+
+    def __init__(self, loop):
+        super().__init__(EVENT_QUEUE_SIZE)
+        self.loop = loop
+        self.ready = asyncio.Event()
+
+    def _put(self, item):
+        super()._put(item)
+        self.loop.call_soon_threadsafe(self.ready.set)
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+event_bus = EventBus()
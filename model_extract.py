@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Archive Functions
+Unpack zipped/tarred model bundles into a model directory while they download
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import posixpath
+import tarfile
+import zipfile
+
+from model_dedup import STATE_DIR
+
+MANIFEST_DIR = os.path.join(STATE_DIR, "extracted")   # Which files each archive produced
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ZIP_SUFFIXES = (".zip",)
+
+
+class UnsafeArchive(Exception):
+    """Raised for archives whose members would land outside the target directory or on the same path"""
+
+
+def archive_format(entry, filename=""):
+    """Return "tar" or "zip" when a config entry asks for extraction, else None.
+
+    entry["extract"] may name the format or be true to infer it from the filename.
+    """
+    extract = entry.get("extract")
+    if not extract:
+        return None
+    if extract in ("tar", "zip"):
+        return extract
+    name = (filename or entry.get("filename") or entry["url"].split("?")[0]).lower()
+    if name.endswith(TAR_SUFFIXES):
+        return "tar"
+    if name.endswith(ZIP_SUFFIXES):
+        return "zip"
+    raise ValueError(f"Cannot tell the archive format of {name} - set extract to \"tar\" or \"zip\"")
+
+
+def member_target(name, entry):
+    """Relative path a member is extracted to, or None when the entry filters it out.
+
+    entry["members"] is either a list of glob patterns (matched against the full
+    member name and its basename) or a dict mapping member names to target paths.
+    entry["strip_components"] drops leading directories like tar does.
+    """
+    name = name.replace("\\", "/")
+    members = entry.get("members")
+    if isinstance(members, dict):
+        target = members.get(name)
+        if target is None:
+            return None
+    else:
+        if members and not any(
+            fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(posixpath.basename(name), pattern)
+            for pattern in members
+        ):
+            return None
+        parts = [part for part in name.split("/") if part]
+        target = "/".join(parts[int(entry.get("strip_components") or 0):])
+        if not target:
+            return None
+
+    target = posixpath.normpath(target)
+    if target.startswith("/") or target == ".." or target.startswith("../"):
+        raise UnsafeArchive(f"Archive member {name} would be extracted outside the model directory")
+    return target
+
+
+def claim_target(claimed, name, target):
+    """Record that member name extracts to target, raising UnsafeArchive when another member already does.
+
+    claimed maps normalized targets to member names; paths differing only in
+    case count as the same on case-insensitive platforms.
+    """
+    key = os.path.normcase(target)
+    if key in claimed:
+        raise UnsafeArchive(f"Archive members {claimed[key]} and {name} would both be extracted to {target}")
+    claimed[key] = name
+
+
+def manifest_path(archive_path):
+    """Where the list of files extracted from archive_path is kept"""
+    key = hashlib.sha1(os.path.abspath(archive_path).encode("utf-8")).hexdigest()
+    return os.path.join(MANIFEST_DIR, key + ".json")
+
+
+def read_manifest(archive_path):
+    """Files extracted from archive_path last time, or None if it was never extracted"""
+    try:
+        with open(manifest_path(archive_path), "r") as f:
+            return json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_manifest(archive_path, files):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = manifest_path(archive_path)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"archive": os.path.abspath(archive_path), "files": files}, f)
+    os.replace(path + ".tmp", path)
+
+
+def extracted_files():
+    """Every file any recorded archive extraction produced"""
+    files = []
+    try:
+        names = os.listdir(MANIFEST_DIR)
+    except OSError:
+        return files
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(MANIFEST_DIR, name), "r") as f:
+                files.extend(json.load(f)["files"])
+        except (OSError, ValueError, KeyError):
+            continue
+    return files
+
+
+def remove_manifest(archive_path):
+    path = manifest_path(archive_path)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def is_extracted(archive_path):
+    """True when archive_path was extracted and all its files are still there"""
+    files = read_manifest(archive_path)
+    return bool(files) and all(os.path.exists(path) for path in files)
+
+
+def extracted_size(archive_path):
+    """Bytes on disk of the files extracted from archive_path"""
+    return sum(os.path.getsize(path) for path in read_manifest(archive_path) or [] if os.path.exists(path))
+
+
+def copy_member(source, target_path, buffer):
+    """Copy an open member stream to target_path + ".part" through a reusable buffer"""
+    with open(target_path + ".part", "wb") as out:
+        while True:
+            count = source.readinto(buffer)
+            if not count:
+                break
+            out.write(buffer[:count])
+
+
+def finish_extraction(archive_path, staged):
+    """Rename staged .part files into place and record them; returns the final paths"""
+    for path in staged:
+        os.replace(path + ".part", path)
+    write_manifest(archive_path, staged)
+    return staged
+
+
+def discard_staged(staged):
+    for path in staged:
+        if os.path.exists(path + ".part"):
+            os.remove(path + ".part")
+
+
+def extract_tar_stream(fileobj, directory, entry, buffer, check_cancel=None):
+    """Extract a tar stream (any compression) member by member as it is read.
+
+    Members are staged as .part files and only renamed into place by
+    finish_extraction, so a stream that later fails verification leaves nothing
+    behind; so does a second member for an already claimed target, which raises
+    UnsafeArchive. Returns the staged target paths.
+    """
+    staged = []
+    claimed = {}
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for member in archive:
+                if check_cancel:
+                    check_cancel()
+                if not member.isfile():
+                    continue
+                target = member_target(member.name, entry)
+                if target is None:
+                    continue
+                claim_target(claimed, member.name, target)
+                target_path = os.path.join(directory, *target.split("/"))
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                print(f"Extracting {member.name} -> {target_path}")
+                copy_member(archive.extractfile(member), target_path, buffer)
+                staged.append(target_path)
+    except BaseException:
+        discard_staged(staged)
+        raise
+    return staged
+
+
+def extract_zip(zip_path, directory, entry, buffer, check_cancel=None):
+    """Extract a downloaded zip one member at a time with bounded memory; returns the staged paths.
+
+    The whole member plan is checked before anything is written, so a zip with
+    two members for the same target fails without extracting either.
+    """
+    staged = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            plan = []
+            claimed = {}
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                target = member_target(info.filename, entry)
+                if target is None:
+                    continue
+                claim_target(claimed, info.filename, target)
+                plan.append((info, target))
+            for info, target in plan:
+                if check_cancel:
+                    check_cancel()
+                target_path = os.path.join(directory, *target.split("/"))
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                print(f"Extracting {info.filename} -> {target_path}")
+                with archive.open(info) as source:
+                    copy_member(source, target_path, buffer)
+                staged.append(target_path)
+    except BaseException:
+        discard_staged(staged)
+        raise
+    return staged
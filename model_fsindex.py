@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Filesystem Index Functions
+Live in-memory index of the models directory, kept current with inotify
+"""
+
+import collections
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import threading
+import time
+
+from model_status import entry_paths
+
+RESCAN_INTERVAL = 30            # Seconds between mtime rescans when inotify is unavailable
+WATCHED_RESCAN_INTERVAL = 300   # Safety-net rescan interval while inotify is running
+MAX_INDEXES = 4                 # Base paths indexed at once; the least recently used is dropped
+MAX_CHECKS = 4096               # Cached check results per index; the least recently used are dropped
+TREE_PAGE_SIZE = 200            # Entries per directory page of the tree API
+MAX_TREE_PAGE_SIZE = 2000
+MAX_TREE_DEPTH = 4
+TREE_SORTS = ("name", "size", "mtime")
+TRASH_DIR = ".model_manager_trash"      # Reclaim's trash area under a base path - never listed or counted
+
+# inotify(7) constants
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+EVENT_HEADER = struct.Struct("iIII")
+
+try:
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    libc.inotify_init1
+except (OSError, AttributeError):
+    # Not Linux - the periodic rescan keeps the index current
+    libc = None
+
+
+def file_entry(st):
+    """(size, mtime_ns, inode key) of a stat result; the key is None where the platform reports no inode.
+
+    Every file carries its inode, not only those with several links: a rescan
+    only revisits directories whose mtime changed, so the first path of a file
+    never learns that a link to it appeared in another folder.
+    """
+    return (st.st_size, st.st_mtime_ns, (st.st_dev, st.st_ino) if st.st_ino else None)
+
+
+def scan_listing(path):
+    """One scandir pass over a directory: its mtime_ns, subdirectory names, symlinked ones and {file: file_entry}"""
+    dirs = set()
+    files = {}
+    links = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.name == TRASH_DIR:
+                    continue
+                if entry.is_dir():
+                    dirs.add(entry.name)
+                    if entry.is_symlink():
+                        links.add(entry.name)
+                else:
+                    files[entry.name] = file_entry(entry.stat())
+            except OSError:
+                continue
+    return {"mtime": os.stat(path).st_mtime_ns, "dirs": dirs, "files": files, "links": links}
+
+
+class FsIndex:
+    """Directory tree of one base path held in memory.
+
+    Built once with os.scandir, then kept current by inotify events (one watch per
+    directory) or, where inotify is unavailable or out of watches, by rescanning
+    directories whose mtime changed. Sizes of files still being written are
+    refreshed when they are closed. Symlinked directories are listed but not
+    followed, and the reclaim trash area is left out entirely.
+
+    Every directory node carries recursive total_size/total_files, adjusted up
+    the chain of parents on each change. Hardlinked files (dedup) count their
+    size once, in the folder of the alphabetically first of their paths.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.lock = threading.RLock()
+        self.nodes = {}         # directory path -> scan_listing() result
+        self.watches = {}       # inotify watch descriptor -> directory path
+        self.checks = collections.OrderedDict()    # key -> (file state, cached result), LRU order
+        self.hardlinks = {}     # (st_dev, st_ino) -> {path: size} of the indexed links to each inode
+        self.fd = None
+        self.stopped = threading.Event()
+        self.used = time.time()
+
+    def start(self):
+        started = time.time()
+        if libc is not None:
+            fd = libc.inotify_init1(IN_CLOEXEC)
+            if fd >= 0:
+                self.fd = fd
+            else:
+                print(f"inotify unavailable ({os.strerror(ctypes.get_errno())}), falling back to periodic rescans")
+        self.scan_tree(self.root)
+        print(f"Indexed {self.root}: {len(self.nodes)} directories in {time.time() - started:.2f}s"
+              f"{' (watching)' if self.fd is not None else ''}")
+        if self.fd is not None:
+            threading.Thread(target=self.watch_loop, daemon=True).start()
+        threading.Thread(target=self.rescan_loop, daemon=True).start()
+
+    def close(self):
+        self.stopped.set()
+
+    # --- Building ---
+
+    def add_watch(self, path):
+        if self.fd is None:
+            return
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                print(f"Out of inotify watches at {path} - raise fs.inotify.max_user_watches; rescans cover the rest")
+            return
+        self.watches[wd] = path
+
+    def adjust(self, directory, size, files):
+        """Add to the recursive totals of directory and all its indexed parents (called with lock held)"""
+        path = directory
+        while True:
+            node = self.nodes.get(path)
+            if node is not None:
+                node["total_size"] += size
+                node["total_files"] += files
+            parent = os.path.dirname(path)
+            if path == self.root or parent == path:
+                break
+            path = parent
+
+    def add_file(self, directory, name, entry):
+        """Record a file and count it in the totals (called with lock held)"""
+        self.nodes[directory]["files"][name] = entry
+        size, _, key = entry
+        if key is None:
+            self.adjust(directory, size, 1)
+            return
+        path = os.path.join(directory, name)
+        paths = self.hardlinks.setdefault(key, {})
+        old_owner = min(paths) if paths else None
+        paths[path] = size
+        owner = min(paths)
+        if old_owner is not None and old_owner != owner:
+            self.adjust(os.path.dirname(old_owner), -paths[old_owner], 0)
+        self.adjust(directory, size if owner == path else 0, 1)
+
+    def remove_file(self, directory, name):
+        """Forget a file and take it out of the totals (called with lock held)"""
+        entry = self.nodes[directory]["files"].pop(name, None)
+        if entry is None:
+            return
+        size, _, key = entry
+        if key is None:
+            self.adjust(directory, -size, -1)
+            return
+        path = os.path.join(directory, name)
+        paths = self.hardlinks.get(key, {})
+        owner = min(paths) if paths else None
+        paths.pop(path, None)
+        self.adjust(directory, -size if owner == path else 0, -1)
+        if paths and owner == path:
+            # Another link now carries the size
+            owner = min(paths)
+            self.adjust(os.path.dirname(owner), paths[owner], 0)
+        if not paths:
+            self.hardlinks.pop(key, None)
+
+    def set_node(self, path, listing):
+        """Store a fresh scan_listing() of path, applying only the files that changed (called with lock held)"""
+        node = self.nodes.get(path)
+        if node is None:
+            node = self.nodes[path] = dict(listing, files={}, total_size=0, total_files=0)
+        else:
+            for name, entry in list(node["files"].items()):
+                if listing["files"].get(name) != entry:
+                    self.remove_file(path, name)
+            node.update(mtime=listing["mtime"], dirs=listing["dirs"], links=listing["links"])
+        for name, entry in listing["files"].items():
+            if node["files"].get(name) != entry:
+                self.add_file(path, name, entry)
+
+    def scan_tree(self, top):
+        """Index top and everything below it"""
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            try:
+                listing = scan_listing(path)
+            except OSError:
+                continue
+            with self.lock:
+                self.set_node(path, listing)
+                self.add_watch(path)
+            stack.extend(os.path.join(path, name) for name in listing["dirs"] - listing["links"])
+
+    def drop_tree(self, top):
+        """Forget top and everything below it"""
+        prefix = top + os.sep
+        with self.lock:
+            for path in [p for p in self.nodes if p == top or p.startswith(prefix)]:
+                for name in list(self.nodes[path]["files"]):
+                    self.remove_file(path, name)
+                del self.nodes[path]
+            for wd, path in list(self.watches.items()):
+                if path == top or path.startswith(prefix):
+                    del self.watches[wd]
+                    if self.fd is not None:
+                        libc.inotify_rm_watch(self.fd, wd)
+
+    def rescan_dir(self, path):
+        """Refresh one directory listing, indexing new subdirectories and dropping vanished ones"""
+        try:
+            listing = scan_listing(path)
+        except OSError:
+            self.drop_tree(path)
+            return
+        with self.lock:
+            old = self.nodes.get(path)
+            old_dirs = (old["dirs"] - old["links"]) if old else set()
+            self.set_node(path, listing)
+        new_dirs = listing["dirs"] - listing["links"]
+        for name in old_dirs - new_dirs:
+            self.drop_tree(os.path.join(path, name))
+        for name in new_dirs - old_dirs:
+            self.scan_tree(os.path.join(path, name))
+
+    def update_name(self, directory, name):
+        """Apply an inotify event about one name in an indexed directory"""
+        if name == TRASH_DIR:
+            return
+        path = os.path.join(directory, name)
+        try:
+            st = os.stat(path)
+            is_link = os.path.islink(path)
+        except OSError:
+            st = None
+        is_dir = st is not None and stat.S_ISDIR(st.st_mode)
+        with self.lock:
+            node = self.nodes.get(directory)
+            if node is None:
+                return
+            self.remove_file(directory, name)
+            was_dir = name in node["dirs"] and name not in node["links"]
+            node["dirs"].discard(name)
+            node["links"].discard(name)
+            if is_dir:
+                node["dirs"].add(name)
+                if is_link:
+                    node["links"].add(name)
+            elif st is not None:
+                self.add_file(directory, name, file_entry(st))
+        if was_dir and (not is_dir or is_link):
+            self.drop_tree(path)
+        elif is_dir and not is_link and path not in self.nodes:
+            self.scan_tree(path)
+
+    def refresh(self, paths):
+        """Rescan the directories holding paths right away, e.g. after a job wrote or deleted them"""
+        directories = set()
+        for path in paths:
+            directory = os.path.dirname(os.path.abspath(path))
+            # The nearest indexed directory picks up newly created subfolders
+            while directory not in self.nodes and self.covers(os.path.dirname(directory)):
+                directory = os.path.dirname(directory)
+            if directory in self.nodes:
+                directories.add(directory)
+        for directory in directories:
+            self.rescan_dir(directory)
+
+    # --- Keeping current ---
+
+    def watch_loop(self):
+        buffer_size = 64 * 1024
+        while not self.stopped.is_set():
+            ready, _, _ = select.select([self.fd], [], [], 1.0)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.fd, buffer_size)
+            except OSError:
+                continue
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    print(f"inotify queue overflowed, rescanning {self.root}")
+                    self.rescan_all(force=True)
+                    continue
+                with self.lock:
+                    directory = self.watches.get(wd)
+                    if mask & IN_IGNORED:
+                        self.watches.pop(wd, None)
+                if directory is None:
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    self.drop_tree(directory)
+                elif name:
+                    self.update_name(directory, os.fsdecode(name))
+        os.close(self.fd)
+
+    def rescan_all(self, force=False):
+        """Rescan every directory whose mtime changed (all of them when forced)"""
+        with self.lock:
+            nodes = list(self.nodes.items())
+        for path, node in nodes:
+            try:
+                changed = force or os.stat(path).st_mtime_ns != node["mtime"]
+            except OSError:
+                changed = True
+            if changed:
+                self.rescan_dir(path)
+
+    def rescan_loop(self):
+        interval = WATCHED_RESCAN_INTERVAL if self.fd is not None else RESCAN_INTERVAL
+        while not self.stopped.wait(interval):
+            self.rescan_all()
+
+    # --- Queries, answered from memory ---
+
+    def covers(self, path):
+        return path == self.root or path.startswith(self.root + os.sep)
+
+    def listing(self, path):
+        """(sorted subdirectory names, {file name: size}) of an indexed directory, or None"""
+        with self.lock:
+            node = self.nodes.get(os.path.abspath(path))
+            if node is None:
+                return None
+            return sorted(node["dirs"]), dict((name, entry[0]) for name, entry in node["files"].items())
+
+    def rows(self, path):
+        """Tree rows (name, type, size, mtime) of an indexed directory, or None"""
+        path = os.path.abspath(path)
+        with self.lock:
+            node = self.nodes.get(path)
+            if node is None:
+                return None
+            subdirs = dict((name, self.nodes.get(os.path.join(path, name))) for name in node["dirs"])
+            return node_rows(node, dict((name, sub) for name, sub in subdirs.items() if sub))
+
+    def usage(self, path):
+        """(total_size, total_files) below an indexed directory, or None"""
+        with self.lock:
+            node = self.nodes.get(os.path.abspath(path))
+            return (node["total_size"], node["total_files"]) if node else None
+
+    def lookup(self, path):
+        """file_entry() of an indexed file, or None when it is not there"""
+        path = os.path.abspath(path)
+        with self.lock:
+            node = self.nodes.get(os.path.dirname(path))
+            return node["files"].get(os.path.basename(path)) if node else None
+
+    def files_of_size(self, path, size):
+        """Paths of indexed files below path with exactly size bytes, skipping hidden and partial files"""
+        path = os.path.abspath(path)
+        found = []
+        with self.lock:
+            for directory, node in self.nodes.items():
+                if directory != path and not directory.startswith(path + os.sep):
+                    continue
+                if any(part.startswith(".") for part in os.path.relpath(directory, path).split(os.sep) if part != "."):
+                    continue
+                for name, entry in node["files"].items():
+                    if entry[0] == size and not name.startswith(".") and not name.endswith(".part"):
+                        found.append(os.path.join(directory, name))
+        return found
+
+    def cached_check(self, paths, check):
+        """Result of check(), recomputed only when one of paths changed in the index.
+
+        At most MAX_CHECKS results are kept, so entries for files that are
+        gone (or no longer asked about) age out.
+        """
+        key = tuple(paths)
+        state = tuple(self.lookup(path) for path in paths)
+        with self.lock:
+            cached = self.checks.get(key)
+            if cached and cached[0] == state:
+                self.checks.move_to_end(key)
+                return cached[1]
+        result = check()
+        with self.lock:
+            self.checks[key] = (state, result)
+            self.checks.move_to_end(key)
+            while len(self.checks) > MAX_CHECKS:
+                self.checks.popitem(last=False)
+        return result
+
+    def is_installed(self, entry, full_path):
+        """Like model_download.is_installed, but checking the index instead of the disk"""
+        paths = entry_paths(entry, full_path)
+        return bool(paths) and all(self.lookup(path) is not None for path in paths)
+
+
+indexes = {}
+indexes_lock = threading.Lock()
+base_paths = set()      # Model base paths: the default one and those jobs have used; only these get an index
+
+
+def add_base_path(path):
+    """Allow a live index for a model base path and start building it in the background"""
+    path = os.path.abspath(path)
+    with indexes_lock:
+        if path in base_paths:
+            return
+        base_paths.add(path)
+    thread = threading.Thread(target=get_index, args=(path,))
+    thread.daemon = True
+    thread.start()
+
+
+def find_index(path):
+    """The live index covering path, or None - never builds one"""
+    path = os.path.abspath(path)
+    with indexes_lock:
+        for index in indexes.values():
+            if index.covers(path):
+                index.used = time.time()
+                return index
+    return None
+
+
+def get_index(path):
+    """The live index covering path, building one when path is a registered base path; None otherwise.
+
+    Any other path a client sends is answered with a direct scan, so browsing
+    "/" costs one listdir rather than an inotify watch on every folder below.
+    """
+    index = find_index(path)
+    if index is not None:
+        return index
+    path = os.path.abspath(path)
+    with indexes_lock:
+        allowed = path in base_paths
+    if not allowed or not os.path.isdir(path):
+        return None
+
+    index = FsIndex(path)
+    index.start()
+    with indexes_lock:
+        # Another request may have built one meanwhile, or this one may cover older ones
+        for root, other in list(indexes.items()):
+            if index.covers(root):
+                other.close()
+                del indexes[root]
+            elif other.covers(path):
+                index.close()
+                return other
+        indexes[path] = index
+        while len(indexes) > MAX_INDEXES:
+            oldest = min(indexes.values(), key=lambda other: other.used)
+            oldest.close()
+            del indexes[oldest.root]
+    return index
+
+
+def node_rows(node, subdirs):
+    """Tree rows of a directory node; folders carry the recursive totals of their indexed node"""
+    rows = []
+    for name in node["dirs"]:
+        sub = subdirs.get(name)
+        rows.append({
+            "name": name,
+            "type": "folder",
+            "size": sub["total_size"] if sub else 0,
+            "files": sub["total_files"] if sub else 0,
+            "mtime": sub["mtime"] if sub else None
+        })
+    rows.extend({"name": name, "type": "file", "size": entry[0], "mtime": entry[1]}
+                for name, entry in node["files"].items())
+    return rows
+
+
+def directory_rows(path):
+    """Tree rows of a directory from the live index, scanning directly outside it"""
+    index = find_index(path)
+    rows = index.rows(path) if index else None
+    if rows is None:
+        rows = node_rows(scan_listing(path), {})
+    return rows
+
+
+def tree(path, depth=1, cursor="", limit=TREE_PAGE_SIZE, sort="name", reverse=False):
+    """One page of a directory, with folders first, plus the first page of subfolders down to depth.
+
+    cursor is the opaque next_cursor of the previous page ("" for the first).
+    Returns {"path", "entries", "total", "next_cursor"}; next_cursor is None on
+    the last page. Folders below the requested depth have no "children" and are
+    fetched with their own request.
+    """
+    if sort not in TREE_SORTS:
+        raise ValueError(f"Unknown sort {sort} - use one of {', '.join(TREE_SORTS)}")
+    depth = max(1, min(int(depth), MAX_TREE_DEPTH))
+    limit = max(1, min(int(limit), MAX_TREE_PAGE_SIZE))
+    offset = max(0, int(cursor or 0))
+
+    rows = directory_rows(path)
+    if sort == "name":
+        rows.sort(key=lambda row: row["name"].lower(), reverse=reverse)
+    else:
+        rows.sort(key=lambda row: (row[sort] or 0, row["name"].lower()), reverse=reverse)
+    rows.sort(key=lambda row: row["type"] != "folder")
+    page = rows[offset:offset + limit]
+
+    if depth > 1:
+        for row in page:
+            if row["type"] != "folder":
+                continue
+            try:
+                row["children"] = tree(os.path.join(path, row["name"]), depth - 1, "", limit, sort, reverse)
+            except PermissionError:
+                row["error"] = "Permission denied"
+    more = offset + len(page) < len(rows)
+    return {
+        "path": path,
+        "entries": page,
+        "total": len(rows),
+        "next_cursor": str(offset + len(page)) if more else None
+    }
+
+
+def list_directory(path):
+    """(subdirectory names, {file name: size}) from the live index, scanning directly outside it"""
+    index = find_index(path)
+    listing = index.listing(path) if index else None
+    if listing is not None:
+        return listing
+    node = scan_listing(path)
+    return sorted(node["dirs"]), dict((name, entry[0]) for name, entry in node["files"].items())
+
+
+def refresh_paths(paths):
+    """Bring the indexes covering paths up to date at once instead of waiting for events or a rescan"""
+    with indexes_lock:
+        current = list(indexes.values())
+    for index in current:
+        covered = [path for path in paths if index.covers(os.path.abspath(path))]
+        if covered:
+            index.refresh(covered)
+
+
+def disk_usage(path):
+    """Recursive size and file count of path and each of its subfolders, from the live index"""
+    index = get_index(path)
+    if index is None:
+        if not os.path.isdir(path):
+            raise FileNotFoundError(path)
+        raise LookupError(f"{path} is not a model base path")
+    path = os.path.abspath(path)
+    rows = index.rows(path)
+    totals = index.usage(path)
+    if rows is None or totals is None:
+        raise NotADirectoryError(path)
+    folders = sorted((row for row in rows if row["type"] == "folder"), key=lambda row: -row["size"])
+    return {
+        "path": path,
+        "total_size": totals[0],
+        "total_files": totals[1],
+        "folders": [{"name": row["name"], "size": row["size"], "files": row["files"]} for row in folders]
+    }
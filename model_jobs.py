@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Manager Jobs
+Queue of download and delete jobs served by a configurable pool of worker threads
+"""
+
+import threading
+import time
+import uuid
+
+# Job queue tuning
+JOB_WORKERS = 2          # Jobs that may run at the same time
+JOB_HISTORY = 50         # Finished jobs kept around for /jobs
+
+FINISHED_STATES = ("done", "error", "cancelled")
+
+
+def new_operation(total=0):
+    """Progress record of a job, in the shape /progress has always returned"""
+    return {
+        "status": "queued",
+        "progress": [],
+        "total": total,
+        "current": 0,
+        "current_file": "",
+        "current_progress": "Waiting in queue...",
+        "bytes_done": 0,
+        "bytes_total": 0,
+        "rate": 0,
+        "avg_rate": 0,
+        "eta": None,
+        "preflight": None,
+        "files": []
+    }
+
+
+class Job:
+    """A unit of queued work.
+
+    run(job) does the work, reporting through job.operation and stopping early
+    once job.cancel_event is set. paths lists the files the job touches - two
+    jobs sharing a path never run at the same time.
+    """
+
+    def __init__(self, kind, description, run, total=0, paths=(), priority=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.run = run
+        self.paths = set(paths)
+        self.priority = priority
+        self.state = "queued"
+        self.error = ""
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.operation = new_operation(total)
+
+    def to_dict(self, include_operation=False):
+        info = {
+            "id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "state": self.state,
+            "priority": self.priority,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "current": self.operation["current"],
+            "total": self.operation["total"],
+            "bytes_done": self.operation["bytes_done"],
+            "bytes_total": self.operation["bytes_total"]
+        }
+        if include_operation:
+            info["operation"] = self.operation
+        return info
+
+
+class JobQueue:
+    """Priority queue of jobs with a resizable pool of worker threads"""
+
+    def __init__(self, workers=JOB_WORKERS, on_finish=None):
+        self.condition = threading.Condition()
+        self.on_finish = on_finish  # Called with each job once it stopped, e.g. to refresh indexes
+        self.jobs = {}          # All known jobs in submission order
+        self.pending = []       # Queued jobs in submission order
+        self.running = set()
+        self.target_workers = 0
+        self.worker_count = 0
+        self.set_workers(workers)
+
+    def submit(self, job):
+        """Queue a job and return it"""
+        with self.condition:
+            self.jobs[job.id] = job
+            self.pending.append(job)
+            self.prune()
+            self.condition.notify_all()
+        print(f"Queued job {job.id}: {job.description}")
+        return job
+
+    def get(self, job_id):
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.condition:
+            return list(self.jobs.values())
+
+    def latest(self):
+        """Most recently submitted running job, else the most recent job of any state"""
+        with self.condition:
+            jobs = list(self.jobs.values())
+        for job in reversed(jobs):
+            if job.state == "running":
+                return job
+        return jobs[-1] if jobs else None
+
+    def cancel(self, job_id):
+        """Cancel a queued job outright or ask a running one to stop; returns the job or None"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state == "queued":
+                self.pending.remove(job)
+                job.state = "cancelled"
+                job.finished = time.time()
+                job.operation["status"] = "idle"
+                job.operation["current_progress"] = "Cancelled before it started"
+                self.condition.notify_all()
+            elif job.state == "running":
+                job.cancel_event.set()
+                job.operation["current_progress"] = "Cancelling..."
+        return job
+
+    def set_priority(self, job_id, priority):
+        """Change the priority of a job; higher priorities start first"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.priority = priority
+                self.condition.notify_all()
+        return job
+
+    def set_workers(self, count):
+        """Resize the worker pool; surplus workers exit once their current job is done"""
+        with self.condition:
+            self.target_workers = max(1, count)
+            while self.worker_count < self.target_workers:
+                self.worker_count += 1
+                worker = threading.Thread(target=self.work)
+                worker.daemon = True
+                worker.start()
+            self.condition.notify_all()
+
+    def next_job(self):
+        """Highest priority queued job that shares no path with a running job (called with condition held)"""
+        busy = set()
+        for job in self.running:
+            busy |= job.paths
+        best = None
+        for job in self.pending:
+            if job.paths & busy:
+                continue
+            if best is None or job.priority > best.priority:
+                best = job
+        return best
+
+    def work(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.worker_count > self.target_workers:
+                        self.worker_count -= 1
+                        return
+                    job = self.next_job()
+                    if job is not None:
+                        break
+                    self.condition.wait()
+                self.pending.remove(job)
+                self.running.add(job)
+                job.state = "running"
+                job.started = time.time()
+
+            try:
+                job.run(job)
+                state = "cancelled" if job.cancel_event.is_set() else "done"
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.operation["status"] = "error"
+                state = "error"
+
+            if self.on_finish is not None:
+                try:
+                    self.on_finish(job)
+                except Exception as e:
+                    print(f"Finish hook for job {job.id} failed: {e}")
+
+            with self.condition:
+                self.running.discard(job)
+                job.state = state
+                job.finished = time.time()
+                self.prune()
+                self.condition.notify_all()
+
+    def prune(self):
+        """Forget the oldest finished jobs beyond JOB_HISTORY (called with condition held)"""
+        finished = [job for job in self.jobs.values() if job.state in FINISHED_STATES]
+        for job in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job.id]
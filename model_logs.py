@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Log Functions
+Bounded, sequence-numbered logs that clients read incrementally
+"""
+
+import collections
+import os
+import threading
+
+from model_dedup import STATE_DIR
+
+LOG_DIR = os.path.join(STATE_DIR, "logs")   # Full history of each log, rotated
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024        # Rotate a spill file beyond this size
+LOG_FILE_BACKUPS = 3                        # Rotated files kept per log
+
+
+class SeqLog:
+    """Log whose lines carry increasing sequence numbers.
+
+    Only the newest capacity lines stay in memory; every line is also appended
+    to a rotating file under LOG_DIR, so nothing is lost to the bound. Readers
+    keep the last sequence number they saw and ask for what came after it.
+    Appending and iterating work like a list, so existing writers need no changes.
+    """
+
+    def __init__(self, name, capacity):
+        self.lock = threading.Lock()
+        self.entries = collections.deque(maxlen=capacity)   # (seq, line)
+        self.seq = 0            # Sequence number of the newest line; the first line is 1
+        self.start = 0          # Sequence number of the last clear; older cursors are outdated
+        self.path = os.path.join(LOG_DIR, name + ".log")
+        self.file = None
+
+    def append(self, line):
+        with self.lock:
+            self.seq += 1
+            self.entries.append((self.seq, line))
+            self.spill(line)
+            return self.seq
+
+    def spill(self, line):
+        """Write a line to the spill file, rotating it when full (called with lock held)"""
+        try:
+            if self.file is None:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(f"{line}\n")
+            self.file.flush()
+            if self.file.tell() > LOG_FILE_MAX_BYTES:
+                self.rotate()
+        except OSError as e:
+            # The in-memory log still works without its file
+            print(f"Could not write {self.path}: {e}")
+            self.file = None
+
+    def rotate(self):
+        self.file.close()
+        self.file = None
+        for index in range(LOG_FILE_BACKUPS - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def clear(self):
+        """Start over, e.g. for a new run; sequence numbers keep increasing so old cursors stay valid"""
+        with self.lock:
+            self.entries.clear()
+            # The clear takes a number itself, so cursors from before it are told to reset
+            self.seq += 1
+            self.start = self.seq
+            self.spill("-" * 40)
+
+    def since(self, seq=0):
+        """Lines after seq, as {"lines", "seq", "reset", "complete"}.
+
+        reset means the reader's copy is outdated (first read, or the log was
+        cleared since) and should be replaced rather than extended; complete is
+        False when lines the reader never saw had already left memory.
+        """
+        with self.lock:
+            reset = seq < self.start or seq > self.seq
+            after = self.start if reset else seq
+            lines = [line for number, line in self.entries if number > after]
+            complete = not self.entries or self.entries[0][0] <= after + 1
+            return {"lines": lines, "seq": self.seq, "reset": reset, "complete": complete}
+
+    def __iter__(self):
+        with self.lock:
+            return iter([line for _, line in self.entries])
+
+    def __len__(self):
+        return len(self.entries)
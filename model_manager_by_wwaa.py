@@ -8,23 +8,48 @@ import requests
 import json
 import threading
 import time
-import tempfile
 import os
 import subprocess
-import collections
-from flask import Flask, render_template_string, request, jsonify
+import hashlib
+from flask import Flask, Response, render_template_string, request, jsonify
 from pathlib import Path
 import sys
 import os
 
 # Import functions from model-download.py
 try:
-    from model_download import download_files, delete_files, get_filename_from_url
+    from model_download import (
+        download_package, delete_files, get_filename_from_url, resolve_target, preflight, is_installed,
+        check_entry, PACKAGE_WORKERS, MAX_PACKAGE_WORKERS, DOWNLOAD_ORDER, DOWNLOAD_ORDERS, bandwidth_limiter,
+        set_concurrent_jobs
+    )
+    from model_jobs import Job, JobQueue, new_operation, JOB_WORKERS
+    from model_reclaim import plan_reclaim, run_reclaim, purge_trash
+    from model_dedup import STATE_DIR
+    from model_catalog import package_index, PAGE_SIZE
+    from model_status import install_state
+    from model_fsindex import get_index, add_base_path, list_directory, tree, refresh_paths, disk_usage, TREE_PAGE_SIZE
+    from model_events import event_bus
+    from model_logs import SeqLog
+    from model_asgi import follow_output, run_logged, start_task, serve_asgi
 except ImportError:
     # If running standalone, try to import from current directory
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     try:
-        from model_download import download_files, delete_files, get_filename_from_url
+        from model_download import (
+            download_package, delete_files, get_filename_from_url, resolve_target, preflight, is_installed,
+            check_entry, PACKAGE_WORKERS, MAX_PACKAGE_WORKERS, DOWNLOAD_ORDER, DOWNLOAD_ORDERS, bandwidth_limiter,
+            set_concurrent_jobs
+        )
+        from model_jobs import Job, JobQueue, new_operation, JOB_WORKERS
+        from model_reclaim import plan_reclaim, run_reclaim, purge_trash
+        from model_dedup import STATE_DIR
+        from model_catalog import package_index, PAGE_SIZE
+        from model_status import install_state
+        from model_fsindex import get_index, add_base_path, list_directory, tree, refresh_paths, disk_usage, TREE_PAGE_SIZE
+        from model_events import event_bus
+        from model_logs import SeqLog
+        from model_asgi import follow_output, run_logged, start_task, serve_asgi
     except ImportError:
         print("ERROR: Cannot import functions from model-download.py")
         print("Make sure model-download.py is in the same directory or in your Python path")
@@ -34,46 +59,128 @@ app = Flask(__name__)
 
 # Configuration
 CONFIG_URL = "https://raw.githubusercontent.com/hgabha/scripts/refs/heads/main/model_configs.json"
+CONFIG_CACHE_FILE = os.path.join(STATE_DIR, "model_configs.json")  # Last good config with its validators
 DEFAULT_BASE_PATH = "/workspace/ComfyUI/models"
+MB = 1024 * 1024  # Bandwidth limits are exchanged with the UI in MB/s
 
 # Global variables
 model_configs = {}
-current_operation = {
-    "status": "idle", 
-    "progress": [], 
-    "total": 0, 
-    "current": 0,
-    "current_file": "",
-    "current_progress": ""
+config_state = {
+    "source": "none",       # none | network | cache
+    "etag": "",
+    "last_modified": "",
+    "fetched": None,        # When the config was last confirmed current with the server
+    "error": ""
 }
+config_lock = threading.Lock()
+def finish_job(job):
+    """Folder listings and disk usage reflect a job's files as soon as it stops; open pages hear of it at once"""
+    refresh_paths(job.paths)
+    package_index.refresh()
+    event_bus.notify()
+
+job_queue = JobQueue(JOB_WORKERS, on_finish=finish_job)
 
 # --- ComfyUI Manager State ---
 comfyui_process = None
 comfyui_port = 8188
+# Logs are read incrementally with since=<seq>; older lines spill to ~/.cache/model_manager/logs
+comfyui_install_log = SeqLog("comfyui_install", 2000)
 comfyui_install_status = {
     "status": "idle",   # idle | installing | done | error
-    "log": [],
+    "log": comfyui_install_log,
     "step": ""
 }
-comfyui_run_log = collections.deque(maxlen=200)
+comfyui_run_log = SeqLog("comfyui_run", 1000)
 
-def load_model_configs():
-    """Load model configurations from external JSON file"""
+def load_cached_configs():
+    """Load the config cached on disk by the last successful fetch; returns True if there was one"""
     global model_configs
     try:
-        print(f"Loading model configurations from: {CONFIG_URL}")
-        response = requests.get(CONFIG_URL, timeout=10)
-        response.raise_for_status()
-        model_configs = response.json()
-        print(f"Successfully loaded {len(model_configs)} model configurations")
-        return True
-    except requests.RequestException as e:
-        print(f"Error loading model configurations: {e}")
+        with open(CONFIG_CACHE_FILE, "r") as f:
+            cached = json.load(f)
+        configs = cached["configs"]
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring unreadable config cache: {e}")
         return False
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON configuration: {e}")
+    model_configs = configs
+    package_index.build(model_configs)
+    config_state.update(
+        source="cache",
+        etag=cached.get("etag", ""),
+        last_modified=cached.get("last_modified", ""),
+        fetched=cached.get("fetched")
+    )
+    print(f"Loaded {len(model_configs)} model configurations from the cache")
+    return True
+
+def save_config_cache(configs, etag, last_modified, fetched):
+    """Store the config and its validators atomically so the next start works offline"""
+    os.makedirs(os.path.dirname(CONFIG_CACHE_FILE), exist_ok=True)
+    tmp_path = CONFIG_CACHE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"etag": etag, "last_modified": last_modified, "fetched": fetched, "configs": configs}, f)
+    os.replace(tmp_path, CONFIG_CACHE_FILE)
+
+def load_model_configs():
+    """Load model configurations from external JSON file.
+
+    Sends the cached ETag/Last-Modified, so an unchanged config costs a 304. When
+    the server can't be reached, an already loaded or cached config is kept and
+    this still counts as success.
+    """
+    global model_configs
+    with config_lock:
+        if not model_configs:
+            load_cached_configs()
+        headers = {}
+        if model_configs and config_state["etag"]:
+            headers["If-None-Match"] = config_state["etag"]
+        if model_configs and config_state["last_modified"]:
+            headers["If-Modified-Since"] = config_state["last_modified"]
+        try:
+            print(f"Loading model configurations from: {CONFIG_URL}")
+            response = requests.get(CONFIG_URL, headers=headers, timeout=10)
+            now = time.time()
+            if response.status_code == 304:
+                print(f"Model configurations unchanged ({len(model_configs)} packages)")
+                config_state.update(fetched=now, error="")
+                save_config_cache(model_configs, config_state["etag"], config_state["last_modified"], now)
+                return True
+            response.raise_for_status()
+            configs = response.json()
+            model_configs = configs
+            package_index.build(model_configs)
+            config_state.update(
+                source="network",
+                etag=response.headers.get("ETag", ""),
+                last_modified=response.headers.get("Last-Modified", ""),
+                fetched=now,
+                error=""
+            )
+            save_config_cache(configs, config_state["etag"], config_state["last_modified"], now)
+            print(f"Successfully loaded {len(model_configs)} model configurations")
+            return True
+        except requests.RequestException as e:
+            print(f"Error loading model configurations: {e}")
+            config_state["error"] = str(e)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON configuration: {e}")
+            config_state["error"] = str(e)
+        except OSError as e:
+            # Fetched fine, only the cache write failed
+            print(f"Could not write the config cache: {e}")
+            return True
+        if model_configs:
+            print(f"Keeping {len(model_configs)} model configurations from the {config_state['source']}")
+            return True
         return False
 
+def revalidate_configs():
+    """Refresh the config in the background while the cached copy is already served"""
+    threading.Thread(target=load_model_configs, daemon=True).start()
+
 def convert_config_format(model_name):
     """Convert the external JSON format to the format expected by download/delete functions"""
     if model_name not in model_configs:
@@ -82,42 +189,15 @@ def convert_config_format(model_name):
     config = model_configs[model_name]
     return config["files"]
 
-def get_wget_log_tail():
-    """Get download progress - prefer current_progress over log file since wget truncates paths"""
-    # Always prioritize current_progress for delete operations and custom status messages
-    current_progress = current_operation.get('current_progress', '')
-    current_status = current_operation.get('status', 'idle')
-    
-    # For delete operations, always use current_progress instead of log file
-    if current_status == 'deleting' and current_progress:
-        return current_progress
-    
-    # For download operations, check if we have current progress with filename
-    if current_progress and ':' in current_progress:
-        # Already has filename prefix
-        return current_progress
-    
-    # If no current progress, try log file but add filename prefix (for downloads only)
-    if current_status == 'downloading':
-        log_file = os.path.join(tempfile.gettempdir(), 'wget_progress.log')
-        try:
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    lines = f.readlines()
-                    # Get last non-empty line that looks like progress
-                    for line in reversed(lines[-5:]):
-                        line = line.strip()
-                        if line and ('%' in line or 'eta' in line or 'MB/s' in line):
-                            # Add filename prefix to wget output
-                            filename = current_operation.get('current_file', '')
-                            if filename:
-                                return f"{filename}: {line}"
-                            return line
-        except:
-            pass
-    
-    # Fallback to current_progress
-    return current_progress
+def get_job_or_latest(job_id):
+    """Look up a job by ID, or fall back to the most recent job when no ID is given"""
+    if job_id:
+        return job_queue.get(job_id)
+    return job_queue.latest()
+
+def parse_priority(data):
+    """Read the optional job priority from a request body"""
+    return int(data.get('priority') or 0)
 
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -150,6 +230,7 @@ HTML_TEMPLATE = '''
                         Select Model Package:
                         <button type="button" class="refresh-btn" onclick="refreshConfigs()">🔄 Refresh</button>
                     </label>
+                    <input type="text" id="packageSearch" placeholder="Search packages..." oninput="onPackageSearch()">
                     <select id="modelSelect" name="model" required>
                         <option value="">Choose a model package...</option>
                     </select>
@@ -157,7 +238,7 @@ HTML_TEMPLATE = '''
 
                 <div class="form-group">
                     <label for="basePath">Base Path (ComfyUI models directory):</label>
-                    <input type="text" id="basePath" name="base_path" value="{{ default_path }}" required onchange="updateFileExplorer()">
+                    <input type="text" id="basePath" name="base_path" value="{{ default_path }}" required onchange="updateFileExplorer(); refreshInstallState()">
                 </div>
 
                 <div class="form-group">
@@ -165,6 +246,20 @@ HTML_TEMPLATE = '''
                     <input type="text" id="hfToken" name="hf_token" placeholder="hf_... (required for some models)">
                 </div>
 
+                <div class="form-group">
+                    <label for="downloadOrder">Download Order:</label>
+                    <select id="downloadOrder" name="order">
+                        <option value="smallest_first">Smallest files first</option>
+                        <option value="largest_first">Largest files first</option>
+                        <option value="config">Package order</option>
+                    </select>
+                </div>
+
+                <div class="form-group">
+                    <label for="parallelDownloads">Parallel Downloads:</label>
+                    <input type="number" id="parallelDownloads" name="parallel" value="{{ parallel }}" min="1" max="{{ max_parallel }}">
+                </div>
+
                 <div class="button-group">
                     <button type="button" onclick="downloadModels()" class="btn-primary">
                         <i class="fas fa-download"></i> Download Models
@@ -229,6 +324,12 @@ HTML_TEMPLATE = '''
                 </div>
                 
                 <div class="log-container" id="logContainer"></div>
+                
+                <div class="button-group" style="grid-template-columns: 1fr;">
+                    <button type="button" onclick="cancelCurrentJob()" class="btn-danger" id="cancelJobBtn">
+                        <i class="fas fa-ban"></i> Cancel
+                    </button>
+                </div>
             </div>
 
             <div id="modelInfo" class="model-info" style="display: none;">
@@ -348,7 +449,10 @@ def load_configs():
         return jsonify({
             'success': True,
             'count': len(model_configs),
-            'models': list(model_configs.keys())
+            'models': list(model_configs.keys()),
+            'source': config_state['source'],
+            'fetched': config_state['fetched'],
+            'stale': bool(config_state['error'])
         })
     else:
         return jsonify({
@@ -377,79 +481,76 @@ def handle_download():
                     'message': f'Hugging Face token is required for {model_name}. Please provide your HF token and try again.'
                 })
         
-        # Reset progress tracking
-        current_operation['status'] = 'downloading'
-        current_operation['progress'] = []
-        current_operation['total'] = len(files_config)
-        current_operation['current'] = 0
-        current_operation['current_file'] = ""
-        current_operation['current_progress'] = ""
+        order = data.get('order') or DOWNLOAD_ORDER
+        if order not in DOWNLOAD_ORDERS:
+            return jsonify({'success': False, 'message': f'Invalid download order: {order}'})
+        try:
+            parallel = max(1, int(data.get('parallel') or PACKAGE_WORKERS))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Invalid number of parallel downloads'})
+        if parallel > MAX_PACKAGE_WORKERS:
+            return jsonify({'success': False, 'message': f'At most {MAX_PACKAGE_WORKERS} parallel downloads are allowed'})
         
-        # Run download in a separate thread
-        def run_download():
+        # Run download as a queued job
+        def run_download(job):
+            current_operation = job.operation
+            current_operation['status'] = 'downloading'
+            current_operation['current_progress'] = "Checking file sizes..."
             try:
-                all_results = []
+                all_results = current_operation['progress']  # Appended to in place, so readers can page it
                 
-                for i, file_info in enumerate(files_config):
-                    # Update current file being processed
-                    filename = file_info.get("filename") or get_filename_from_url(file_info["url"])
-                    current_operation['current_file'] = filename
-                    current_operation['current'] = i + 1  # 1-based indexing
-                    current_operation['current_progress'] = f"Starting download of {filename}..."
-                    
-                    # Call the original download function for this single file
-                    file_results = download_files([file_info], base_path, hf_token)
-                    
-                    # Create detailed log entries for each file
-                    for result in file_results:
-                        log_entry = {
-                            'status': result['status'],
-                            'message': f"Successfully downloaded: {filename}" if result['status'] == 'success' 
-                                     else f"File already exists: {filename}" if result['status'] == 'skipped'
-                                     else f"Failed to download: {filename} - {result.get('message', 'Unknown error')}",
-                            'file': filename
-                        }
-                        all_results.append(log_entry)
-                        current_operation['progress'] = all_results.copy()  # Update progress with all logs so far
-                    
-                    # Update current progress message
-                    if file_results:
-                        status = file_results[0]['status']
-                        if status == 'success':
-                            current_operation['current_progress'] = f"{filename}: Download completed"
-                        elif status == 'skipped':
-                            current_operation['current_progress'] = f"{filename}: File already exists"
-                        elif status == 'error':
-                            current_operation['current_progress'] = f"{filename}: Download failed"
-                    
-                    time.sleep(0.1)  # Small delay to allow UI updates
+                def log_result(result):
+                    # Create detailed log entries for each file as it finishes
+                    filename = result['file']
+                    log_entry = {
+                        'status': result['status'],
+                        'message': f"Successfully downloaded: {filename}" if result['status'] == 'success' 
+                                 else f"File already exists: {filename}" if result['status'] == 'skipped'
+                                 else f"Linked to existing copy: {filename}" if result['status'] == 'linked'
+                                 else f"Cancelled: {filename}" if result['status'] == 'cancelled'
+                                 else f"Failed to download: {filename} - {result.get('message', 'Unknown error')}",
+                        'file': filename
+                    }
+                    all_results.append(log_entry)
+                
+                download_package(files_config, base_path, hf_token, current_operation,
+                                 max_workers=parallel, order=order, on_result=log_result,
+                                 cancel_event=job.cancel_event)
                 
                 current_operation['current'] = len(files_config)
+                current_operation['current_file'] = ""
                 current_operation['status'] = 'idle'
-                current_operation['progress'] = all_results  # Final logs
                 
                 # Update final status based on results
                 success_count = len([r for r in all_results if r['status'] == 'success'])
                 skipped_count = len([r for r in all_results if r['status'] == 'skipped'])
+                linked_count = len([r for r in all_results if r['status'] == 'linked'])
                 error_count = len([r for r in all_results if r['status'] == 'error'])
                 
-                if error_count > 0:
+                if job.cancel_event.is_set():
+                    current_operation['current_progress'] = f"Cancelled: {success_count} downloaded, {skipped_count} already existed - partial files kept for resume"
+                elif error_count > 0:
                     current_operation['current_progress'] = f"Completed with {error_count} errors, {success_count} downloaded, {skipped_count} already existed"
-                elif skipped_count > 0:
-                    current_operation['current_progress'] = f"Completed: {success_count} downloaded, {skipped_count} file(s) already existed"
+                elif skipped_count > 0 or linked_count > 0:
+                    current_operation['current_progress'] = f"Completed: {success_count} downloaded, {linked_count} linked to existing copies, {skipped_count} file(s) already existed"
                 else:
                     current_operation['current_progress'] = f"{success_count} file(s) downloaded successfully"
                     
             except Exception as e:
                 current_operation['status'] = 'error'
-                current_operation['progress'] = [{'status': 'error', 'message': f"Download failed: {str(e)}", 'file': 'unknown'}]
+                current_operation['progress'].append({'status': 'error', 'message': f"Download failed: {str(e)}", 'file': 'unknown'})
                 current_operation['current_progress'] = f"Download failed: {str(e)}"
+                raise
         
-        thread = threading.Thread(target=run_download)
-        thread.daemon = True
-        thread.start()
+        add_base_path(base_path)  # Keep a live index of every base path a job writes to
+        job = job_queue.submit(Job(
+            'download', f'Download {model_name}', run_download,
+            total=len(files_config),
+            paths=[resolve_target(f, base_path)[1] for f in files_config],
+            priority=parse_priority(data)
+        ))
         
-        return jsonify({'success': True, 'message': f'Checking and downloading {model_name} files...'})
+        return jsonify({'success': True, 'message': f'Checking and downloading {model_name} files...', 'job_id': job.id})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -461,30 +562,46 @@ def handle_delete():
         model_name = data.get('model')
         base_path = data.get('base_path')
         
+        force = bool(data.get('force'))
+        
         files_config = convert_config_format(model_name)
         if not files_config:
             return jsonify({'success': False, 'message': 'Invalid model selection'})
         
-        # Reset progress tracking
-        current_operation['status'] = 'deleting'
-        current_operation['progress'] = []
-        current_operation['total'] = len(files_config)
-        current_operation['current'] = 0
-        current_operation['current_file'] = ""
-        current_operation['current_progress'] = "Preparing to delete files..."
-        
-        # Run deletion in a separate thread
-        def run_delete():
+        # Run deletion as a queued job
+        def run_delete(job):
+            current_operation = job.operation
+            current_operation['status'] = 'deleting'
+            current_operation['current_progress'] = "Preparing to delete files..."
             try:
-                all_results = []
+                all_results = current_operation['progress']  # Appended to in place, so readers can page it
+                
+                # Files another installed package still lists are kept unless forced
+                shared = {} if force else {
+                    item['path']: item['needed_by']
+                    for item in plan_reclaim(model_configs, base_path, [model_name])['shared']
+                }
                 
                 for i, file_info in enumerate(files_config):
+                    if job.cancel_event.is_set():
+                        break
+                    
                     # Update current file being processed
                     filename = file_info.get("filename") or get_filename_from_url(file_info["url"])
                     current_operation['current_file'] = filename
                     current_operation['current'] = i + 1  # 1-based indexing
                     current_operation['current_progress'] = f"Checking {filename}..."
                     
+                    needed_by = shared.get(os.path.abspath(resolve_target(file_info, base_path)[1]))
+                    if needed_by:
+                        all_results.append({
+                            'status': 'skipped',
+                            'message': f"Kept {filename}: still needed by {', '.join(needed_by)}",
+                            'file': filename
+                        })
+                        current_operation['current_progress'] = f"{filename}: Kept (shared)"
+                        continue
+                    
                     # Call the original delete function for this single file
                     file_results = delete_files([file_info], base_path)
                     
@@ -498,7 +615,6 @@ def handle_delete():
                             'file': filename
                         }
                         all_results.append(log_entry)
-                        current_operation['progress'] = all_results.copy()  # Update progress with all logs so far
                     
                     # Update current progress message
                     if file_results:
@@ -509,39 +625,158 @@ def handle_delete():
                             current_operation['current_progress'] = f"{filename}: File not found"
                         elif status == 'error':
                             current_operation['current_progress'] = f"{filename}: Deletion failed"
-                    
-                    time.sleep(0.1)  # Small delay to allow UI updates
                 
                 current_operation['current'] = len(files_config)
                 current_operation['status'] = 'idle'
-                current_operation['progress'] = all_results  # Final logs
                 
                 # Update final status based on results
                 deleted_count = len([r for r in all_results if r['status'] == 'deleted'])
                 not_found_count = len([r for r in all_results if r['status'] == 'not_found'])
                 error_count = len([r for r in all_results if r['status'] == 'error'])
+                kept_count = len([r for r in all_results if r['status'] == 'skipped'])
+                kept_note = f", {kept_count} kept for other packages" if kept_count else ""
                 
-                if error_count > 0:
-                    current_operation['current_progress'] = f"Deletion completed with {error_count} errors, {deleted_count} deleted, {not_found_count} not found"
+                if job.cancel_event.is_set():
+                    current_operation['current_progress'] = f"Deletion cancelled: {deleted_count} deleted, {not_found_count} not found{kept_note}"
+                elif error_count > 0:
+                    current_operation['current_progress'] = f"Deletion completed with {error_count} errors, {deleted_count} deleted, {not_found_count} not found{kept_note}"
                 elif not_found_count > 0:
-                    current_operation['current_progress'] = f"Deletion completed: {deleted_count} deleted, {not_found_count} files were not found"
+                    current_operation['current_progress'] = f"Deletion completed: {deleted_count} deleted, {not_found_count} files were not found{kept_note}"
+                elif kept_count:
+                    current_operation['current_progress'] = f"Deletion completed: {deleted_count} deleted{kept_note}"
                 else:
                     current_operation['current_progress'] = f"All {deleted_count} files deleted successfully"
                     
             except Exception as e:
                 current_operation['status'] = 'error'
-                current_operation['progress'] = [{'status': 'error', 'message': f"Deletion failed: {str(e)}", 'file': 'unknown'}]
+                current_operation['progress'].append({'status': 'error', 'message': f"Deletion failed: {str(e)}", 'file': 'unknown'})
                 current_operation['current_progress'] = f"Deletion failed: {str(e)}"
+                raise
+        
+        add_base_path(base_path)  # Keep a live index of every base path a job writes to
+        job = job_queue.submit(Job(
+            'delete', f'Delete {model_name}', run_delete,
+            total=len(files_config),
+            paths=[resolve_target(f, base_path)[1] for f in files_config],
+            priority=parse_priority(data)
+        ))
+        
+        return jsonify({'success': True, 'message': f'Checking and deleting {model_name} files...', 'job_id': job.id})
         
-        thread = threading.Thread(target=run_delete)
-        thread.daemon = True
-        thread.start()
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+def submit_purge(base_path):
+    """Queue a low-priority job that empties the trash area of base_path"""
+    def run_purge(job):
+        job.operation['status'] = 'deleting'
+        job.operation['current_progress'] = "Purging trash..."
+        freed = purge_trash(base_path, job.cancel_event)
+        job.operation['status'] = 'idle'
+        job.operation['current_progress'] = f"Purged {freed / MB:.1f} MB from the trash"
+    
+    return job_queue.submit(Job('purge', f'Purge trash in {base_path}', run_purge, total=1, priority=-1))
+
+def parse_reclaim_request(data):
+    """Read base_path and packages from a reclaim request; returns (base_path, packages, error)"""
+    base_path = data.get('base_path')
+    packages = data.get('packages') or ([data['model']] if data.get('model') else [])
+    if not base_path or not os.path.isdir(base_path):
+        return base_path, packages, f'Directory not found: {base_path}'
+    unknown = [name for name in packages if name not in model_configs]
+    if unknown:
+        return base_path, packages, f'Unknown packages: {", ".join(unknown)}'
+    return base_path, packages, None
+
+@app.route('/reclaim/plan', methods=['POST'])
+def handle_reclaim_plan():
+    """Dry run: which files deleting the given packages frees, which are shared, and what is orphaned"""
+    try:
+        data = request.json
+        base_path, packages, error = parse_reclaim_request(data)
+        if error:
+            return jsonify({'success': False, 'message': error})
         
-        return jsonify({'success': True, 'message': f'Checking and deleting {model_name} files...'})
+        plan = plan_reclaim(model_configs, base_path, packages)
+        return jsonify(dict(plan, success=True))
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/reclaim', methods=['POST'])
+def handle_reclaim():
+    """Run a reclaim plan as one batched job; with trash the files are moved aside and purged later.
+
+    The safe files of the packages are removed (narrowed to paths when given);
+    orphaned and partial files only when paths lists them.
+    """
+    try:
+        data = request.json
+        base_path, packages, error = parse_reclaim_request(data)
+        if error:
+            return jsonify({'success': False, 'message': error})
+        trash = bool(data.get('trash'))
+        selected = data.get('paths')
+        
+        # Plan again now so the job acts on the current state of the disk
+        plan = plan_reclaim(model_configs, base_path, packages)
+        paths = plan['delete']
+        if selected:
+            # Only files the planner considers safe, orphaned or partial can be picked
+            wanted = set(os.path.abspath(path) for path in selected)
+            paths = [path for path in paths if path in wanted] + [
+                item['path'] for item in plan['orphaned'] + plan['partial'] if item['path'] in wanted
+            ]
+        sizes = dict((item['path'], item['size']) for item in plan['safe'] + plan['orphaned'] + plan['partial'])
+        if not paths:
+            return jsonify({'success': False, 'message': 'Nothing to reclaim'})
+        
+        def run_reclaim_job(job):
+            current_operation = job.operation
+            current_operation['status'] = 'deleting'
+            current_operation['bytes_total'] = sum(sizes[path] for path in paths)
+            current_operation['current_progress'] = f"Reclaiming {len(paths)} files..."
+            results, freed = run_reclaim(paths, base_path, trash, current_operation, job.cancel_event)
+            errors = len([r for r in results if r['status'] == 'error'])
+            current_operation['status'] = 'idle'
+            current_operation['current_progress'] = (
+                f"Reclaim {'cancelled' if job.cancel_event.is_set() else 'completed'}: "
+                f"{freed / MB:.1f} MB {'moved to trash' if trash else 'freed'}"
+                + (f", {errors} errors" if errors else "")
+            )
+            if trash and freed:
+                submit_purge(base_path)
+        
+        add_base_path(base_path)  # Keep a live index of every base path a job writes to
+        job = job_queue.submit(Job(
+            'reclaim', f'Reclaim {", ".join(packages) or "orphaned files"}', run_reclaim_job,
+            total=len(paths),
+            paths=paths,
+            priority=parse_priority(data)
+        ))
+        
+        return jsonify({
+            'success': True,
+            'message': f'Reclaiming {len(paths)} files...',
+            'job_id': job.id,
+            'files': len(paths)
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/reclaim/purge', methods=['POST'])
+def handle_reclaim_purge():
+    """Empty the trash area now instead of waiting for the next reclaim"""
+    try:
+        base_path = request.json.get('base_path')
+        if not base_path or not os.path.isdir(base_path):
+            return jsonify({'success': False, 'message': f'Directory not found: {base_path}'})
+        job = submit_purge(base_path)
+        return jsonify({'success': True, 'message': 'Purging trash...', 'job_id': job.id})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.route('/model_info', methods=['POST'])
 def handle_model_info():
     try:
@@ -556,12 +791,60 @@ def handle_model_info():
             'success': True,
             'model': model_name,
             'files': config['files'],
-            'requires_hf': config.get('hf', False)
+            'requires_hf': config.get('hf', False),
+            'summary': package_index.rows.get(model_name)
         })
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/packages')
+def handle_packages():
+    """Search and page through the catalog: ?q=&directory=&hf=&min_size=&max_size= (MB)&unknown_sizes=&offset=&limit=
+
+    Packages whose size is not fully known yet only match a size filter when unknown_sizes=1.
+    A size filter queues background probes for those sizes; sizes_pending counts the ones still running.
+    """
+    try:
+        args = request.args
+        hf = args.get('hf')
+        total, rows = package_index.search(
+            query=args.get('q', ''),
+            directory=args.get('directory', ''),
+            hf=None if hf in (None, '') else hf.lower() in ('1', 'true', 'yes'),
+            min_size=int(float(args.get('min_size') or 0) * MB),
+            max_size=int(float(args.get('max_size') or 0) * MB),
+            include_unknown=args.get('unknown_sizes', '').lower() in ('1', 'true', 'yes'),
+            offset=int(args.get('offset') or 0),
+            limit=int(args.get('limit') or PAGE_SIZE)
+        )
+        return jsonify({
+            'success': True,
+            'total': total,
+            'offset': int(args.get('offset') or 0),
+            'count': len(rows),
+            'packages': rows,
+            'directories': package_index.directories,
+            'sizes_pending': package_index.pending
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/install_state', methods=['POST'])
+def handle_install_state():
+    """Install state of every package in one call: complete, partial or missing, with bytes present and missing"""
+    try:
+        base_path = request.json.get('base_path')
+        if not base_path:
+            return jsonify({'success': False, 'message': 'Base path is required'})
+        
+        report, cached = install_state.get(model_configs, base_path)
+        return jsonify(dict(report, success=True, base_path=base_path, cached=cached))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.route('/check_status', methods=['POST'])
 def handle_check_status():
     try:
@@ -575,19 +858,34 @@ def handle_check_status():
         
         file_status = []
         found_count = 0
+        damaged_count = 0
+        index = get_index(base_path)
         
         for file_info in files_config:
             directory = os.path.join(base_path, file_info["directory"].lstrip('/'))
             filename = file_info["filename"] if file_info["filename"] else get_filename_from_url(file_info["url"])
             full_path = os.path.join(directory, filename)
             
-            exists = os.path.exists(full_path)
+            if index:
+                # Answered from the live index; the integrity check only reruns when the file changed
+                exists = index.is_installed(file_info, full_path)
+                integrity, detail = index.cached_check(
+                    [full_path], lambda: check_entry(file_info, full_path)
+                ) if exists else ('missing', '')
+            else:
+                exists = is_installed(file_info, full_path)
+                # Header and size check only - cheap enough for every status request
+                integrity, detail = check_entry(file_info, full_path) if exists else ('missing', '')
             if exists:
                 found_count += 1
+            if integrity in ('truncated', 'corrupt'):
+                damaged_count += 1
                 
             file_status.append({
                 'path': full_path,
                 'exists': exists,
+                'integrity': integrity,
+                'integrity_detail': detail,
                 'filename': filename,
                 'directory': file_info["directory"]
             })
@@ -598,12 +896,33 @@ def handle_check_status():
             'base_path': base_path,
             'total': len(files_config),
             'found': found_count,
+            'damaged': damaged_count,
             'file_status': file_status
         })
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/preflight', methods=['POST'])
+def handle_preflight():
+    """Probe all files of a package: sizes, what is already present and an ETA"""
+    try:
+        data = request.json
+        model_name = data.get('model')
+        base_path = data.get('base_path')
+        hf_token = data.get('hf_token', '').strip()
+        
+        files_config = convert_config_format(model_name)
+        if not files_config:
+            return jsonify({'success': False, 'message': 'Invalid model selection'})
+        
+        report = preflight(files_config, base_path, hf_token)
+        package_index.learn_sizes(dict((entry["url"], checked["size"]) for entry, checked in zip(files_config, report["files"])))
+        return jsonify(dict(report, success=True, model=model_name, base_path=base_path))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.route('/browse_directory', methods=['POST'])
 def browse_directory():
     try:
@@ -613,75 +932,60 @@ def browse_directory():
         if not path:
             return jsonify({'success': False, 'message': 'No path provided'})
         
-        if not os.path.exists(path):
-            return jsonify({'success': False, 'message': 'Path does not exist'})
-        
-        if not os.path.isdir(path):
-            return jsonify({'success': False, 'message': 'Path is not a directory'})
-        
         structure = []
         
         try:
-            # Get directory contents
-            items = os.listdir(path)
-            items.sort()  # Sort alphabetically
+            # Listings come from the live index of the models directory
+            dirs, files = list_directory(path)
             
-            for item in items:
-                item_path = os.path.join(path, item)
-                
-                if os.path.isdir(item_path):
-                    # For directories, get immediate children for lazy loading
-                    try:
-                        children = []
-                        sub_items = os.listdir(item_path)
-                        sub_items.sort()
-                        
-                        for sub_item in sub_items[:50]:  # Limit to 50 items per folder
-                            sub_path = os.path.join(item_path, sub_item)
-                            if os.path.isdir(sub_path):
-                                children.append({
-                                    'name': sub_item,
-                                    'type': 'folder',
-                                    'children': []  # Lazy load deeper levels
-                                })
-                            else:
-                                try:
-                                    size = os.path.getsize(sub_path)
-                                except:
-                                    size = 0
-                                children.append({
-                                    'name': sub_item,
-                                    'type': 'file',
-                                    'size': size
-                                })
-                        
-                        structure.append({
-                            'name': item,
-                            'type': 'folder',
-                            'children': children
-                        })
-                    except PermissionError:
-                        structure.append({
-                            'name': item,
-                            'type': 'folder',
-                            'children': [{'name': 'Permission denied', 'type': 'file', 'size': 0}]
-                        })
-                else:
-                    try:
-                        size = os.path.getsize(item_path)
-                    except:
-                        size = 0
+            for item in sorted(dirs + list(files)):
+                if item in files:
                     structure.append({
                         'name': item,
                         'type': 'file',
-                        'size': size
+                        'size': files[item]
+                    })
+                    continue
+                
+                # For directories, include immediate children for lazy loading
+                try:
+                    sub_dirs, sub_files = list_directory(os.path.join(path, item))
+                except PermissionError:
+                    structure.append({
+                        'name': item,
+                        'type': 'folder',
+                        'children': [{'name': 'Permission denied', 'type': 'file', 'size': 0}]
                     })
+                    continue
+                children = []
+                for sub_item in sorted(sub_dirs + list(sub_files))[:50]:  # Limit to 50 items per folder
+                    if sub_item in sub_files:
+                        children.append({
+                            'name': sub_item,
+                            'type': 'file',
+                            'size': sub_files[sub_item]
+                        })
+                    else:
+                        children.append({
+                            'name': sub_item,
+                            'type': 'folder',
+                            'children': []  # Lazy load deeper levels
+                        })
+                structure.append({
+                    'name': item,
+                    'type': 'folder',
+                    'children': children
+                })
             
             return jsonify({
                 'success': True,
                 'structure': structure
             })
             
+        except FileNotFoundError:
+            return jsonify({'success': False, 'message': 'Path does not exist'})
+        except NotADirectoryError:
+            return jsonify({'success': False, 'message': 'Path is not a directory'})
         except PermissionError:
             return jsonify({'success': False, 'message': 'Permission denied'})
         except Exception as e:
@@ -690,35 +994,86 @@ def browse_directory():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
-@app.route('/get_folders', methods=['POST'])
-def get_folders():
-    """Get list of subdirectories from base path for folder dropdown"""
+@app.route('/tree', methods=['POST'])
+def handle_tree():
+    """Paginated directory tree: path, depth, cursor, limit, sort (name|size|mtime) and reverse.
+
+    Responses carry an ETag; a request with a matching If-None-Match gets a 304.
+    """
     try:
         data = request.json
-        base_path = data.get('base_path', DEFAULT_BASE_PATH)
+        path = data.get('path', '')
         
-        if not os.path.exists(base_path):
-            return jsonify({'success': False, 'message': 'Base path does not exist'})
+        if not path:
+            return jsonify({'success': False, 'message': 'No path provided'})
         
-        if not os.path.isdir(base_path):
+        try:
+            page = tree(
+                path,
+                depth=data.get('depth') or 1,
+                cursor=data.get('cursor') or '',
+                limit=data.get('limit') or TREE_PAGE_SIZE,
+                sort=data.get('sort') or 'name',
+                reverse=bool(data.get('reverse'))
+            )
+        except FileNotFoundError:
+            return jsonify({'success': False, 'message': 'Path does not exist'})
+        except NotADirectoryError:
+            return jsonify({'success': False, 'message': 'Path is not a directory'})
+        except PermissionError:
+            return jsonify({'success': False, 'message': 'Permission denied'})
+        
+        etag = hashlib.sha1(json.dumps(page, sort_keys=True).encode('utf-8')).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = jsonify(dict(page, success=True))
+        response.set_etag(etag)
+        return response
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/disk_usage', methods=['POST'])
+def handle_disk_usage():
+    """Recursive size and file count of the base path and each top-level folder, from the live index"""
+    try:
+        base_path = request.json.get('base_path', DEFAULT_BASE_PATH)
+        
+        try:
+            usage = disk_usage(base_path)
+        except FileNotFoundError:
+            return jsonify({'success': False, 'message': 'Base path does not exist'})
+        except NotADirectoryError:
             return jsonify({'success': False, 'message': 'Base path is not a directory'})
+        except LookupError:
+            return jsonify({'success': False, 'message': 'Disk usage is tracked for the default base path and base paths a job has used'})
         
-        folders = []
+        return jsonify(dict(usage, success=True))
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/get_folders', methods=['POST'])
+def get_folders():
+    """Get list of subdirectories from base path for folder dropdown"""
+    try:
+        data = request.json
+        base_path = data.get('base_path', DEFAULT_BASE_PATH)
         
         try:
-            # Get all subdirectories
-            for item in os.listdir(base_path):
-                item_path = os.path.join(base_path, item)
-                if os.path.isdir(item_path):
-                    folders.append(item)
-            
-            folders.sort()  # Sort alphabetically
+            # Subdirectories from the live index, already sorted
+            folders = list_directory(base_path)[0]
             
             return jsonify({
                 'success': True,
                 'folders': folders
             })
             
+        except FileNotFoundError:
+            return jsonify({'success': False, 'message': 'Base path does not exist'})
+        except NotADirectoryError:
+            return jsonify({'success': False, 'message': 'Base path is not a directory'})
         except PermissionError:
             return jsonify({'success': False, 'message': 'Permission denied'})
         except Exception as e:
@@ -744,47 +1099,54 @@ def handle_custom_download():
         if not folder:
             return jsonify({'success': False, 'message': 'Target folder is required'})
         
-        # Create file info structure for download_files function
+        # Create file info structure for download_package function
         file_info = {
             "url": url,
             "directory": folder,
-            "filename": custom_filename if custom_filename else ""
+            "filename": custom_filename if custom_filename else "",
+            "custom": True  # Not part of a package, so reclaim never treats it as an orphan
         }
         
-        # Reset progress tracking
-        current_operation['status'] = 'downloading'
-        current_operation['progress'] = []
-        current_operation['total'] = 1
-        current_operation['current'] = 0
-        current_operation['current_file'] = custom_filename if custom_filename else get_filename_from_url(url)
-        current_operation['current_progress'] = "Starting custom download..."
-        
-        # Run download in a separate thread
-        def run_custom_download():
+        # Run download as a queued job
+        def run_custom_download(job):
+            current_operation = job.operation
+            current_operation['status'] = 'downloading'
+            current_operation['current_file'] = custom_filename if custom_filename else get_filename_from_url(url)
+            current_operation['current_progress'] = "Starting custom download..."
             try:
-                result = download_files([file_info], base_path, hf_token)
+                result = download_package([file_info], base_path, hf_token, current_operation,
+                                          cancel_event=job.cancel_event)
                 
                 current_operation['current'] = 1
                 current_operation['status'] = 'idle'
-                current_operation['progress'] = result
+                current_operation['progress'].extend(result)
                 
                 if result and result[0]['status'] == 'success':
                     current_operation['current_progress'] = "Download completed successfully"
                 elif result and result[0]['status'] == 'skipped':
                     current_operation['current_progress'] = "File already exists"
+                elif result and result[0]['status'] == 'linked':
+                    current_operation['current_progress'] = "Linked to an existing copy"
+                elif result and result[0]['status'] == 'cancelled':
+                    current_operation['current_progress'] = "Download cancelled - partial file kept for resume"
                 else:
                     current_operation['current_progress'] = "Download failed"
                     
             except Exception as e:
                 current_operation['status'] = 'error'
-                current_operation['progress'] = [{'status': 'error', 'message': f"Download failed: {str(e)}", 'file': 'unknown'}]
+                current_operation['progress'].append({'status': 'error', 'message': f"Download failed: {str(e)}", 'file': 'unknown'})
                 current_operation['current_progress'] = f"Download failed: {str(e)}"
+                raise
         
-        thread = threading.Thread(target=run_custom_download)
-        thread.daemon = True
-        thread.start()
+        add_base_path(base_path)  # Keep a live index of every base path a job writes to
+        job = job_queue.submit(Job(
+            'custom_download', f'Download {url}', run_custom_download,
+            total=1,
+            paths=[resolve_target(file_info, base_path)[1]],
+            priority=parse_priority(data)
+        ))
         
-        return jsonify({'success': True, 'message': 'Custom download started...'})
+        return jsonify({'success': True, 'message': 'Custom download started...', 'job_id': job.id})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -818,25 +1180,128 @@ def delete_file():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
-@app.route('/progress')
-def get_progress():
-    # Get real-time wget progress from log file
-    wget_progress = get_wget_log_tail()
+def progress_record(job, since=0):
+    """Progress of a job as served by /progress and pushed on /events.
+
+    Job logs only grow, so since=<n> sends the entries after the first n;
+    'progress_seq' is the cursor for the next call. A cursor past the end (the
+    log was replaced) gets the whole log with progress_reset set.
+    """
+    current_operation = job.operation if job else dict(new_operation(), status='idle', current_progress='')
+    progress = current_operation['progress']
+    reset = since == 0 or since > len(progress)
     
-    progress_data = {
+    # The engine keeps this record current - just serve it
+    return {
+        'job_id': job.id if job else None,
+        'job_state': job.state if job else None,
         'status': current_operation['status'],
         'current': current_operation['current'], 
         'total': current_operation['total'],
-        'progress': current_operation['progress'],
+        'progress': progress if reset else progress[since:],
+        'progress_seq': len(progress),
+        'progress_reset': reset,
         'current_file': current_operation.get('current_file', ''),
-        'current_progress': wget_progress or current_operation.get('current_progress', '')
+        'current_progress': current_operation.get('current_progress', ''),
+        'bytes_done': current_operation.get('bytes_done', 0),
+        'bytes_total': current_operation.get('bytes_total', 0),
+        'rate': current_operation.get('rate', 0),
+        'avg_rate': current_operation.get('avg_rate', 0),
+        'eta': current_operation.get('eta'),
+        'preflight': current_operation.get('preflight'),
+        'files': current_operation.get('files', [])
     }
-    
-    return jsonify(progress_data)
+
+@app.route('/progress')
+def get_progress():
+    # Progress of the requested job, or of the most recent one
+    job_id = request.args.get('job_id', '')
+    job = get_job_or_latest(job_id)
+    if job_id and job is None:
+        return jsonify({'success': False, 'message': f'Unknown job: {job_id}'}), 404
+    # A cursor only applies to the job it was read from
+    since = parse_since() if job_id else 0
+    return jsonify(progress_record(job, since))
+
+@app.route('/jobs')
+def list_jobs():
+    """List queued, running and recently finished jobs"""
+    return jsonify({
+        'success': True,
+        'workers': job_queue.target_workers,
+        'jobs': [job.to_dict() for job in job_queue.list()]
+    })
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Inspect one job including its full progress record"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': f'Unknown job: {job_id}'}), 404
+    return jsonify({'success': True, 'job': job.to_dict(include_operation=True)})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': f'Unknown job: {job_id}'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/jobs/<job_id>/priority', methods=['POST'])
+def set_job_priority(job_id):
+    try:
+        priority = parse_priority(request.json or {})
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Priority must be an integer'})
+    job = job_queue.set_priority(job_id, priority)
+    if job is None:
+        return jsonify({'success': False, 'message': f'Unknown job: {job_id}'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/jobs/workers', methods=['POST'])
+def set_job_workers():
+    """Change how many jobs may run at the same time"""
+    try:
+        workers = int((request.json or {}).get('workers'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Workers must be an integer'})
+    job_queue.set_workers(workers)
+    set_concurrent_jobs(job_queue.target_workers)
+    return jsonify({'success': True, 'workers': job_queue.target_workers})
+
+@app.route('/bandwidth', methods=['GET', 'POST'])
+def handle_bandwidth():
+    """Get or change the bandwidth limit shared by all downloads (MB/s, 0 = unlimited)"""
+    try:
+        if request.method == 'POST':
+            data = request.json or {}
+            limit = data.get('limit')
+            schedules = data.get('schedules')
+            bandwidth_limiter.configure(
+                rate=None if limit is None else float(limit) * MB,
+                schedules=None if schedules is None else [
+                    {'start': w['start'], 'end': w['end'], 'rate': float(w.get('limit') or 0) * MB}
+                    for w in schedules
+                ]
+            )
+        
+        settings = bandwidth_limiter.settings()
+        return jsonify({
+            'success': True,
+            'limit': settings['rate'] / MB,
+            'schedules': [{'start': w['start'], 'end': w['end'], 'limit': w['rate'] / MB} for w in settings['schedules']],
+            'effective_limit': settings['effective_rate'] / MB
+        })
+        
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Invalid bandwidth settings: {e}'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE, default_path=DEFAULT_BASE_PATH)
+    return render_template_string(HTML_TEMPLATE, default_path=DEFAULT_BASE_PATH, parallel=PACKAGE_WORKERS,
+                                  max_parallel=MAX_PACKAGE_WORKERS)
 
 @app.route('/check_comfyui_installed', methods=['POST'])
 def check_comfyui_installed():
@@ -861,9 +1326,12 @@ def install_comfyui():
     if comfyui_install_status['status'] == 'installing':
         return jsonify({'success': False, 'message': 'Installation already in progress'})
 
-    comfyui_install_status = {'status': 'installing', 'log': ['Starting ComfyUI installation...'], 'step': 'init'}
+    comfyui_install_log.clear()
+    comfyui_install_log.append('Starting ComfyUI installation...')
+    comfyui_install_status = {'status': 'installing', 'log': comfyui_install_log, 'step': 'init'}
 
-    def run_install():
+    async def run_install():
+        # Each step's output is logged as it arrives and its exit awaited before the next one
         import sys
         log = comfyui_install_status['log']
         try:
@@ -875,17 +1343,11 @@ def install_comfyui():
             else:
                 log.append(f'Cloning ComfyUI into {install_dir}...')
                 comfyui_install_status['step'] = 'cloning'
-                clone_proc = subprocess.Popen(
-                    ['git', 'clone', 'https://github.com/comfyanonymous/ComfyUI.git', str(install_path)],
-                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
+                returncode = await run_logged(
+                    ['git', 'clone', 'https://github.com/comfyanonymous/ComfyUI.git', str(install_path)], log.append
                 )
-                for line in iter(clone_proc.stdout.readline, ''):
-                    stripped = line.rstrip()
-                    if stripped:
-                        log.append(stripped)
-                clone_proc.wait()
-                if clone_proc.returncode != 0:
-                    log.append(f'ERROR: git clone failed (exit code {clone_proc.returncode})')
+                if returncode != 0:
+                    log.append(f'ERROR: git clone failed (exit code {returncode})')
                     comfyui_install_status['status'] = 'error'
                     return
                 log.append('Clone complete.')
@@ -898,17 +1360,9 @@ def install_comfyui():
                 else:
                     log.append(f'Creating venv at {venv_path}...')
                     comfyui_install_status['step'] = 'venv'
-                    venv_proc = subprocess.Popen(
-                        [sys.executable, '-m', 'venv', str(venv_path)],
-                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
-                    )
-                    for line in iter(venv_proc.stdout.readline, ''):
-                        stripped = line.rstrip()
-                        if stripped:
-                            log.append(stripped)
-                    venv_proc.wait()
-                    if venv_proc.returncode != 0:
-                        log.append(f'ERROR: venv creation failed (exit code {venv_proc.returncode})')
+                    returncode = await run_logged([sys.executable, '-m', 'venv', str(venv_path)], log.append)
+                    if returncode != 0:
+                        log.append(f'ERROR: venv creation failed (exit code {returncode})')
                         comfyui_install_status['status'] = 'error'
                         return
                     log.append('Venv created.')
@@ -923,17 +1377,9 @@ def install_comfyui():
                 dest = f'ComfyUI venv ({install_path / "venv"})' if create_venv else 'current environment'
                 log.append(f'Installing Python requirements into {dest}...')
                 comfyui_install_status['step'] = 'pip'
-                pip_proc = subprocess.Popen(
-                    [pip_exe, 'install', '-r', str(req_file)],
-                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
-                )
-                for line in iter(pip_proc.stdout.readline, ''):
-                    stripped = line.rstrip()
-                    if stripped:
-                        log.append(stripped)
-                pip_proc.wait()
-                if pip_proc.returncode != 0:
-                    log.append(f'ERROR: pip install failed (exit code {pip_proc.returncode})')
+                returncode = await run_logged([pip_exe, 'install', '-r', str(req_file)], log.append)
+                if returncode != 0:
+                    log.append(f'ERROR: pip install failed (exit code {returncode})')
                     comfyui_install_status['status'] = 'error'
                     return
                 log.append('Requirements installed successfully.')
@@ -955,32 +1401,16 @@ def install_comfyui():
                     else:
                         log.append(f'[{node_name}] Cloning from {url}...')
                         comfyui_install_status['step'] = f'custom_node:{node_name}'
-                        cn_clone = subprocess.Popen(
-                            ['git', 'clone', url, str(node_path)],
-                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
-                        )
-                        for line in iter(cn_clone.stdout.readline, ''):
-                            stripped = line.rstrip()
-                            if stripped:
-                                log.append(stripped)
-                        cn_clone.wait()
-                        if cn_clone.returncode != 0:
+                        returncode = await run_logged(['git', 'clone', url, str(node_path)], log.append)
+                        if returncode != 0:
                             log.append(f'[{node_name}] ERROR: clone failed — skipping.')
                             continue
                         log.append(f'[{node_name}] Cloned.')
                     node_req = node_path / 'requirements.txt'
                     if node_req.exists():
                         log.append(f'[{node_name}] Installing requirements...')
-                        cn_pip = subprocess.Popen(
-                            [pip_exe, 'install', '-r', str(node_req)],
-                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
-                        )
-                        for line in iter(cn_pip.stdout.readline, ''):
-                            stripped = line.rstrip()
-                            if stripped:
-                                log.append(stripped)
-                        cn_pip.wait()
-                        if cn_pip.returncode != 0:
+                        returncode = await run_logged([pip_exe, 'install', '-r', str(node_req)], log.append)
+                        if returncode != 0:
                             log.append(f'[{node_name}] ERROR: pip install failed.')
                         else:
                             log.append(f'[{node_name}] Requirements installed.')
@@ -992,17 +1422,27 @@ def install_comfyui():
             log.append(f'ERROR: {str(e)}')
             comfyui_install_status['status'] = 'error'
 
-    thread = threading.Thread(target=run_install)
-    thread.daemon = True
-    thread.start()
+    start_task(run_install)
     return jsonify({'success': True, 'message': 'Installation started'})
 
 
+def parse_since():
+    """Read the since=<seq> cursor of an incremental request"""
+    try:
+        return max(0, int(request.args.get('since') or 0))
+    except ValueError:
+        return 0
+
 @app.route('/comfyui_install_progress')
 def comfyui_install_progress():
+    # With since=<seq> only the lines after it are sent; 'seq' is the cursor for the next call
+    delta = comfyui_install_log.since(parse_since())
     return jsonify({
         'status': comfyui_install_status['status'],
-        'log': list(comfyui_install_status['log']),
+        'log': delta['lines'],
+        'seq': delta['seq'],
+        'reset': delta['reset'],
+        'complete': delta['complete'],
         'step': comfyui_install_status.get('step', '')
     })
 
@@ -1055,19 +1495,7 @@ def run_comfyui():
             stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
             universal_newlines=True, cwd=comfyui_dir
         )
-
-        def capture_output():
-            try:
-                for line in iter(comfyui_process.stdout.readline, ''):
-                    stripped = line.rstrip()
-                    if stripped:
-                        comfyui_run_log.append(stripped)
-            except Exception as e:
-                comfyui_run_log.append(f'[Log capture error: {e}]')
-
-        t = threading.Thread(target=capture_output)
-        t.daemon = True
-        t.start()
+        follow_output(comfyui_process.stdout, comfyui_run_log.append)
 
         return jsonify({'success': True, 'message': f'ComfyUI started on port {port_int}', 'pid': comfyui_process.pid})
 
@@ -1110,9 +1538,82 @@ def get_comfyui_status():
 def get_comfyui_log():
     global comfyui_process, comfyui_run_log
     running = comfyui_process is not None and comfyui_process.poll() is None
+    # With since=<seq> only the lines after it are sent; 'seq' is the cursor for the next call
+    delta = comfyui_run_log.since(parse_since())
     return jsonify({
         'running': running,
-        'log': list(comfyui_run_log)
+        'log': delta['lines'],
+        'seq': delta['seq'],
+        'reset': delta['reset'],
+        'complete': delta['complete']
+    })
+
+
+EVENT_JOB_LINGER = 10   # Seconds a finished job keeps being reported, so its final state is pushed
+
+def active_jobs():
+    now = time.time()
+    return dict((job.id, job) for job in job_queue.list()
+                if job.state in ('queued', 'running') or (job.finished and now - job.finished < EVENT_JOB_LINGER))
+
+# Cursors of what has been pushed on /events so far
+events_pushed = {'jobs': {}, 'install': 0, 'install_state': None, 'comfyui_log': 0, 'running': None}
+
+def job_events(initial):
+    """Push job progress when it changes, with only the log entries added since the last push"""
+    jobs = active_jobs()
+    pushed = events_pushed['jobs']   # job_id -> (progress_seq, snapshot of the rest)
+    events = []
+    for job_id, job in jobs.items():
+        seq, last = pushed.get(job_id, (0, None))
+        record = progress_record(job, 0 if initial else seq)
+        if initial:
+            events.append(('progress', record))
+            continue
+        # Without the log the record is small, so comparing it serialized stays cheap
+        snapshot = json.dumps(dict(record, progress=None, progress_seq=None, progress_reset=None), sort_keys=True)
+        if record['progress'] or snapshot != last:
+            pushed[job_id] = (record['progress_seq'], snapshot)
+            events.append(('progress', record))
+    for job_id in list(pushed):
+        if job_id not in jobs:
+            del pushed[job_id]
+    return events
+
+def install_events(initial):
+    """Push install status changes and the log lines added since the last check"""
+    state = (comfyui_install_status['status'], comfyui_install_status.get('step', ''))
+    delta = comfyui_install_log.since(0 if initial else events_pushed['install'])
+    if not initial:
+        if not delta['lines'] and not delta['reset'] and events_pushed['install_state'] == state:
+            return []
+        events_pushed.update(install=delta['seq'], install_state=state)
+    return [('install', {'status': state[0], 'step': state[1], 'lines': delta['lines'], 'seq': delta['seq'], 'reset': delta['reset']})]
+
+def comfyui_log_events(initial):
+    """Push the ComfyUI log lines added since the last check, and start/stop"""
+    running = comfyui_process is not None and comfyui_process.poll() is None
+    delta = comfyui_run_log.since(0 if initial else events_pushed['comfyui_log'])
+    if not initial:
+        if not delta['lines'] and not delta['reset'] and events_pushed['running'] == running:
+            return []
+        events_pushed.update(comfyui_log=delta['seq'], running=running)
+    return [('comfyui_log', {'running': running, 'lines': delta['lines'], 'seq': delta['seq'], 'reset': delta['reset']})]
+
+event_bus.add_source(job_events)
+event_bus.add_source(install_events)
+event_bus.add_source(comfyui_log_events)
+
+@app.route('/events')
+def events():
+    """Server-Sent Events: progress of active jobs, install steps and ComfyUI log lines as they change.
+
+    Under --asgi this route is served by model_asgi on the event loop instead.
+    """
+    client = event_bus.subscribe()
+    return Response(event_bus.stream(client), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 
@@ -1121,9 +1622,14 @@ def main():
     print("🤖 Model Manager by WeirdWonderfulAi.Art v1.0")
     print("=" * 60)
     
-    # Load initial configurations
+    # Index the default models directory in the background; other base paths are added as jobs use them
+    add_base_path(DEFAULT_BASE_PATH)
+    
+    # Load initial configurations: serve the cached copy at once and revalidate it in the background
     print("Loading model configurations...")
-    if load_model_configs():
+    if load_cached_configs():
+        revalidate_configs()
+    elif load_model_configs():
         print(f"Successfully loaded {len(model_configs)} model configurations")
     else:
         print("Failed to load model configurations")
@@ -1136,6 +1642,11 @@ def main():
     print("\nPress Ctrl+C to stop the server")
     
     try:
+        # --asgi serves on an asyncio event loop when uvicorn is installed
+        if '--asgi' in sys.argv:
+            if serve_asgi(app, host='0.0.0.0', port=9999):
+                return
+            print("uvicorn is not installed (pip install uvicorn) - using the threaded server")
         app.run(host='0.0.0.0', port=9999, debug=False, threaded=True)
     except KeyboardInterrupt:
         print("\n\nServer stopped by user")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Reclaim Functions
+Plan and run package-aware deletion: shared files are kept, orphans are found
+"""
+
+import os
+import shutil
+import time
+
+from model_dedup import content_index
+from model_download import resolve_target, PART_SUFFIX, META_SUFFIX
+from model_extract import read_manifest, extracted_files
+from model_fsindex import get_index, TRASH_DIR
+
+RECLAIM_BATCH = 50                      # Files handled between progress updates
+
+
+def package_files(files, base_path):
+    """Absolute paths a package's config entries occupy (archives: the files they were extracted to)"""
+    paths = []
+    for entry in files:
+        full_path = resolve_target(entry, base_path)[1]
+        if entry.get("extract"):
+            paths.extend(os.path.abspath(path) for path in read_manifest(full_path) or [])
+        else:
+            paths.append(os.path.abspath(full_path))
+    return paths
+
+
+def reference_map(configs, base_path):
+    """Map every file path referenced by model_configs to the packages that list it"""
+    references = {}
+    for name, config in configs.items():
+        for path in package_files(config["files"], base_path):
+            references.setdefault(path, [])
+            if name not in references[path]:
+                references[path].append(name)
+    return references
+
+
+def file_sizes(paths, base_path):
+    """Size of each of paths that exists, looked up in the live index of base_path when there is one"""
+    index = get_index(base_path)
+    sizes = {}
+    for path in paths:
+        if index and index.covers(path):
+            entry = index.lookup(path)
+            if entry:
+                sizes[path] = entry[0]
+            continue
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            continue
+    return sizes
+
+
+def written_files(base_path):
+    """Files under base_path this manager wrote for a package: downloads, links and extracted archive members"""
+    base = os.path.abspath(base_path) + os.sep
+    paths = set(content_index.package_paths(base_path))
+    paths.update(os.path.abspath(path) for path in extracted_files())
+    trash = os.path.join(trash_root(os.path.abspath(base_path)), "")
+    return set(path for path in paths if path.startswith(base) and not path.startswith(trash))
+
+
+def installed_packages(configs, base_path, sizes, excluding=()):
+    """Packages that count as installed and so keep their files.
+
+    A package is installed when all of its files are present, or when it has a
+    present file it does not share with the packages in excluding - a partial
+    install still needs what it has.
+    """
+    excluded = set()
+    for name in excluding:
+        excluded.update(package_files(configs[name]["files"], base_path))
+    installed = set()
+    for name, config in configs.items():
+        if name in excluding:
+            continue
+        paths = package_files(config["files"], base_path)
+        present = [path for path in paths if path in sizes]
+        if paths and (len(present) == len(paths) or any(path not in excluded for path in present)):
+            installed.add(name)
+    return installed
+
+
+def plan_reclaim(configs, base_path, packages=()):
+    """Work out what deleting packages would free, without touching anything.
+
+    Returns a plan with files that are "safe" to delete (only needed by the
+    packages being removed), "shared" (still needed by another installed package,
+    with its names), "orphaned" (written by this manager for a package, e.g. an
+    older version, but referenced by no package now) and "partial" (leftover
+    .part downloads of package files), each with sizes. Files the manager did not
+    write - custom downloads, models added by hand - are never listed.
+    plan["delete"] holds only the safe files; orphans and partials are removed
+    only when a reclaim request names them.
+    """
+    packages = [name for name in packages if name in configs]
+    references = reference_map(configs, base_path)
+    written = written_files(base_path)
+    partials = [path + suffix for path in references for suffix in (PART_SUFFIX, PART_SUFFIX + META_SUFFIX)]
+    sizes = file_sizes(set(references) | written | set(partials), base_path)
+    installed = installed_packages(configs, base_path, sizes, excluding=packages)
+
+    safe, shared = [], []
+    seen = set()
+    for name in packages:
+        for path in package_files(configs[name]["files"], base_path):
+            if path in seen or path not in sizes:
+                continue
+            seen.add(path)
+            needed_by = [other for other in references.get(path, []) if other in installed]
+            item = {"path": path, "size": sizes[path], "packages": references.get(path, [])}
+            if needed_by:
+                shared.append(dict(item, needed_by=needed_by))
+            else:
+                safe.append(item)
+
+    orphaned = [{"path": path, "size": sizes[path]} for path in sorted(written)
+                if path in sizes and path not in references]
+    partial = [{"path": path, "size": sizes[path]} for path in sorted(partials) if path in sizes]
+
+    delete = [item["path"] for item in safe]
+    return {
+        "base_path": base_path,
+        "packages": packages,
+        "safe": safe,
+        "shared": shared,
+        "orphaned": orphaned,
+        "partial": partial,
+        "delete": delete,
+        "safe_bytes": sum(item["size"] for item in safe),
+        "shared_bytes": sum(item["size"] for item in shared),
+        "orphaned_bytes": sum(item["size"] for item in orphaned),
+        "partial_bytes": sum(item["size"] for item in partial),
+        "delete_bytes": sum(sizes[path] for path in delete)
+    }
+
+
+def is_under(path, base):
+    """Whether path lies within base; paths on another drive (Windows) do not"""
+    try:
+        return os.path.commonpath([base, path]) == base
+    except ValueError:
+        return False
+
+
+def trash_root(base_path):
+    return os.path.join(base_path, TRASH_DIR)
+
+
+def move_to_trash(path, base_path, batch):
+    """Move path into this run's trash batch, keeping its place relative to base_path"""
+    relative = os.path.relpath(path, base_path)
+    target = os.path.join(trash_root(base_path), batch, relative)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+
+
+def run_reclaim(paths, base_path, trash=False, operation=None, cancel_event=None):
+    """Delete (or move to the trash area) the given paths under base_path as one batch.
+
+    Paths outside base_path are refused. Progress goes to operation every
+    RECLAIM_BATCH files. Returns (results, freed_bytes).
+    """
+    base = os.path.abspath(base_path)
+    batch = time.strftime("%Y%m%d-%H%M%S")
+    results = operation['progress'] if operation is not None else []
+    freed = 0
+    for index, path in enumerate(paths, 1):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        path = os.path.abspath(path)
+        name = os.path.basename(path)
+        if not is_under(path, base) or path.startswith(trash_root(base) + os.sep):
+            results.append({"status": "error", "file": name, "message": f"Refusing to delete {path} outside {base}"})
+            continue
+        try:
+            size = os.path.getsize(path)
+            if trash:
+                move_to_trash(path, base, batch)
+            else:
+                os.remove(path)
+            freed += size
+            results.append({"status": "deleted", "file": name, "message": f"Deleted {path}"})
+        except FileNotFoundError:
+            results.append({"status": "not_found", "file": name, "message": f"Already gone: {path}"})
+        except OSError as e:
+            results.append({"status": "error", "file": name, "message": f"Error deleting {path}: {e}"})
+
+        if operation is not None and (index % RECLAIM_BATCH == 0 or index == len(paths)):
+            operation['current'] = index
+            operation['bytes_done'] = freed
+            operation['current_progress'] = f"Reclaimed {index} of {len(paths)} files"
+    return results, freed
+
+
+def purge_trash(base_path, cancel_event=None):
+    """Permanently remove everything in the trash area of base_path; returns the bytes freed"""
+    root = trash_root(base_path)
+    if not os.path.isdir(root):
+        return 0
+    freed = 0
+    for batch in sorted(os.listdir(root)):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        batch_path = os.path.join(root, batch)
+        for dirpath, _, files in os.walk(batch_path):
+            for name in files:
+                try:
+                    freed += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+        shutil.rmtree(batch_path, ignore_errors=True)
+    return freed
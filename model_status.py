@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Status Functions
+Install state of every package at once, cached until the model directories change
+"""
+
+import os
+import threading
+
+from model_download import resolve_target, cached_probe
+from model_extract import read_manifest, manifest_path
+
+
+def stat_size(path):
+    """Size of a file, or None when it does not exist"""
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def stat_mtime(path):
+    """mtime_ns of a path, or None when it does not exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def entry_paths(entry, full_path):
+    """Files a config entry puts on disk - the extracted files for archives, None if not extracted yet"""
+    if entry.get("extract"):
+        return read_manifest(full_path)
+    return [full_path]
+
+
+def expected_size(entry):
+    """Download size of an entry from the config or the probe cache, 0 when unknown"""
+    size = int(entry.get("size") or 0)
+    if not size:
+        info = cached_probe(entry["url"])
+        size = info["size"] if info else 0
+    return size
+
+
+class InstallStateCache:
+    """Install state of every package under a base path, recomputed only when the filesystem changed.
+
+    Validity is checked with one stat per distinct directory holding package files
+    (and per archive manifest): creating, deleting or renaming a file in there
+    changes the directory mtime, and downloads always rename into place.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cache = {}         # base_path -> (configs, fingerprint, report)
+
+    def fingerprint(self, watched):
+        return dict((path, stat_mtime(path)) for path in watched)
+
+    def get(self, configs, base_path):
+        """Return (report, cached) for base_path, recomputing when anything watched changed"""
+        base_path = os.path.abspath(base_path)
+        with self.lock:
+            cached = self.cache.get(base_path)
+        if cached and cached[0] is configs and self.fingerprint(cached[1]) == cached[1]:
+            return cached[2], True
+
+        report, watched = self.compute(configs, base_path)
+        fingerprint = self.fingerprint(watched)
+        with self.lock:
+            self.cache[base_path] = (configs, fingerprint, report)
+        return report, False
+
+    def invalidate(self, base_path=None):
+        with self.lock:
+            if base_path is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(os.path.abspath(base_path), None)
+
+    def compute(self, configs, base_path):
+        """Stat each distinct path once and roll the results up per package; returns (report, watched paths)"""
+        sizes = {}
+        watched = set()
+
+        def size_of(path):
+            if path not in sizes:
+                sizes[path] = stat_size(path)
+                watched.add(os.path.dirname(path))
+            return sizes[path]
+
+        packages = {}
+        counts = {"complete": 0, "partial": 0, "missing": 0}
+        for name, config in configs.items():
+            present_files = 0
+            bytes_present = 0
+            bytes_missing = 0
+            unknown_sizes = 0
+            for entry in config.get("files", []):
+                full_path = os.path.abspath(resolve_target(entry, base_path)[1])
+                if entry.get("extract"):
+                    watched.add(manifest_path(full_path))
+                    watched.add(os.path.dirname(full_path))
+                paths = entry_paths(entry, full_path)
+                present = [size_of(path) for path in paths or []]
+                if paths and all(size is not None for size in present):
+                    present_files += 1
+                    bytes_present += sum(present)
+                else:
+                    size = expected_size(entry)
+                    bytes_missing += size
+                    unknown_sizes += 0 if size else 1
+
+            total = len(config.get("files", []))
+            if present_files == total:
+                state = "complete"
+            elif present_files:
+                state = "partial"
+            else:
+                state = "missing"
+            counts[state] += 1
+            packages[name] = {
+                "state": state,
+                "files": total,
+                "present_files": present_files,
+                "bytes_present": bytes_present,
+                "bytes_missing": bytes_missing,
+                "unknown_sizes": unknown_sizes
+            }
+
+        report = {"packages": packages, "counts": counts, "paths_checked": len(sizes)}
+        return report, watched
+
+
+install_state = InstallStateCache()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Model Verify Functions
+Quick integrity checks of installed model files that never read the tensor data
+"""
+
+import json
+import os
+import struct
+
+SAFETENSORS_SUFFIX = ".safetensors"
+MAX_HEADER_SIZE = 100 * 1024 * 1024     # safetensors itself refuses larger headers
+
+# Bytes per element; tensors of dtypes not listed here only get their offsets checked
+DTYPE_SIZES = {
+    "BOOL": 1, "U8": 1, "I8": 1, "F8_E5M2": 1, "F8_E4M3": 1,
+    "I16": 2, "U16": 2, "F16": 2, "BF16": 2,
+    "I32": 4, "U32": 4, "F32": 4,
+    "I64": 8, "U64": 8, "F64": 8
+}
+
+
+def check_safetensors(path, size):
+    """Validate the header of a safetensors file against the file size; returns (status, detail)"""
+    if size < 8:
+        return "truncated", f"{size} bytes is shorter than the header length field"
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        if header_size > MAX_HEADER_SIZE:
+            return "corrupt", f"Implausible header length {header_size}"
+        if 8 + header_size > size:
+            return "truncated", "File ends inside the header"
+        raw = f.read(header_size)
+
+    try:
+        header = json.loads(raw)
+    except ValueError:
+        return "corrupt", "Header is not valid JSON"
+    if not isinstance(header, dict):
+        return "corrupt", "Header is not a JSON object"
+
+    data_size = size - 8 - header_size
+    data_end = 0
+    for name, tensor in header.items():
+        if name == "__metadata__":
+            continue
+        try:
+            begin, end = tensor["data_offsets"]
+            if not all(isinstance(offset, int) and not isinstance(offset, bool) for offset in (begin, end)):
+                raise TypeError("data_offsets must be integers")
+            elements = 1
+            for dim in tensor["shape"]:
+                elements *= int(dim)
+            item_size = DTYPE_SIZES.get(tensor["dtype"])
+        except (KeyError, TypeError, ValueError):
+            return "corrupt", f"Malformed header entry for tensor {name}"
+        if begin < 0 or end < begin or (item_size and end - begin != elements * item_size):
+            return "corrupt", f"Inconsistent data offsets for tensor {name}"
+        data_end = max(data_end, end)
+
+    if data_end > data_size:
+        return "truncated", f"Tensor data needs {data_end} bytes, only {data_size} present"
+    if data_end < data_size:
+        return "corrupt", f"{data_size - data_end} unexpected bytes after the tensor data"
+    return "ok", ""
+
+
+def check_file(path, expected_size=0):
+    """Quick integrity status of a file: ok, truncated, corrupt or missing, plus a detail message.
+
+    Only the size and, for safetensors, the JSON header are read, so this takes
+    milliseconds even for files of tens of gigabytes.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return "missing", ""
+    if size == 0:
+        return "truncated", "File is empty"
+    if expected_size and size < expected_size:
+        return "truncated", f"{size} of {expected_size} bytes"
+    if expected_size and size > expected_size:
+        return "corrupt", f"{size} bytes, expected {expected_size}"
+    if path.lower().endswith(SAFETENSORS_SUFFIX):
+        try:
+            return check_safetensors(path, size)
+        except OSError as e:
+            return "corrupt", f"Cannot read header: {e}"
+    return "ok", ""
@@ -2,6 +2,36 @@
 
 let pollInterval;
 let configsLoaded = false;
+let currentJobId = null;
+let eventSource = null;
+let eventsConnected = false;   // While the /events stream is up, the pollers stand down
+// Logs are fetched incrementally: each keeps the server's sequence number of its last line
+const LOG_LINES_KEPT = 2000;
+let progressLog = { jobId: null, lines: [], seq: 0 };
+let installLog = { lines: [], seq: 0 };
+let comfyuiLog = { lines: [], seq: 0 };
+
+function mergeLog(log, lines, seq, reset) {
+    // Add the lines of a delta, skipping any this log already has; reset replaces the lot
+    if (reset) {
+        log.lines = lines.slice(-LOG_LINES_KEPT);
+    } else {
+        const first = seq - lines.length;   // Sequence number just before the delta's first line
+        log.lines = log.lines.concat(lines.slice(Math.max(0, log.seq - first))).slice(-LOG_LINES_KEPT);
+    }
+    log.seq = seq;
+    return log.lines;
+}
+
+function mergeProgress(data) {
+    // Job logs are kept per job; a record for another job starts over
+    if (data.job_id !== progressLog.jobId) {
+        progressLog = { jobId: data.job_id, lines: [], seq: 0 };
+        data.progress_reset = true;
+    }
+    data.progress = mergeLog(progressLog, data.progress || [], data.progress_seq || 0, data.progress_reset);
+    return data;
+}
 
 function clearPreviousMessages() {
     // Clear any previous status messages when starting a new action
@@ -43,6 +73,7 @@ function showStatus(message, type = 'info') {
 }
 
 function showProgress() {
+    document.getElementById('progressFill').style.width = '0%';
     document.getElementById('progressContainer').style.display = 'block';
 }
 
@@ -67,14 +98,30 @@ function hideProgress() {
    
    if (pollInterval) {
        clearInterval(pollInterval);
+       pollInterval = null;   // Stop following: later progress events belong to other jobs or tabs
    }
+   currentJobId = null;
 
 }
 
-function updateProgress(current, total, logs = [], currentFile = "", currentProgress = "") {
+function updateProgress(current, total, logs = [], currentFile = "", currentProgress = "", bytesDone = 0, bytesTotal = 0, eta = null, rate = 0) {
     // Fix: Use 1-based indexing for display (current + 1)
     const displayCurrent = current > 0 ? current : (total > 0 ? 1 : 0);
-    document.getElementById('progressText').textContent = `Processing ${displayCurrent} of ${total} files`;
+    let progressText = `Processing ${displayCurrent} of ${total} files`;
+    if (bytesTotal > 0) {
+        progressText += ` - ${formatFileSize(bytesDone)} of ${formatFileSize(bytesTotal)}`;
+    }
+    if (rate > 0) {
+        progressText += ` at ${formatFileSize(rate)}/s`;
+    }
+    if (eta !== null && eta !== undefined && bytesDone < bytesTotal) {
+        progressText += `, about ${formatDuration(eta)} left`;
+    }
+    document.getElementById('progressText').textContent = progressText;
+    
+    // Fill the bar by bytes once the sizes are known, by files otherwise
+    const fraction = bytesTotal > 0 ? bytesDone / bytesTotal : (total > 0 ? current / total : 0);
+    document.getElementById('progressFill').style.width = `${Math.min(100, fraction * 100).toFixed(1)}%`;
     
     const currentDownloadDiv = document.getElementById('currentDownload');
     const currentFileNameDiv = document.getElementById('currentFileName');
@@ -94,13 +141,13 @@ function updateProgress(current, total, logs = [], currentFile = "", currentProg
             currentFileNameDiv.textContent = 'Processing...';
         }
         
-        // Show progress - either our custom message or wget output
+        // Show progress - either a status message or the per-file progress lines
         if (currentProgress && currentProgress.trim() !== '') {
             // If it's already a formatted message with filename, show as-is
             if (currentProgress.includes(':') && (currentProgress.includes('exists') || currentProgress.includes('completed') || currentProgress.includes('failed'))) {
                 downloadProgressDiv.textContent = currentProgress;
             } else {
-                // For raw wget output, just show it (filename is already shown above)
+                // Per-file progress lines already carry their filename
                 downloadProgressDiv.textContent = currentProgress;
             }
         } else if (currentFile) {
@@ -136,7 +183,7 @@ function updateProgress(current, total, logs = [], currentFile = "", currentProg
                 status = log.status || 'info';
                 
                 // Map different status types to CSS classes
-                if (status === 'success' || message.includes('downloaded successfully') || message.includes('completed')) {
+                if (status === 'success' || status === 'linked' || message.includes('downloaded successfully') || message.includes('completed')) {
                     status = 'success';
                 } else if (status === 'error' || message.includes('failed') || message.includes('error')) {
                     status = 'error';
@@ -183,43 +230,66 @@ function showCompletionMessage(message, delay = 10000) {
     }, 1000);
 }
 
+function connectEvents() {
+    // Pushed updates; without EventSource support the polling below does the work
+    if (!window.EventSource) {
+        return;
+    }
+    eventSource = new EventSource('/events');
+    eventSource.onopen = () => { eventsConnected = true; };
+    // The browser reconnects on its own; polling covers the gap
+    eventSource.onerror = () => { eventsConnected = false; };
+    
+    eventSource.addEventListener('progress', e => {
+        const data = JSON.parse(e.data);
+        if (pollInterval && (!currentJobId || data.job_id === currentJobId)) {
+            handleProgress(mergeProgress(data));
+        }
+    });
+    eventSource.addEventListener('install', e => {
+        const data = JSON.parse(e.data);
+        const lines = mergeLog(installLog, data.lines, data.seq, data.reset);
+        if (comfyuiInstallPollInterval) {
+            handleInstallProgress({ status: data.status, step: data.step, log: lines });
+        }
+    });
+    eventSource.addEventListener('comfyui_log', e => {
+        const data = JSON.parse(e.data);
+        const lines = mergeLog(comfyuiLog, data.lines, data.seq, data.reset);
+        if (comfyuiLogPollInterval) {
+            handleComfyUILog({ running: data.running, log: lines });
+        }
+    });
+}
+
+function trackProgress() {
+    // One fetch right away - a quick job may be done before its first pushed update
+    fetchProgress();
+    if (pollInterval) {
+        clearInterval(pollInterval);
+    }
+    pollInterval = setInterval(pollProgress, 1000);
+}
+
 function pollProgress() {
-    fetch('/progress')
+    if (!eventsConnected) {
+        fetchProgress();
+    }
+}
+
+function fetchProgress() {
+    // Only the log entries after the ones already shown are sent
+    let url = '/progress';
+    if (currentJobId) {
+        const since = currentJobId === progressLog.jobId ? progressLog.seq : 0;
+        url = `/progress?job_id=${encodeURIComponent(currentJobId)}&since=${since}`;
+    }
+    fetch(url)
         .then(response => response.json())
         .then(data => {
-            updateProgress(
-                data.current, 
-                data.total, 
-                data.progress, 
-                data.current_file || "", 
-                data.current_progress || ""
-            );
-            
-            if (data.status === 'idle') {
-                // Operation completed - show final status
-                hideProgress();
-                enableOperationButtons();
-                
-                // Show final status based on the current_progress message
-                if (data.current_progress) {
-                    let statusMessage = data.current_progress;
-                    let statusType = 'success';
-                    
-                    if (data.current_progress.includes('error')) {
-                        statusType = 'error';
-                        // Make "errors" clickable if there are errors
-                        statusMessage = statusMessage.replace(/(\d+)\s+errors?/g, '<a href="#" onclick="showErrorDetails(); return false;" style="color: #dc3545; text-decoration: underline; font-weight: bold;">$1 errors</a>');
-                    } else if (data.current_progress.includes('already existed')) {
-                        statusType = 'info';
-                    }
-                    
-                    showStatus(statusMessage, statusType);
-                } else {
-                    showStatus('Operation completed!', 'success');
-                }
-                
-                // Refresh file explorer to show new files
-                updateFileExplorer();
+            // A reply that arrives after the job finished has nothing left to show
+            if (pollInterval) {
+                handleProgress(mergeProgress(data));
             }
         })
         .catch(error => {
@@ -227,6 +297,49 @@ function pollProgress() {
         });
 }
 
+function handleProgress(data) {
+    updateProgress(
+        data.current, 
+        data.total, 
+        data.progress, 
+        data.current_file || "", 
+        data.current_progress || "",
+        data.bytes_done || 0,
+        data.bytes_total || 0,
+        data.eta,
+        data.avg_rate || 0
+    );
+    
+    if (data.status === 'idle' || data.status === 'error') {
+        // Operation completed - show final status
+        currentJobId = null;
+        hideProgress();
+        enableOperationButtons();
+        
+        // Show final status based on the current_progress message
+        if (data.current_progress) {
+            let statusMessage = data.current_progress;
+            let statusType = 'success';
+            
+            if (data.status === 'error' || data.current_progress.includes('error')) {
+                statusType = 'error';
+                // Make "errors" clickable if there are errors
+                statusMessage = statusMessage.replace(/(\d+)\s+errors?/g, '<a href="#" onclick="showErrorDetails(); return false;" style="color: #dc3545; text-decoration: underline; font-weight: bold;">$1 errors</a>');
+            } else if (data.current_progress.includes('already existed')) {
+                statusType = 'info';
+            }
+            
+            showStatus(statusMessage, statusType);
+        } else {
+            showStatus('Operation completed!', 'success');
+        }
+        
+        // Refresh file explorer to show new files
+        updateFileExplorer();
+        refreshInstallState();
+    }
+}
+
 function loadModelConfigs() {
     clearPreviousMessages();
     
@@ -239,21 +352,15 @@ function loadModelConfigs() {
             if (data.success) {
                 configStatus.className = 'config-status config-loaded';
                 configStatus.innerHTML = `<i class="fas fa-check-circle" style="color: #28a745;"></i> Successfully loaded ${data.count} model configurations`;
+                if (data.stale) {
+                    // Server unreachable - the last downloaded copy is in use
+                    const fetched = data.fetched ? ` from ${new Date(data.fetched * 1000).toLocaleString()}` : '';
+                    configStatus.innerHTML += ` <span style="color: #fd7e14;">(offline copy${fetched})</span>`;
+                }
                 
-                const select = document.getElementById('modelSelect');
-                select.innerHTML = '<option value="">Choose a model package...</option>';
-                
-                // Sort models alphabetically before adding to dropdown
-                const sortedModels = data.models.sort((a, b) => a.localeCompare(b));
-                sortedModels.forEach(model => {
-                    const option = document.createElement('option');
-                    option.value = model;
-                    option.textContent = model;
-                    select.appendChild(option);
-                });
-                
-                // Add event listener to update HF token hint when model selection changes
-                select.addEventListener('change', updateHFTokenHint);
+                // Fill the dropdown with the first page of the catalog, then mark what is installed
+                searchPackages();
+                refreshInstallState();
                 
                 configsLoaded = true;
             } else {
@@ -269,6 +376,74 @@ function loadModelConfigs() {
         });
 }
 
+let packageSearchTimer = null;
+let installStates = {};
+
+function refreshInstallState() {
+    // One call for the state of every package; the server caches it until the disk changes
+    const basePath = document.getElementById('basePath').value;
+    if (!basePath) {
+        return;
+    }
+    fetch('/install_state', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            base_path: basePath
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            installStates = data.packages;
+            searchPackages();
+        }
+    })
+    .catch(error => console.error('Install state failed:', error));
+}
+
+function searchPackages() {
+    // Ask the server for one page of matching packages instead of the whole catalog
+    const query = document.getElementById('packageSearch').value.trim();
+    const select = document.getElementById('modelSelect');
+    const selected = select.value;
+    
+    fetch(`/packages?q=${encodeURIComponent(query)}&limit=200`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                return;
+            }
+            select.innerHTML = '<option value="">Choose a model package...</option>';
+            data.packages.forEach(row => {
+                const option = document.createElement('option');
+                const size = row.size ? `, ${formatFileSize(row.size)}${row.unknown_sizes ? '+' : ''}` : '';
+                const state = installStates[row.name] ? installStates[row.name].state : '';
+                const mark = state === 'complete' ? '✓ ' : state === 'partial' ? '◐ ' : '';
+                option.value = row.name;
+                option.textContent = `${mark}${row.name} (${row.files} files${size}${row.hf ? ', HF token' : ''})`;
+                select.appendChild(option);
+            });
+            if (data.total > data.count) {
+                const option = document.createElement('option');
+                option.disabled = true;
+                option.textContent = `... ${data.total - data.count} more - refine the search`;
+                select.appendChild(option);
+            }
+            if (selected && data.packages.some(row => row.name === selected)) {
+                select.value = selected;
+            }
+        })
+        .catch(error => console.error('Package search failed:', error));
+}
+
+function onPackageSearch() {
+    clearTimeout(packageSearchTimer);
+    packageSearchTimer = setTimeout(searchPackages, 250);
+}
+
 function updateHFTokenHint() {
     const modelSelect = document.getElementById('modelSelect').value;
     const hfTokenInput = document.getElementById('hfToken');
@@ -364,6 +539,8 @@ function downloadModels() {
     const modelSelect = document.getElementById('modelSelect').value;
     const basePath = document.getElementById('basePath').value;
     const hfToken = getCurrentHFToken(); // Use the function to get actual token
+    const order = document.getElementById('downloadOrder').value;
+    const parallel = parseInt(document.getElementById('parallelDownloads').value, 10) || 1;
     
     if (!modelSelect) {
         showStatus('Please select a model package', 'error');
@@ -378,8 +555,6 @@ function downloadModels() {
     showStatus('Starting download...', 'info');
     showProgress();
     disableOperationButtons(); // Disable Action buttons
-    
-    pollInterval = setInterval(pollProgress, 1000);
 
     fetch('/download', {
         method: 'POST',
@@ -389,12 +564,17 @@ function downloadModels() {
         body: JSON.stringify({
             model: modelSelect,
             base_path: basePath,
-            hf_token: hfToken
+            hf_token: hfToken,
+            order: order,
+            parallel: parallel
         })
     })
     .then(response => response.json())
     .then(data => {
         if (data.success) {
+            // Follow the progress of this job until it finishes
+            currentJobId = data.job_id;
+            trackProgress();
             showStatus(data.message, 'info');
         } else {
             showStatus(`Download failed: ${data.message}`, 'error');
@@ -437,8 +617,6 @@ function deleteModels() {
     showStatus('Starting deletion...', 'info');
     showProgress();
     disableOperationButtons(); // Disable Action buttons
-    
-    pollInterval = setInterval(pollProgress, 1000);
 
     fetch('/delete', {
         method: 'POST',
@@ -453,6 +631,9 @@ function deleteModels() {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
+            // Follow the progress of this job until it finishes
+            currentJobId = data.job_id;
+            trackProgress();
             showStatus(`Deletion started! ${data.message}`, 'success');
         } else {
             showStatus(`Deletion failed: ${data.message}`, 'error');
@@ -578,8 +759,16 @@ function checkModelStatus() {
             html += '<ul class="file-list">';
             
             data.file_status.forEach(file => {
-                const statusIcon = file.exists ? '<i class="fas fa-check-circle" style="color: #28a745;"></i>' : '<i class="fas fa-times-circle" style="color: #dc3545;"></i>';
-                const statusText = file.exists ? 'EXISTS' : 'MISSING';
+                const damaged = file.integrity === 'truncated' || file.integrity === 'corrupt';
+                let statusIcon = '<i class="fas fa-times-circle" style="color: #dc3545;"></i>';
+                let statusText = 'MISSING';
+                if (damaged) {
+                    statusIcon = '<i class="fas fa-exclamation-triangle" style="color: #fd7e14;"></i>';
+                    statusText = `${file.integrity.toUpperCase()}${file.integrity_detail ? ` (${file.integrity_detail})` : ''}`;
+                } else if (file.exists) {
+                    statusIcon = '<i class="fas fa-check-circle" style="color: #28a745;"></i>';
+                    statusText = 'EXISTS';
+                }
                 html += `<li>${statusIcon} <strong>${file.path}</strong> - ${statusText}</li>`;
             });
             
@@ -588,7 +777,9 @@ function checkModelStatus() {
             infoDiv.style.display = 'block';
             
             // Show completion status
-            if (data.found === data.total) {
+            if (data.damaged > 0) {
+                showStatus(`${data.found}/${data.total} files found, ${data.damaged} truncated or corrupt - delete and download them again.`, 'error');
+            } else if (data.found === data.total) {
                 showStatus(`All ${data.total} files are present!`, 'success');
             } else {
                 showStatus(`${data.found}/${data.total} files found. ${data.total - data.found} files missing.`, 'info');
@@ -604,6 +795,10 @@ function checkModelStatus() {
 
 // Load configurations on page load
 document.addEventListener('DOMContentLoaded', function() {
+    // Update HF token hint when model selection changes
+    document.getElementById('modelSelect').addEventListener('change', updateHFTokenHint);
+
+    connectEvents();
     loadModelConfigs();
     updateFileExplorer();
     loadSavedHFToken();
@@ -739,19 +934,11 @@ function updateFileExplorer() {
     if (fileTree) {
         fileTree.innerHTML = '<div class="loading">Loading directory structure...</div>';
         
-        fetch('/browse_directory', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                path: basePath
-            })
-        })
-        .then(response => response.json())
+        fetchTreePage(basePath, '')
         .then(data => {
             if (data.success) {
-                displayFileTree(data.structure, fileTree);
+                displayFileTree(data.entries, fileTree);
+                appendLoadMore(fileTree, '', data);
             } else {
                 fileTree.innerHTML = `<div class="error">Error: ${data.message}</div>`;
             }
@@ -765,6 +952,59 @@ function updateFileExplorer() {
     loadFolderDropdown();
 }
 
+function fetchTreePage(path, cursor) {
+    // One page of a directory from the tree API
+    return fetch('/tree', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            path: path,
+            cursor: cursor
+        })
+    })
+    .then(response => response.json());
+}
+
+function loadTreePage(container, relativePath, cursor) {
+    // Append the next page of a folder to its children container
+    const basePath = document.getElementById('basePath').value;
+    const path = relativePath ? `${basePath}/${relativePath}` : basePath;
+    
+    return fetchTreePage(path, cursor)
+        .then(data => {
+            if (!data.success) {
+                container.insertAdjacentHTML('beforeend', `<div class="error">Error: ${data.message}</div>`);
+                return;
+            }
+            data.entries.forEach(child => {
+                container.appendChild(createFileItem(child, relativePath));
+            });
+            appendLoadMore(container, relativePath, data);
+        })
+        .catch(error => {
+            container.insertAdjacentHTML('beforeend', `<div class="error">Failed to load folder: ${error.message}</div>`);
+        });
+}
+
+function appendLoadMore(container, relativePath, data) {
+    // Large folders come in pages - offer the rest instead of dropping it
+    if (!data.next_cursor) {
+        return;
+    }
+    const remaining = data.total - parseInt(data.next_cursor, 10);
+    const more = document.createElement('div');
+    more.className = 'file-item load-more';
+    more.textContent = `Load ${remaining} more...`;
+    more.addEventListener('click', function(e) {
+        e.stopPropagation();
+        more.remove();
+        loadTreePage(container, relativePath, data.next_cursor);
+    });
+    container.appendChild(more);
+}
+
 function displayFileTree(structure, container) {
     container.innerHTML = '';
     
@@ -797,6 +1037,9 @@ function createFileItem(item, parentPath = '') {
     if (item.size && item.type === 'file') {
         const sizeGB = (item.size / (1024 * 1024 * 1024)).toFixed(2);
         nameSpan.textContent = `${item.name} (${sizeGB} GB)`;
+    } else if (item.type === 'folder' && item.files) {
+        // Folders show the recursive totals kept by the server
+        nameSpan.textContent = `${item.name} (${formatFileSize(item.size)}, ${item.files} files)`;
     } else {
         nameSpan.textContent = item.name;
     }
@@ -820,11 +1063,11 @@ function createFileItem(item, parentPath = '') {
     div.appendChild(itemRow);
     
     // For folders, add click handler and children container
-    if (item.type === 'folder' && item.children) {
+    if (item.type === 'folder') {
         const currentPath = parentPath ? `${parentPath}/${item.name}` : item.name;
         itemRow.addEventListener('click', function(e) {
             e.stopPropagation();
-            toggleFolder(div, item.children, currentPath);
+            toggleFolder(div, currentPath);
         });
         
         // Create children container (will appear below the folder row)
@@ -836,7 +1079,7 @@ function createFileItem(item, parentPath = '') {
     return div;
 }
 
-function toggleFolder(folderElement, children, parentPath) {
+function toggleFolder(folderElement, folderPath) {
     const childrenContainer = folderElement.querySelector('.file-children');
     const folderRow = folderElement.querySelector('.file-item');
     const isExpanded = childrenContainer.classList.contains('expanded');
@@ -845,12 +1088,10 @@ function toggleFolder(folderElement, children, parentPath) {
         childrenContainer.classList.remove('expanded');
         folderRow.classList.remove('expanded');
     } else {
-        // Load children if not already loaded
-        if (childrenContainer.children.length === 0) {
-            children.forEach(child => {
-                const childItem = createFileItem(child, parentPath);
-                childrenContainer.appendChild(childItem);
-            });
+        // Load the first page of children on first expand
+        if (!childrenContainer.dataset.loaded) {
+            childrenContainer.dataset.loaded = 'true';
+            loadTreePage(childrenContainer, folderPath, '');
         }
         
         childrenContainer.classList.add('expanded');
@@ -866,6 +1107,14 @@ function formatFileSize(bytes) {
     return parseFloat((bytes / Math.pow(k, i)).toFixed(1)) + ' ' + sizes[i];
 }
 
+function formatDuration(seconds) {
+    seconds = Math.max(0, Math.round(seconds));
+    if (seconds < 60) return `${seconds}s`;
+    const minutes = Math.floor(seconds / 60);
+    if (minutes < 60) return `${minutes}m ${seconds % 60}s`;
+    return `${Math.floor(minutes / 60)}h ${minutes % 60}m`;
+}
+
 function deleteFileFromExplorer(filename, relativePath) {
     const basePath = document.getElementById('basePath').value;
     const fullPath = relativePath ? `${basePath}/${relativePath}/${filename}` : `${basePath}/${filename}`;
@@ -952,6 +1201,29 @@ function enableOperationButtons() {
     }
 }
 
+function cancelCurrentJob() {
+    if (!currentJobId) {
+        return;
+    }
+    
+    if (!confirm('Cancel the current operation? Partially downloaded files are kept so the download can resume later.')) {
+        return;
+    }
+    
+    fetch(`/jobs/${encodeURIComponent(currentJobId)}/cancel`, { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                showStatus('Cancelling...', 'info');
+            } else {
+                showStatus(`Cancel failed: ${data.message}`, 'error');
+            }
+        })
+        .catch(error => {
+            showStatus(`Error: ${error.message}`, 'error');
+        });
+}
+
 function showErrorDetails() {
     const logContainer = document.getElementById('logContainer');
     const progressContainer = document.getElementById('progressContainer');
@@ -1058,8 +1330,6 @@ function downloadCustomModel() {
     showStatus('Starting custom download...', 'info');
     showProgress();
     
-    pollInterval = setInterval(pollProgress, 1000);
-    
     fetch('/custom_download', {
         method: 'POST',
         headers: {
@@ -1076,6 +1346,9 @@ function downloadCustomModel() {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
+            // Follow the progress of this job until it finishes
+            currentJobId = data.job_id;
+            trackProgress();
             showStatus(data.message, 'info');
         } else {
             showStatus(`Download failed: ${data.message}`, 'error');
@@ -1139,28 +1412,34 @@ function installComfyUI() {
 }
 
 function pollInstallProgress() {
-    fetch('/comfyui_install_progress')
+    if (eventsConnected) return;
+    fetch(`/comfyui_install_progress?since=${installLog.seq}`)
         .then(r => r.json())
         .then(data => {
-            const logDiv = document.getElementById('installProgress');
-            logDiv.textContent = data.log.join('\n');
-            logDiv.scrollTop = logDiv.scrollHeight;
-
-            if (data.status === 'done' || data.status === 'error') {
-                clearInterval(comfyuiInstallPollInterval);
-                comfyuiInstallPollInterval = null;
-                const btn = document.getElementById('installBtn');
-                btn.disabled = false;
-                btn.innerHTML = '<i class="fas fa-download"></i> Install ComfyUI';
-                if (data.status === 'done') {
-                    updateFileExplorer();
-                    document.getElementById('installSection').style.display = 'none';
-                }
-            }
+            data.log = mergeLog(installLog, data.log, data.seq, data.reset);
+            handleInstallProgress(data);
         })
         .catch(() => {});
 }
 
+function handleInstallProgress(data) {
+    const logDiv = document.getElementById('installProgress');
+    logDiv.textContent = data.log.join('\n');
+    logDiv.scrollTop = logDiv.scrollHeight;
+
+    if (data.status === 'done' || data.status === 'error') {
+        clearInterval(comfyuiInstallPollInterval);
+        comfyuiInstallPollInterval = null;
+        const btn = document.getElementById('installBtn');
+        btn.disabled = false;
+        btn.innerHTML = '<i class="fas fa-download"></i> Install ComfyUI';
+        if (data.status === 'done') {
+            updateFileExplorer();
+            document.getElementById('installSection').style.display = 'none';
+        }
+    }
+}
+
 function addCustomNode() {
     const list = document.getElementById('customNodesList');
     const row = document.createElement('div');
@@ -1235,26 +1514,32 @@ function stopComfyUI() {
 }
 
 function pollComfyUILog() {
-    fetch('/comfyui_log')
+    if (eventsConnected) return;
+    fetch(`/comfyui_log?since=${comfyuiLog.seq}`)
         .then(r => r.json())
         .then(data => {
-            const logDiv = document.getElementById('comfyuiLog');
-            if (logDiv && data.log && data.log.length > 0) {
-                logDiv.textContent = data.log.join('\n');
-                logDiv.scrollTop = logDiv.scrollHeight;
-            }
-            if (!data.running) {
-                if (comfyuiLogPollInterval) {
-                    clearInterval(comfyuiLogPollInterval);
-                    comfyuiLogPollInterval = null;
-                }
-                document.getElementById('runBtn').disabled = false;
-                checkComfyUIStatus();
-            }
+            data.log = mergeLog(comfyuiLog, data.log, data.seq, data.reset);
+            handleComfyUILog(data);
         })
         .catch(() => {});
 }
 
+function handleComfyUILog(data) {
+    const logDiv = document.getElementById('comfyuiLog');
+    if (logDiv && data.log && data.log.length > 0) {
+        logDiv.textContent = data.log.join('\n');
+        logDiv.scrollTop = logDiv.scrollHeight;
+    }
+    if (!data.running) {
+        if (comfyuiLogPollInterval) {
+            clearInterval(comfyuiLogPollInterval);
+            comfyuiLogPollInterval = null;
+        }
+        document.getElementById('runBtn').disabled = false;
+        checkComfyUIStatus();
+    }
+}
+
 function checkComfyUIStatus() {
     fetch('/comfyui_status')
         .then(r => r.json())